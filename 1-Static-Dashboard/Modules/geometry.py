@@ -0,0 +1,193 @@
+####################################################################################################
+__author__ = "Juan P. Zaldivar & Enric Millan"
+__version__ = "1.0.0"
+####################################################################################################
+
+"""
+This module contains the functions to build and use the map layers of the dashboard.
+
+The GeoJSON files of the Data folder are simplified (preserving the borders shared by
+neighbouring polygons), quantized and written as TopoJSON next to them, keeping only the
+properties the charts use. The artifacts are built running this module from the dashboard folder:
+
+    python -m Modules.geometry [tolerance] [quantization]
+
+Functions:
+----------
+
+topo_path(file: str, path: str) -> str
+    Returns the path of the TopoJSON artifact of a GeoJSON file.
+
+count_vertices(gdf: gpd.GeoDataFrame) -> int
+    Returns the number of vertices of the geometries of a GeoDataFrame.
+
+build_topojson(feature: str, path: str, tolerance: float, quantization: float) -> dict
+    Simplifies and quantizes a map layer and writes it as TopoJSON.
+
+build_layers(path: str, tolerance: float, quantization: float) -> list
+    Builds the TopoJSON artifacts of every map layer.
+
+topo_feature(feature: str) -> alt.Data
+    Returns the TopoJSON artifact of a map layer as Altair data.
+"""
+
+####################################################################################################
+# IMPORTS ################################################################################ IMPORTS #
+####################################################################################################
+import os
+import sys
+import shapely
+import altair as alt
+import geopandas as gpd
+from Modules.assets import asset_data
+
+
+####################################################################################################
+# GLOBAL VARIABLES ################################################################ GLOBAL VARIABLES #
+####################################################################################################
+LAYERS = {
+    'boroughs': ('new-york-city-boroughs-ny_.geojson', []),
+    'hex': ('new-york-city-boroughs-ny_hex.geojson', ['name', 'count'])
+}
+
+TOLERANCE = 0.0005      # degrees, about half a pixel on a 500 px wide map of the city
+QUANTIZATION = 1e4
+
+
+####################################################################################################
+# FUNCTIONS ############################################################################ FUNCTIONS #
+####################################################################################################
+def topo_path(file: str, path: str = './') -> str:
+    """
+    This function returns the path of the TopoJSON artifact of a GeoJSON file.
+
+    Parameters
+    ----------
+    file : str
+        Name of the GeoJSON file.
+    path : str
+        Folder of the GeoJSON file.
+
+    Returns
+    -------
+    str
+        Path of the TopoJSON file.
+    """
+
+    return path + os.path.splitext(file)[0] + '.topojson'
+
+
+def count_vertices(gdf: gpd.GeoDataFrame) -> int:
+    """
+    This function returns the number of vertices of the geometries of a GeoDataFrame.
+
+    Parameters
+    ----------
+    gdf : gpd.GeoDataFrame
+        Geometries to be counted.
+
+    Returns
+    -------
+    int
+        Number of vertices.
+    """
+
+    return int(shapely.get_num_coordinates(gdf.geometry.values).sum())
+
+
+def build_topojson(feature: str, path: str = 'Data/', tolerance: float = TOLERANCE, quantization: float = QUANTIZATION) -> dict:
+    """
+    This function simplifies and quantizes a map layer and writes it as TopoJSON.
+
+    The simplification is applied to the arcs of the topology, so the borders shared by two polygons
+    are simplified once and the polygons keep fitting together.
+
+    Parameters
+    ----------
+    feature : str
+        Name of the layer (see LAYERS), used as the TopoJSON object name.
+    path : str
+        Folder of the GeoJSON file.
+    tolerance : float
+        Simplification tolerance, in degrees.
+    quantization : float
+        Number of quantization steps per axis of the TopoJSON coordinates.
+
+    Returns
+    -------
+    dict
+        Report with the sizes and vertex counts of the GeoJSON and TopoJSON layers.
+    """
+
+    import topojson
+
+    file, properties = LAYERS[feature]
+    gdf = gpd.read_file(path + file)[properties + ['geometry']]
+
+    topology = topojson.Topology(gdf, object_name=feature, toposimplify=tolerance, topoquantize=quantization)
+
+    out = topo_path(file, path)
+    with open(out, 'w') as f:
+        f.write(topology.to_json())
+
+    return {
+        'feature': feature,
+        'file': out,
+        'bytes_before': os.path.getsize(path + file),
+        'bytes_after': os.path.getsize(out),
+        'vertices_before': count_vertices(gdf),
+        'vertices_after': count_vertices(topology.to_gdf())
+    }
+
+
+def build_layers(path: str = 'Data/', tolerance: float = TOLERANCE, quantization: float = QUANTIZATION) -> list:
+    """
+    This function builds the TopoJSON artifacts of every map layer.
+
+    Parameters
+    ----------
+    path : str
+        Folder of the GeoJSON files.
+    tolerance : float
+        Simplification tolerance, in degrees.
+    quantization : float
+        Number of quantization steps per axis of the TopoJSON coordinates.
+
+    Returns
+    -------
+    list
+        Report of each layer (see build_topojson).
+    """
+
+    return [build_topojson(feature, path, tolerance, quantization) for feature in LAYERS]
+
+
+def topo_feature(feature: str) -> alt.Data:
+    """
+    This function returns the TopoJSON artifact of a map layer as Altair data, inlined or served
+    from the Data folder (see assets.asset_data).
+
+    Parameters
+    ----------
+    feature : str
+        Name of the layer (see LAYERS).
+
+    Returns
+    -------
+    alt.Data
+        Features of the layer.
+    """
+
+    return asset_data(topo_path(LAYERS[feature][0], ''), 'Data/', alt.DataFormat(type='topojson', feature=feature))
+
+
+if __name__ == '__main__':
+    tolerance = float(sys.argv[1]) if len(sys.argv) > 1 else TOLERANCE
+    quantization = float(sys.argv[2]) if len(sys.argv) > 2 else QUANTIZATION
+
+    for report in build_layers('Data/', tolerance, quantization):
+        print('{feature}: {file}, {bytes_before} -> {bytes_after} bytes ({size:.0%}), '
+              '{vertices_before} -> {vertices_after} vertices ({vertices:.0%})'.format(
+                  **report,
+                  size=report['bytes_after'] / report['bytes_before'],
+                  vertices=report['vertices_after'] / report['vertices_before']))
@@ -0,0 +1,268 @@
+####################################################################################################
+__author__ = "Juan P. Zaldivar & Enric Millan"
+__version__ = "1.0.0"
+####################################################################################################
+
+"""
+This module contains the functions to measure the Vega-Lite specification of a chart, the JSON that
+Streamlit sends to the browser, and to keep it within a budget.
+
+The report gives the bytes of the whole specification, of every view (the leaves of the vconcat,
+hconcat, concat, facet and repeat compositions, a layer counting as one view) and of every named
+dataset, with its rows and columns. A chart over one of the BUDGETS emits a warning, or raises a
+ValueError in strict mode (DASHBOARD_PAYLOAD_STRICT=1).
+
+Functions:
+----------
+
+payload_report(chart: alt.TopLevelMixin) -> dict
+    Returns the bytes of a chart per view and per dataset.
+
+check_budget(chart: alt.TopLevelMixin, strict: bool, **budgets) -> dict
+    Returns the payload report of a chart, warning or raising when it exceeds the budgets.
+
+budgeted(**budgets) -> callable
+    Decorator that checks the budgets of the charts returned by a function.
+"""
+
+####################################################################################################
+# IMPORTS ################################################################################ IMPORTS #
+####################################################################################################
+import os
+import json
+import warnings
+import functools
+
+
+####################################################################################################
+# GLOBAL VARIABLES ################################################################ GLOBAL VARIABLES #
+####################################################################################################
+BUDGETS = {
+    'total_bytes': 2000000,     # whole specification
+    'view_bytes': 1000000,      # a view with the datasets it reads
+    'dataset_bytes': 1000000,
+    'dataset_rows': 50000,
+}
+
+STRICT = os.environ.get('DASHBOARD_PAYLOAD_STRICT', '0') == '1'
+
+COMPOSITIONS = ['vconcat', 'hconcat', 'concat']
+
+
+####################################################################################################
+# FUNCTIONS ############################################################################ FUNCTIONS #
+####################################################################################################
+def _size(value) -> int:
+    """
+    This function returns the bytes of a value serialized as JSON.
+    """
+
+    return len(json.dumps(value, default=str))
+
+
+def _shape(values) -> tuple:
+    """
+    This function returns the rows and columns of inline values (None for GeoJSON or TopoJSON).
+    """
+
+    if isinstance(values, list):
+        columns = set()
+        for record in values[:100]:
+            if isinstance(record, dict):
+                columns.update(record)
+        return len(values), len(columns)
+
+    return None, None
+
+
+def _views(spec: dict, path: str, data: dict):
+    """
+    This function yields the leaf views of a specification with their path and the data they read,
+    inherited from the closest composition that sets it.
+    """
+
+    data = spec.get('data', data)
+
+    for key in COMPOSITIONS:
+        if key in spec:
+            for i, view in enumerate(spec[key]):
+                yield from _views(view, f'{path}.{key}[{i}]' if path else f'{key}[{i}]', data)
+            return
+
+    if 'spec' in spec:    # facet and repeat
+        yield from _views(spec['spec'], f'{path}.spec' if path else 'spec', data)
+        return
+
+    yield path or 'view', spec, data
+
+
+def _names(view: dict, inherited: str = None) -> list:
+    """
+    This function returns the names of the datasets read by a view and its layers.
+    """
+
+    names = [inherited] if inherited and 'data' not in view else []
+    if isinstance(view.get('data'), dict) and 'name' in view['data']:
+        names.append(view['data']['name'])
+    for layer in view.get('layer', []):
+        names += [name for name in _names(layer) if name not in names]
+
+    return names
+
+
+def _inline(view: dict, data: dict) -> list:
+    """
+    This function returns the inline values read by a view and its layers.
+    """
+
+    values = []
+    for d in [data if 'data' not in view else None, view.get('data')] + [layer.get('data') for layer in view.get('layer', [])]:
+        if isinstance(d, dict) and 'values' in d:
+            values.append(d['values'])
+
+    return values
+
+
+def _title(view: dict) -> str:
+    """
+    This function returns the title of a view, or the marks of its layers.
+    """
+
+    title = view.get('title')
+    if isinstance(title, dict):
+        title = title.get('text')
+    if isinstance(title, list):
+        title = ' '.join(title)
+    if title:
+        return str(title)
+
+    marks = [v.get('mark') for v in view.get('layer', [view])]
+    return '+'.join(m.get('type', '') if isinstance(m, dict) else str(m) for m in marks if m)
+
+
+def payload_report(chart) -> dict:
+    """
+    This function returns the bytes of the Vega-Lite specification of a chart per view and per
+    named dataset. The bytes of a view count its own specification (with its inline values) and
+    the named datasets it reads.
+
+    Parameters
+    ----------
+    chart : alt.TopLevelMixin or dict
+        The chart, or its specification.
+
+    Returns
+    -------
+    dict
+        The total bytes, the views (path, title, bytes, datasets read, and rows and columns of the
+        largest one) and the datasets (name, bytes, rows, columns and the views that read them).
+    """
+
+    spec = chart if isinstance(chart, dict) else chart.to_dict()
+    datasets = spec.get('datasets', {})
+
+    report = {'bytes': _size(spec), 'views': [], 'datasets': []}
+    readers = {name: [] for name in datasets}
+
+    for path, view, data in _views({k: v for k, v in spec.items() if k != 'datasets'}, '', None):
+        names = [name for name in _names(view, (data or {}).get('name')) if name in datasets]
+        values = [datasets[name] for name in names] + _inline(view, data)
+        shapes = [_shape(v) for v in values]
+
+        report['views'].append({
+            'view': path,
+            'title': _title(view),
+            'bytes': _size(view) + sum(_size(datasets[name]) for name in names),
+            'datasets': names,
+            'rows': max((r for r, _ in shapes if r is not None), default=None),
+            'columns': max((c for _, c in shapes if c is not None), default=None),
+        })
+        for name in names:
+            readers[name].append(path)
+
+    for name, values in datasets.items():
+        rows, columns = _shape(values)
+        report['datasets'].append({
+            'dataset': name,
+            'bytes': _size(values),
+            'rows': rows,
+            'columns': columns,
+            'views': readers[name],
+        })
+
+    return report
+
+
+def check_budget(chart, strict: bool = None, **budgets) -> dict:
+    """
+    This function returns the payload report of a chart and warns (or raises, in strict mode) when
+    the chart exceeds its budgets.
+
+    Parameters
+    ----------
+    chart : alt.TopLevelMixin or dict
+        The chart, or its specification.
+    strict : bool
+        Whether to raise instead of warning, STRICT by default.
+    **budgets
+        Budgets replacing those of BUDGETS (total_bytes, view_bytes, dataset_bytes, dataset_rows),
+        None disabling one of them.
+
+    Returns
+    -------
+    dict
+        The payload report (see payload_report) with the exceeded budgets in 'exceeded'.
+    """
+
+    budgets = {**BUDGETS, **budgets}
+    strict = STRICT if strict is None else strict
+    report = payload_report(chart)
+
+    exceeded = []
+    if budgets['total_bytes'] is not None and report['bytes'] > budgets['total_bytes']:
+        exceeded.append(f"specification of {report['bytes']} bytes over {budgets['total_bytes']}")
+    for view in report['views']:
+        if budgets['view_bytes'] is not None and view['bytes'] > budgets['view_bytes']:
+            exceeded.append(f"view {view['view']} ({view['title']}) of {view['bytes']} bytes over {budgets['view_bytes']}")
+    for dataset in report['datasets']:
+        if budgets['dataset_bytes'] is not None and dataset['bytes'] > budgets['dataset_bytes']:
+            exceeded.append(f"dataset {dataset['dataset']} of {dataset['bytes']} bytes over {budgets['dataset_bytes']}")
+        if budgets['dataset_rows'] is not None and (dataset['rows'] or 0) > budgets['dataset_rows']:
+            exceeded.append(f"dataset {dataset['dataset']} of {dataset['rows']} rows over {budgets['dataset_rows']}")
+
+    report['exceeded'] = exceeded
+    if exceeded:
+        message = 'Chart over its payload budget: ' + '; '.join(exceeded)
+        if strict:
+            raise ValueError(message)
+        warnings.warn(message, stacklevel=2)
+
+    return report
+
+
+def budgeted(**budgets):
+    """
+    This function returns a decorator that checks the budgets of the chart (or tuple of charts)
+    returned by a function, and returns it unchanged.
+
+    Parameters
+    ----------
+    **budgets
+        Budgets replacing those of BUDGETS (see check_budget).
+
+    Returns
+    -------
+    callable
+        The decorator.
+    """
+
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            result = fn(*args, **kwargs)
+            for chart in result if isinstance(result, (tuple, list)) else [result]:
+                check_budget(chart, **budgets)
+            return result
+        return wrapper
+
+    return decorate
@@ -9,35 +9,114 @@ This module contains the functions to preprocess the collision and weather datas
 Functions:
 ----------
 
-time_filter(dataset: pd.DataFrame, time_col: str) -> pd.DataFrame
+time_filter(dataset: pd.DataFrame, time_col: str, windows: list) -> pd.DataFrame
     This function filters the dataset by a time column to get the data of the summer months of 2018 and 2020.
 
+time_window_mask(dates: pd.Series, windows: list) -> pd.Series
+    This function tells which dates fall inside any of the time windows.
+
 categorize_moment(hour: str) -> str
     This function categorizes the time of the day. The categories are: Morning, Afternoon and Night.
 
-clusterize_vehicle_type(df: pd.DataFrame, col: str) -> pd.DataFrame
+load_vehicle_mapping(file: str) -> dict
+    This function loads the vehicle type clusters from a mapping file.
+
+clusterize_vehicle_type(df: pd.DataFrame, col: str, mapping: dict) -> pd.DataFrame
     This function clusters the vehicle types in the dataset.
 
 imputation_with_ref_col(dataset: pd.DataFrame, imputed_col: str, reference_col: str, imputed_value: str) -> None
     This function imputes the values of a column with the values of another column as reference.
 
+impute_with_ref_cols(dataset: pd.DataFrame, rules: list) -> dict
+    This function applies a batch of imputation rules with reference columns in a single pass.
+
 beaufort_scale(wind_speed_mps: float) -> str
     This function categorizes the wind speed according to the Beaufort Scale.
 
 rain_intensity_scale(prcp_mm: float) -> str
     This function categorizes the rain intensity according to the rain intensity scale.
+
+register_scale(name: str, breakpoints: list, labels: list) -> None
+    This function registers a categorization scale given by its breakpoints and labels.
+
+categorize(values: pd.Series, scale: str) -> pd.Series
+    This function categorizes a whole column at once according to a registered scale.
+
+derive_columns(dataset: pd.DataFrame) -> pd.DataFrame
+    This function adds the year, day and time of the day columns derived from the crash date and time.
+
+ingest_collisions(raw_file: str, out_file: str, chunksize: int) -> dict
+    This function streams the raw collisions file in chunks through the whole preprocessing into a Parquet file.
+
+aggregate_weather(raw_file: str, chunksize: int) -> pd.DataFrame
+    This function aggregates the weather stations file into one row per day with the wind and rain scales.
+
+merge_collision_counts(weather: pd.DataFrame, collisions: pd.DataFrame) -> pd.DataFrame
+    This function joins the daily collision counts and the temperature scale to the daily weather.
+
+preprocess_weather(raw_file: str, collisions: pd.DataFrame, path: str) -> pd.DataFrame
+    This function regenerates weather_aggregated.csv and merged_data.csv from the weather stations file.
 """
 
 ####################################################################################################
 # IMPORTS ################################################################################ IMPORTS #
 ####################################################################################################
+import os
+import json
+import numpy as np
 import pandas as pd
+from functools import lru_cache
+from Modules.store import CATEGORICAL, store_path, read_store, write_store
+from Modules.instrumentation import traced
+
+
+####################################################################################################
+# GLOBAL VARIABLES ################################################################ GLOBAL VARIABLES #
+####################################################################################################
+SCALES = {}
+
+VEHICLE_MAPPING = 'Data/vehicle_types.json'
+
+SUMMER_WINDOWS = [('2018-06-01', '2018-09-30'), ('2020-06-01', '2020-09-30')]
+
+RAW_COLUMNS = {
+    'COLLISION_ID': 'int64',
+    'CRASH DATE': 'str',
+    'CRASH TIME': 'str',
+    'BOROUGH': 'str',
+    'ZIP CODE': 'str',
+    'LATITUDE': 'float64',
+    'LONGITUDE': 'float64',
+    'ON STREET NAME': 'str',
+    'NUMBER OF PERSONS INJURED': 'float64',
+    'NUMBER OF PERSONS KILLED': 'float64',
+    'CONTRIBUTING FACTOR VEHICLE 1': 'str',
+    'VEHICLE TYPE CODE 1': 'str',
+}
+
+RAW_RENAME = {
+    'ON STREET NAME': 'STREET NAME',
+    'NUMBER OF PERSONS INJURED': 'TOTAL INJURED',
+    'NUMBER OF PERSONS KILLED': 'TOTAL KILLED',
+}
+
+WEATHER_COLUMNS = {
+    'DATE': 'str',
+    'AWND': 'float64',
+    'PRCP': 'float64',
+    'TMAX': 'float64',
+    'TMIN': 'float64',
+    'TOBS': 'float64',
+}
+
+TEMP_BINS = list(range(10, 30, 2))
 
 
 ####################################################################################################
 # FUNCTIONS ############################################################################ FUNCTIONS #
 ####################################################################################################
-def time_filter(dataset: pd.DataFrame, time_col: str) -> pd.DataFrame:
+@traced()
+def time_filter(dataset: pd.DataFrame, time_col: str, windows: list = SUMMER_WINDOWS) -> pd.DataFrame:
     """
     This function filters the dataset by a time column to get the data of the summer months of 2018 and 2020.
 
@@ -47,17 +126,45 @@ def time_filter(dataset: pd.DataFrame, time_col: str) -> pd.DataFrame:
         The dataset to be filtered.
     time_col : str
         The column to be used as reference.
+    windows : list
+        The (start, end) dates of the time windows, both included.
 
     Returns
     -------
     pd.DataFrame
         The filtered dataset.
     """
-    dataset = dataset[((dataset[time_col] >= '2018-06-01') & (dataset[time_col] <= '2018-09-30')) | ((dataset[time_col] >= '2020-06-01') & (dataset[time_col] <= '2020-09-30'))]
+
+    dataset = dataset[time_window_mask(dataset[time_col], windows)]
 
     return dataset
 
 
+def time_window_mask(dates: pd.Series, windows: list = SUMMER_WINDOWS) -> pd.Series:
+    """
+    This function tells which dates fall inside any of the time windows. The dates can be
+    datetimes or ISO formatted strings.
+
+    Parameters
+    ----------
+    dates : pd.Series
+        The dates to be checked.
+    windows : list
+        The (start, end) dates of the time windows, both included.
+
+    Returns
+    -------
+    pd.Series
+        True for the dates inside a window.
+    """
+
+    mask = pd.Series(False, index=dates.index)
+    for start, end in windows:
+        mask |= (dates >= start) & (dates <= end)
+
+    return mask
+
+
 def categorize_moment(hour):
     """
     This function categorizes the time of the day. The categories are: Morning, Afternoon and Night.
@@ -72,18 +179,40 @@ def categorize_moment(hour):
     str
         The category of the hour.
     """
-    
-    if 5 <= int(hour) < 12:
-        return "Morning"
-    elif 12 <= int(hour) < 18:
-        return "Afternoon"
-    else:
-        return "Night"
+
+    return _scale_label('moment', int(hour))
     
 
-def clusterize_vehicle_type(df: pd.DataFrame, col: str) -> pd.DataFrame:
+@lru_cache(maxsize=None)
+def load_vehicle_mapping(file: str = VEHICLE_MAPPING) -> dict:
     """
-    This function clusters the vehicle types in the dataset.
+    This function loads the vehicle type clusters from a mapping file. The file is a JSON object
+    with one list of raw vehicle codes per cluster, and it is compiled into a code -> cluster lookup
+    table. The table is cached per file, so it must not be modified by the caller.
+
+    Parameters
+    ----------
+    file : str
+        The path of the mapping file.
+
+    Returns
+    -------
+    dict
+        The lookup table from raw vehicle code to cluster.
+    """
+
+    with open(file) as f:
+        clusters = json.load(f)
+
+    return {code: cluster for cluster, codes in clusters.items() for code in codes}
+
+
+@traced()
+def clusterize_vehicle_type(df: pd.DataFrame, col: str, mapping: dict = None, unknown: str = 'UNKNOWN') -> pd.DataFrame:
+    """
+    This function clusters the vehicle types in the dataset. The column is factorized first, so
+    each distinct vehicle code is looked up once and the result is stored as a categorical column.
+    Codes not present in the mapping are kept as they are and missing values become unknown.
 
     Parameters
     ----------
@@ -91,6 +220,10 @@ def clusterize_vehicle_type(df: pd.DataFrame, col: str) -> pd.DataFrame:
         The dataset to be clustered.
     col : str
         The column to be clustered.
+    mapping : dict
+        The lookup table from raw vehicle code to cluster. By default, the one in VEHICLE_MAPPING.
+    unknown : str
+        The category given to missing values.
     
     Returns
     -------
@@ -98,21 +231,18 @@ def clusterize_vehicle_type(df: pd.DataFrame, col: str) -> pd.DataFrame:
         The clustered dataset.
     """
 
-    df[col] = df[col].replace(['SUV', 'FLAT', '3-DOOR', 'CHEVY EXPR', 'PC', 'ELEC. UNIC', 'E REVEL SC','F150XL PIC', '2- TO', 'NEW Y', 'STREE', 'RGS', 'OMR', 'DEMA-', 'BK', 'NYPD'], 'CAR')
-
-    df[col] = df[col].replace(['99999'], 'UNKNOWN')
-
-    df[col] = df[col].replace(['BULK AGRICULTURE', 'PK', 'TANK', 'SLINGSHOT', 'UTV', 'JOHN DEERE', '1C', 'STAK', 'PALLET', 'SPRIN', 'ACCES'], 'OTHERS')
+    if mapping is None:
+        mapping = load_vehicle_mapping()
 
-    df[col] = df[col].replace(['BOX', 'DOT EQUIPM', 'DRILL RIG', 'PAS', 'LOADE', 'SGWS', 'HEAVY'], 'TRUCK')
+    codes, uniques = pd.factorize(df[col])
+    clustered = [mapping.get(code, code) for code in uniques]
+    if (codes < 0).any():
+        clustered.append(unknown)
 
-    df[col] = df[col].replace(['MOTORIZED HOME', 'CHASSIS CAB', 'SWT', 'MESSAGE SI', 'RV', 'UHAUL', 'POSTO'], 'VAN')
+    categories = pd.Index(pd.unique(np.asarray(clustered, dtype=object)))
+    lookup = categories.get_indexer(clustered)
 
-    df[col] = df[col].replace(['MOPED', 'J1'], 'MOTORCYCLE')
-
-    df[col] = df[col].replace(['SANIT'], 'AMBULANCE')
-
-    df[col].fillna('UNKNOWN', inplace=True)
+    df[col] = pd.Categorical.from_codes(lookup[codes], categories=categories)
 
     return df
 
@@ -132,8 +262,44 @@ def imputation_with_ref_col(dataset: pd.DataFrame, imputed_col: str, reference_c
     imputed_value : str
         The value to be imputed.
     """
-    
-    dataset[imputed_col] = dataset.apply(lambda x: imputed_value if not pd.isnull(x[reference_col]) and pd.isnull(x[imputed_col]) else x[imputed_col], axis=1)
+
+    impute_with_ref_cols(dataset, [(imputed_col, reference_col, imputed_value)])
+
+
+@traced()
+def impute_with_ref_cols(dataset: pd.DataFrame, rules: list) -> dict:
+    """
+    This function applies a batch of imputation rules with reference columns in a single pass. Each
+    rule (imputed_col, reference_col, imputed_value) fills the missing values of imputed_col where
+    reference_col is not missing. The null masks of all the involved columns are computed once and
+    the dataset is modified in place. Rules are applied in order, so a column filled by a rule counts
+    as not missing for the following ones, as if imputation_with_ref_col was called once per rule.
+
+    Parameters
+    ----------
+    dataset : pd.DataFrame
+        The dataset to be imputed.
+    rules : list
+        The (imputed_col, reference_col, imputed_value) tuples to be applied.
+
+    Returns
+    -------
+    dict
+        The number of cells filled by each rule, keyed by (imputed_col, reference_col).
+    """
+
+    cols = list(dict.fromkeys(col for rule in rules for col in rule[:2]))
+    missing = {col: mask.to_numpy() for col, mask in dataset[cols].isna().items()}
+
+    filled = {}
+    for imputed_col, reference_col, imputed_value in rules:
+        mask = missing[imputed_col] & ~missing[reference_col]
+        if mask.any():
+            dataset.loc[mask, imputed_col] = imputed_value
+            missing[imputed_col] = missing[imputed_col] & ~mask
+        filled[(imputed_col, reference_col)] = filled.get((imputed_col, reference_col), 0) + int(mask.sum())
+
+    return filled
 
 
 def beaufort_scale(wind_speed_mps: float) -> str:
@@ -151,30 +317,7 @@ def beaufort_scale(wind_speed_mps: float) -> str:
         The category of the wind speed.
     """
 
-    if wind_speed_mps < 0.3:
-        return "Calm"
-    elif wind_speed_mps < 1.5:
-        return "Light Air"
-    elif wind_speed_mps < 3.4:
-        return "Light Breeze"
-    elif wind_speed_mps < 5.5:
-        return "Gentle Breeze"
-    elif wind_speed_mps < 8.0:
-        return "Moderate Breeze"
-    elif wind_speed_mps < 10.8:
-        return "Fresh Breeze"
-    elif wind_speed_mps < 13.9:
-        return "Strong Breeze"
-    elif wind_speed_mps < 17.2:
-        return "Near Gale"
-    elif wind_speed_mps < 20.8:
-        return "Gale"
-    elif wind_speed_mps < 24.5:
-        return "Strong Gale"
-    elif wind_speed_mps < 28.5:
-        return "Storm"
-    else:
-        return "Hurricane"
+    return _scale_label('beaufort', wind_speed_mps)
     
 
 def rain_intensity_scale(prcp_mm: float) -> str:
@@ -192,11 +335,303 @@ def rain_intensity_scale(prcp_mm: float) -> str:
         The category of the rain intensity.
     """
 
-    if prcp_mm < 2.5*24:
-        return "Slight"
-    elif prcp_mm < 10*24:
-        return "Moderate"
-    elif prcp_mm < 50*24:
-        return "Heavy"
-    else:
-        return "Violent"
\ No newline at end of file
+    return _scale_label('rain_intensity', prcp_mm)
+
+
+def register_scale(name: str, breakpoints: list, labels: list) -> None:
+    """
+    This function registers a categorization scale given by its breakpoints and labels. A value v
+    gets the label i when breakpoints[i-1] <= v < breakpoints[i], so there must be one label more
+    than breakpoints. Labels may repeat (e.g. Night at both ends of the day).
+
+    Parameters
+    ----------
+    name : str
+        The name of the scale.
+    breakpoints : list
+        The increasing thresholds that separate the categories.
+    labels : list
+        The label of each category.
+    """
+
+    breakpoints = np.asarray(breakpoints, dtype=float)
+    if len(labels) != len(breakpoints) + 1:
+        raise ValueError(f"Scale '{name}' needs {len(breakpoints) + 1} labels, got {len(labels)}.")
+    if np.any(np.diff(breakpoints) <= 0):
+        raise ValueError(f"Scale '{name}' breakpoints must be strictly increasing.")
+
+    categories = pd.unique(np.asarray(labels, dtype=object))
+    SCALES[name] = {
+        'breakpoints': breakpoints,
+        'labels': list(labels),
+        'categories': categories,
+        'codes': pd.Index(categories).get_indexer(labels),
+    }
+
+
+def categorize(values, scale: str):
+    """
+    This function categorizes a whole column at once according to a registered scale. It returns
+    the same categories as the scalar functions (e.g. beaufort_scale) but in a single vectorized pass.
+
+    Parameters
+    ----------
+    values : pd.Series or array-like
+        The values to be categorized.
+    scale : str
+        The name of the registered scale.
+
+    Returns
+    -------
+    pd.Series or pd.Categorical
+        The categories of the values, as a Series with the same index when values is a Series.
+    """
+
+    s = SCALES[scale]
+    bins = np.searchsorted(s['breakpoints'], np.asarray(values, dtype=float), side='right')
+    categories = pd.Categorical.from_codes(s['codes'][bins], categories=s['categories'])
+
+    if isinstance(values, pd.Series):
+        return pd.Series(categories, index=values.index, name=values.name)
+    return categories
+
+
+def _scale_label(scale: str, value: float) -> str:
+    """
+    This function returns the label of a single value according to a registered scale.
+    """
+
+    s = SCALES[scale]
+    return s['labels'][np.searchsorted(s['breakpoints'], value, side='right')]
+
+
+@traced()
+def derive_columns(dataset: pd.DataFrame) -> pd.DataFrame:
+    """
+    This function adds the year, day and time of the day columns derived from the crash date and time.
+
+    Parameters
+    ----------
+    dataset : pd.DataFrame
+        The dataset, with CRASH DATE as datetime and CRASH TIME as HH:MM.
+
+    Returns
+    -------
+    pd.DataFrame
+        The dataset with the YEAR, DAY NAME, TYPE OF DAY, CRASH TIME INTERVAL and TIME OF DAY columns.
+    """
+
+    hour = pd.to_numeric(dataset['CRASH TIME'].str.split(':').str[0])
+
+    dataset['YEAR'] = dataset['CRASH DATE'].dt.year
+    dataset['DAY NAME'] = dataset['CRASH DATE'].dt.day_name()
+    dataset['TYPE OF DAY'] = np.where(dataset['CRASH DATE'].dt.dayofweek < 5, 'Weekday', 'Weekend')
+    dataset['CRASH TIME INTERVAL'] = hour
+    dataset['TIME OF DAY'] = categorize(hour, 'moment')
+
+    return dataset
+
+
+@traced()
+def ingest_collisions(raw_file: str, out_file: str = store_path('collisions_clean.csv', 'Data/'), chunksize: int = 500000,
+                      windows: list = SUMMER_WINDOWS, rules: list = (), mapping: dict = None, date_format: str = '%m/%d/%Y') -> dict:
+    """
+    This function streams the raw collisions file in chunks through the whole preprocessing into a Parquet file.
+    Only the needed columns are parsed, the time window filter is applied to each chunk right after parsing it,
+    and every chunk is clustered, imputed, derived and appended to the output before reading the next one, so
+    memory depends on the chunk size and not on the size of the file. The output is moved to out_file once it is
+    complete, so an interrupted ingestion keeps the previous file.
+
+    Parameters
+    ----------
+    raw_file : str
+        The path of the raw Motor Vehicle Collisions CSV file.
+    out_file : str
+        The path of the Parquet file to be written (the store of collisions_clean.csv by default).
+    chunksize : int
+        The number of rows parsed at once.
+    windows : list
+        The (start, end) dates of the time windows to be kept.
+    rules : list
+        The (imputed_col, reference_col, imputed_value) imputation rules to be applied.
+    mapping : dict
+        The lookup table from raw vehicle code to cluster. By default, the one in VEHICLE_MAPPING.
+    date_format : str
+        The format of CRASH DATE in the raw file.
+
+    Returns
+    -------
+    dict
+        The number of rows read and written, and the number of cells filled by each imputation rule.
+    """
+
+    # Parquet is optional (see store.py), only the ingestion needs it
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if mapping is None:
+        mapping = load_vehicle_mapping()
+
+    stats = {'rows_read': 0, 'rows_written': 0, 'filled': {}}
+    writer = None
+    tmp_file = f'{out_file}.{os.getpid()}.tmp'
+
+    try:
+        for chunk in pd.read_csv(raw_file, usecols=list(RAW_COLUMNS), dtype=RAW_COLUMNS, chunksize=chunksize):
+            stats['rows_read'] += len(chunk)
+
+            chunk['CRASH DATE'] = pd.to_datetime(chunk['CRASH DATE'], format=date_format)
+            chunk = chunk[time_window_mask(chunk['CRASH DATE'], windows)].rename(columns=RAW_RENAME)
+            if chunk.empty:
+                continue
+
+            clusterize_vehicle_type(chunk, 'VEHICLE TYPE CODE 1', mapping)
+            for rule, filled in impute_with_ref_cols(chunk, list(rules)).items():
+                stats['filled'][rule] = stats['filled'].get(rule, 0) + filled
+            derive_columns(chunk)
+            chunk = chunk.astype({col: 'category' for col in CATEGORICAL if col in chunk.columns})
+
+            if writer is None:
+                # Categories change from chunk to chunk, so they are written as dictionaries with wide indices
+                schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+                schema = pa.schema([pa.field(f.name, pa.dictionary(pa.int32(), f.type.value_type)) if pa.types.is_dictionary(f.type) else f
+                                    for f in schema], metadata=schema.metadata)
+                writer = pq.ParquetWriter(tmp_file, schema)
+
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            stats['rows_written'] += len(chunk)
+        if writer is not None:
+            writer.close()
+            os.replace(tmp_file, out_file)
+    finally:
+        if writer is not None:
+            writer.close()
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+    return stats
+
+
+@traced()
+def aggregate_weather(raw_file: str, chunksize: int = 500000) -> pd.DataFrame:
+    """
+    This function aggregates the weather stations file into one row per day with the wind and rain scales.
+    Only the needed GHCN columns are parsed, with explicit dtypes. The stations are averaged per DATE from
+    the sums and counts of each chunk, so memory depends on the number of days and not on the number of
+    stations or rows. A missing PRCP means no rain was recorded, so it counts as 0; the other measures
+    are averaged over the stations that report them.
+
+    Parameters
+    ----------
+    raw_file : str
+        The path of the GHCN daily weather file, with one row per station and day.
+    chunksize : int
+        The number of rows parsed at once.
+
+    Returns
+    -------
+    pd.DataFrame
+        The daily AWND, PRCP, TMAX, TMIN and TOBS means, the BEAUFORT_SCALE and PRCP_SCALE categories
+        and the MEAN_TEMP of the day.
+    """
+
+    sums, counts = [], []
+    for chunk in pd.read_csv(raw_file, usecols=list(WEATHER_COLUMNS), dtype=WEATHER_COLUMNS, chunksize=chunksize):
+        chunk['PRCP'] = chunk['PRCP'].fillna(0)
+        groups = chunk.groupby('DATE', sort=False)
+        sums.append(groups.sum())
+        counts.append(groups.count())
+
+    weather = pd.concat(sums).groupby(level=0).sum() / pd.concat(counts).groupby(level=0).sum()
+    weather = weather.sort_index().rename_axis('DATE').reset_index()
+
+    weather['BEAUFORT_SCALE'] = categorize(weather['AWND'], 'beaufort')
+    weather['PRCP_SCALE'] = categorize(weather['PRCP'], 'rain_intensity')
+    weather['MEAN_TEMP'] = weather[['TMAX', 'TMIN', 'TOBS']].mean(axis=1)
+
+    return weather
+
+
+@traced()
+def merge_collision_counts(weather: pd.DataFrame, collisions: pd.DataFrame) -> pd.DataFrame:
+    """
+    This function joins the daily collision counts and the temperature scale to the daily weather.
+
+    Parameters
+    ----------
+    weather : pd.DataFrame
+        The daily weather, as returned by aggregate_weather.
+    collisions : pd.DataFrame
+        The collisions, with their CRASH DATE.
+
+    Returns
+    -------
+    pd.DataFrame
+        The daily weather with the COLLISION COUNT, the 2 degree TEMP_SCALE interval (empty outside
+        TEMP_BINS) and a CASES_COUNT of 1 to count days in the charts.
+    """
+
+    # Counting before formatting the dates keeps the string work to one value per day
+    counts = collisions['CRASH DATE'].value_counts()
+    counts.index = pd.to_datetime(counts.index).strftime('%Y-%m-%d')
+    counts = counts.groupby(level=0).sum()
+
+    merged = weather.copy()
+    merged['COLLISION COUNT'] = merged['DATE'].map(counts).fillna(0).astype('int64')
+    merged['TEMP_SCALE'] = pd.cut(merged['MEAN_TEMP'], bins=TEMP_BINS, right=False,
+                                  labels=[f'[{a}, {b})' for a, b in zip(TEMP_BINS[:-1], TEMP_BINS[1:])])
+    merged['CASES_COUNT'] = 1
+
+    return merged
+
+
+@traced()
+def preprocess_weather(raw_file: str = 'Data/weather_2018-2020.csv', collisions: pd.DataFrame = None,
+                       path: str = 'Data/') -> pd.DataFrame:
+    """
+    This function regenerates weather_aggregated.csv and merged_data.csv from the weather stations file.
+    The merged data is also written to its columnar store, which the dashboard reads first.
+
+    Parameters
+    ----------
+    raw_file : str
+        The path of the GHCN daily weather file.
+    collisions : pd.DataFrame
+        The collisions with their CRASH DATE. By default, the ones of collisions_clean.csv (or its store)
+        in path.
+    path : str
+        The folder where the files are read and written.
+
+    Returns
+    -------
+    pd.DataFrame
+        The merged data.
+    """
+
+    if collisions is None:
+        if not (os.path.exists(path + 'collisions_clean.csv') or os.path.exists(store_path('collisions_clean.csv', path))):
+            raise FileNotFoundError(f'There is no {path}collisions_clean.csv nor its store, run ingest_collisions first '
+                                    'or pass the collisions')
+        collisions = read_store('collisions_clean.csv', path, ['CRASH DATE'])
+
+    weather = aggregate_weather(raw_file)
+    weather.to_csv(path + 'weather_aggregated.csv', index=False)
+
+    merged = merge_collision_counts(weather, collisions)
+    merged.to_csv(path + 'merged_data.csv', index=False)
+    write_store(merged, 'merged_data.csv', path)
+
+    return merged
+
+
+####################################################################################################
+# SCALES ################################################################################## SCALES #
+####################################################################################################
+register_scale('moment', [5, 12, 18], ['Night', 'Morning', 'Afternoon', 'Night'])
+
+register_scale('beaufort',
+               [0.3, 1.5, 3.4, 5.5, 8.0, 10.8, 13.9, 17.2, 20.8, 24.5, 28.5],
+               ['Calm', 'Light Air', 'Light Breeze', 'Gentle Breeze', 'Moderate Breeze', 'Fresh Breeze',
+                'Strong Breeze', 'Near Gale', 'Gale', 'Strong Gale', 'Storm', 'Hurricane'])
+
+register_scale('rain_intensity', [2.5*24, 10*24, 50*24], ['Slight', 'Moderate', 'Heavy', 'Violent'])
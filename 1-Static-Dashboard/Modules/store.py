@@ -0,0 +1,238 @@
+####################################################################################################
+__author__ = "Juan P. Zaldivar & Enric Millan"
+__version__ = "1.0.0"
+####################################################################################################
+
+"""
+This module contains the functions to write and read the columnar data store of the dashboard.
+
+The store is a Parquet copy of a CSV file of the Data folder, with categorical dtypes for the
+repeated text columns. It is built by the preprocessing pipeline, or from the current CSV
+files running this module from the dashboard folder:
+
+    python Modules/store.py
+
+The dashboard compacts the loaded data with the dtypes of SCHEMA: categoricals with a fixed order
+of categories (so the days sort by the calendar) and downcast integers.
+
+Functions:
+----------
+
+store_path(file: str, path: str) -> str
+    Returns the path of the columnar store of a CSV file.
+
+write_store(df: pd.DataFrame, file: str, path: str) -> str
+    Writes a DataFrame to the columnar store of a CSV file.
+
+read_store(file: str, path: str, columns: list) -> pd.DataFrame
+    Reads the projected columns of a CSV file from its columnar store, or from the CSV if there is no store.
+
+optimize_dtypes(df: pd.DataFrame, schema: dict) -> tuple
+    Converts the columns of a DataFrame to the compact dtypes of a schema and reports the memory saved.
+"""
+
+####################################################################################################
+# IMPORTS ################################################################################ IMPORTS #
+####################################################################################################
+import os
+import sys
+import warnings
+import numpy as np
+import pandas as pd
+
+# Parquet is optional: without pyarrow the CSV files are read instead
+try:
+    from pyarrow import ArrowInvalid
+except ImportError:
+    ArrowInvalid = OSError
+
+
+####################################################################################################
+# GLOBAL VARIABLES ################################################################ GLOBAL VARIABLES #
+####################################################################################################
+CATEGORICAL = ['BOROUGH', 'VEHICLE TYPE CODE 1', 'CONTRIBUTING FACTOR VEHICLE 1', 'DAY NAME', 'TYPE OF DAY']
+
+STORE_FILES = ['collisions_clean.csv', 'weather_clean.csv', 'merged_data.csv']
+
+SCHEMA = {
+    'COLLISION_ID': 'int32',
+    'CRASH DATE': 'datetime64[ns]',
+    'BOROUGH': pd.CategoricalDtype(['BRONX', 'BROOKLYN', 'MANHATTAN', 'QUEENS', 'STATEN ISLAND']),
+    'VEHICLE TYPE CODE 1': 'category',
+    'CONTRIBUTING FACTOR VEHICLE 1': 'category',
+    'CRASH TIME INTERVAL': 'int8',
+    'DAY NAME': pd.CategoricalDtype(['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'], ordered=True),
+    'TYPE OF DAY': pd.CategoricalDtype(['Weekday', 'Weekend']),
+    'YEAR': 'int16',
+}
+
+
+####################################################################################################
+# FUNCTIONS ############################################################################ FUNCTIONS #
+####################################################################################################
+def store_path(file: str, path: str = './') -> str:
+    """
+    This function returns the path of the columnar store of a CSV file.
+
+    Parameters
+    ----------
+    file : str
+        Name of the CSV file.
+    path : str
+        Folder of the CSV file.
+
+    Returns
+    -------
+    str
+        Path of the Parquet file.
+    """
+
+    return path + os.path.splitext(file)[0] + '.parquet'
+
+
+def _write_parquet(df: pd.DataFrame, out: str) -> None:
+    """
+    This function writes a DataFrame to a temporary Parquet file next to out and then moves it to out,
+    so a reader finds the previous file or the new one, never a partial one.
+    """
+
+    tmp = f'{out}.{os.getpid()}.tmp'
+    try:
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, out)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def write_store(df: pd.DataFrame, file: str, path: str = './') -> str:
+    """
+    This function writes a DataFrame to the columnar store of a CSV file, replacing the previous store
+    atomically.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Data to be stored.
+    file : str
+        Name of the CSV file the store replaces.
+    path : str
+        Folder of the CSV file.
+
+    Returns
+    -------
+    str
+        Path of the Parquet file.
+    """
+
+    store = store_path(file, path)
+    df = df.astype({col: 'category' for col in CATEGORICAL if col in df.columns})
+    _write_parquet(df, store)
+
+    return store
+
+
+def read_store(file: str, path: str = './', columns: list = None) -> pd.DataFrame:
+    """
+    This function reads the projected columns of a CSV file from its columnar store, memory-mapped.
+    When there is no store, no Parquet engine installed or an unreadable store (e.g. one truncated
+    by an interrupted write) the CSV file is parsed instead.
+
+    Parameters
+    ----------
+    file : str
+        Name of the CSV file.
+    path : str
+        Folder of the CSV file.
+    columns : list
+        Columns to be read, all of them by default.
+
+    Returns
+    -------
+    pd.DataFrame
+        The data, with the columns in the requested order.
+    """
+
+    store = store_path(file, path)
+    if os.path.exists(store):
+        try:
+            return pd.read_parquet(store, columns=columns, memory_map=True)
+        except ImportError:
+            pass
+        except (OSError, ArrowInvalid) as e:
+            warnings.warn(f'Unreadable store {store} ({e}), reading {path + file} instead', stacklevel=2)
+
+    df = pd.read_csv(path + file, usecols=columns)
+
+    return df if columns is None else df[columns]
+
+
+def _convert(values: pd.Series, dtype) -> pd.Series:
+    """
+    This function converts a column to a dtype of the schema. Categories missing from a fixed order
+    are appended (sorted) instead of becoming NaN, and integer columns with NaN, decimals or values
+    out of range are left as they are.
+    """
+
+    if isinstance(dtype, pd.CategoricalDtype):
+        extra = sorted(set(values.dropna().unique()) - set(dtype.categories))
+        if extra:
+            dtype = pd.CategoricalDtype(list(dtype.categories) + extra, ordered=dtype.ordered)
+        return values.astype(dtype)
+
+    if str(dtype).startswith('datetime64'):
+        return pd.to_datetime(values).astype(dtype)
+
+    if pd.api.types.is_integer_dtype(dtype):
+        if values.isna().any():
+            return values
+        info = np.iinfo(dtype)
+        numbers = values.to_numpy()
+        if numbers.min(initial=0) < info.min or numbers.max(initial=0) > info.max or not np.array_equal(numbers, np.round(numbers)):
+            return values
+
+    return values.astype(dtype)
+
+
+def optimize_dtypes(df: pd.DataFrame, schema: dict = SCHEMA) -> tuple:
+    """
+    This function converts the columns of a DataFrame to the compact dtypes of a schema and reports
+    the memory saved. Columns missing from the schema are kept as they are.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Data to be converted.
+    schema : dict
+        Dtype of each column (a dtype name or a pd.CategoricalDtype with a fixed order).
+
+    Returns
+    -------
+    pd.DataFrame
+        The converted data.
+    dict
+        Memory of the data before and after the conversion (deep, in bytes) and the dtypes changed.
+    """
+
+    before = int(df.memory_usage(deep=True).sum())
+    dtypes = df.dtypes
+
+    df = df.assign(**{col: _convert(df[col], dtype) for col, dtype in schema.items() if col in df.columns})
+
+    report = {
+        'bytes_before': before,
+        'bytes_after': int(df.memory_usage(deep=True).sum()),
+        'dtypes': {col: f'{dtypes[col]} -> {df[col].dtype}' for col in df.columns if str(dtypes[col]) != str(df[col].dtype)},
+    }
+
+    return df, report
+
+
+if __name__ == '__main__':
+    for file in STORE_FILES:
+        if os.path.exists('Data/' + file):
+            print(write_store(pd.read_csv('Data/' + file), file, 'Data/'))
+        elif os.path.exists(store_path(file, 'Data/')):
+            print(f'Kept {store_path(file, "Data/")}: there is no Data/{file}', file=sys.stderr)
+        else:
+            print(f'Skipped Data/{file}: there is no CSV file nor store (see preprocessing)', file=sys.stderr)
@@ -0,0 +1,137 @@
+####################################################################################################
+__author__ = "Juan P. Zaldivar & Enric Millan"
+__version__ = "1.0.0"
+####################################################################################################
+
+"""
+This module contains the functions to cache the chart builders by dataset version.
+
+A dataset is hashed once when it is loaded (dataset_version) and the caller passes that version to
+the chart builders along with the slice of the data they plot. The chart cache keys a call by the
+version, the columns of its dataframes and its other arguments, without hashing the dataframes,
+so a rerun looks a chart up without hashing every slice as st.cache_data does. A call with a
+dataframe and no version is not cached. The cache is an LRU of at most CACHE_ENTRIES charts per
+builder. The builders must not modify their dataframes and the cached charts are shared between
+reruns, so they must not be modified either.
+
+Functions:
+----------
+
+dataset_version(df: pd.DataFrame) -> str
+    Returns the content hash of a dataframe.
+
+version_cache(fn: callable, max_entries: int) -> callable
+    Decorator that caches a function by the version of its data and its other arguments.
+"""
+
+####################################################################################################
+# IMPORTS ################################################################################ IMPORTS #
+####################################################################################################
+import hashlib
+import inspect
+import threading
+import functools
+import collections
+import pandas as pd
+
+
+####################################################################################################
+# GLOBAL VARIABLES ################################################################ GLOBAL VARIABLES #
+####################################################################################################
+CACHE_ENTRIES = 32
+
+
+####################################################################################################
+# FUNCTIONS ############################################################################ FUNCTIONS #
+####################################################################################################
+def dataset_version(df: pd.DataFrame) -> str:
+    """
+    This function returns the content hash of a dataframe: its columns, dtypes and values.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The dataframe.
+
+    Returns
+    -------
+    str
+        The hash of the dataframe.
+    """
+
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr(list(df.dtypes.astype(str).items())).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+
+    return digest.hexdigest()
+
+
+def _key(value):
+    """
+    This function returns the cache key of an argument. A dataframe is keyed by its columns only,
+    its content is given by the version.
+    """
+
+    if isinstance(value, pd.DataFrame):
+        return ('frame', tuple(value.columns))
+
+    return value
+
+
+def version_cache(fn=None, max_entries: int = CACHE_ENTRIES):
+    """
+    This function caches a function by its version argument, the columns of its dataframe
+    arguments and its other (hashable) arguments, evicting the least recently used result when the
+    cache holds max_entries. The dataframes are not hashed: a call with a dataframe and without a
+    version runs the function without caching it. It can be passed to cached() like st.cache_data.
+    The cache is cleared with clear().
+
+    Parameters
+    ----------
+    fn : callable
+        The function, or None to get a decorator with the given max_entries.
+    max_entries : int
+        The maximum number of results kept.
+
+    Returns
+    -------
+    callable
+        The cached function, or the decorator.
+    """
+
+    if fn is None:
+        return functools.partial(version_cache, max_entries=max_entries)
+
+    signature = inspect.signature(fn)
+    cache = collections.OrderedDict()
+    lock = threading.Lock()
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        arguments = signature.bind(*args, **kwargs)
+        arguments.apply_defaults()
+        arguments = arguments.arguments
+
+        frames = any(isinstance(v, pd.DataFrame) for v in arguments.values())
+        if frames and arguments.get('version') is None:
+            return fn(*args, **kwargs)
+
+        key = tuple((k, _key(v)) for k, v in arguments.items())
+
+        with lock:
+            if key in cache:
+                cache.move_to_end(key)
+                return cache[key]
+
+        result = fn(*args, **kwargs)
+
+        with lock:
+            cache[key] = result
+            cache.move_to_end(key)
+            while len(cache) > max_entries:
+                cache.popitem(last=False)
+
+        return result
+
+    wrapper.clear = cache.clear
+    return wrapper
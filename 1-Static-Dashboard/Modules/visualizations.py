@@ -9,25 +9,25 @@ This module contains the functions to create the final visualizations.
 Functions:
 ----------
 
-plot_radial_chart(df: pd.DataFrame) -> alt.Chart
+plot_radial_chart(df: pd.DataFrame, version: str) -> alt.Chart
     Creates a radial chart to show the number of collisions by vehicle type.
 
-plot_line_chart(df: pd.DataFrame) -> alt.Chart
+plot_line_chart(df: pd.DataFrame, version: str) -> alt.Chart
     Creates a line chart to show the number of collisions during the day by borough.
 
 plot_hex_chart() -> alt.Chart
     Creates a hexagonal map chart to show the number of collisions by borough.
 
-plot_bar_chart(df: pd.DataFrame) -> alt.Chart
+plot_bar_chart(df: pd.DataFrame, version: str) -> alt.Chart
     Creates a bar chart to show the number of collisions by contributing factor.
 
-plot_heatmap(df: pd.DataFrame) -> alt.Chart
+plot_heatmap(df: pd.DataFrame, version: str) -> alt.Chart
     Creates a heatmap to show the number of collisions by hour of the day and day of the week.
 
-plot_slope_chart(df: pd.DataFrame) -> alt.Chart
+plot_slope_chart(df: pd.DataFrame, version: str) -> alt.Chart
     Creates a slope chart to show the number of collisions by day type.
 
-plot_scatterplots(df: pd.DataFrame) -> alt.Chart
+plot_scatterplots(df: pd.DataFrame, version: str) -> alt.Chart
     Creates three scatterplots to compare the number of df with the weather conditions.
 
 plot_cars(idx: int, year: str)
@@ -39,7 +39,11 @@ plot_cars(idx: int, year: str)
 ####################################################################################################
 import pandas as pd
 import altair as alt
-import streamlit as st
+from Modules.assets import asset_data
+from Modules.geometry import topo_feature
+from Modules.instrumentation import cached
+from Modules.payload import budgeted
+from Modules.versions import version_cache
 
 
 ####################################################################################################
@@ -53,8 +57,9 @@ colores_hex = ['#a3ffd6', '#d69bf5', '#ff8080', '#80ff80', '#80bfff', '#ffff66',
 ####################################################################################################
 # FUNCTIONS ############################################################################ FUNCTIONS #
 ####################################################################################################
-@st.cache_data
-def plot_radial_chart(df: pd.DataFrame) -> alt.Chart:
+@cached(version_cache)
+@budgeted()
+def plot_radial_chart(df: pd.DataFrame, version: str = None) -> alt.Chart:
     """
     Creates a radial chart to show the number of collisions by vehicle type.
 
@@ -62,6 +67,8 @@ def plot_radial_chart(df: pd.DataFrame) -> alt.Chart:
     ----------
     df : pd.DataFrame
         Dataframe with the collisions data.
+    version : str
+        Version of the data (see dataset_version), only used to key the cache.
     
     Returns
     -------
@@ -99,8 +106,9 @@ def plot_radial_chart(df: pd.DataFrame) -> alt.Chart:
     return alt.layer(c + text).properties(title='Collisions by Vehicle Type')
 
 
-@st.cache_data
-def plot_line_chart(df: pd.DataFrame) -> alt.Chart:
+@cached(version_cache)
+@budgeted()
+def plot_line_chart(df: pd.DataFrame, version: str = None) -> alt.Chart:
     """
     Creates a line chart to show the number of collisions during the day by borough.
 
@@ -108,6 +116,8 @@ def plot_line_chart(df: pd.DataFrame) -> alt.Chart:
     ----------
     df : pd.DataFrame
         Dataframe with the collisions data.
+    version : str
+        Version of the data (see dataset_version), only used to key the cache.
     
     Returns
     -------
@@ -123,9 +133,7 @@ def plot_line_chart(df: pd.DataFrame) -> alt.Chart:
     })
 
     population['MEAN POPULATION'] = population[['POPULATION_2018', 'POPULATION_2020']].mean(axis=1)
-    df.insert(0, 'COUNT', 1)
-
-    df = df.groupby(['BOROUGH', 'CRASH TIME INTERVAL']).count().reset_index()
+    df = df.groupby(['BOROUGH', 'CRASH TIME INTERVAL'], observed=True).size().reset_index(name='COUNT')
     df = df.merge(population[['BOROUGH', 'MEAN POPULATION', 'CAR OWNERSHIP']], on='BOROUGH', how='left')
     df['NORMALIZED COUNT'] = df['COUNT'] * df['CAR OWNERSHIP'] 
 
@@ -150,7 +158,8 @@ def plot_line_chart(df: pd.DataFrame) -> alt.Chart:
     return c
 
 
-@st.cache_data
+@cached(version_cache)
+@budgeted()
 def plot_hex_chart() -> alt.Chart:
     """
     Creates a hexagonal map chart to show the number of collisions by borough.
@@ -161,8 +170,7 @@ def plot_hex_chart() -> alt.Chart:
         Hexagonal map chart with the number of collisions by borough.
     """
 
-    hex_url = 'https://raw.githubusercontent.com/0J0P0/Visualization-Project/main/Data/new-york-city-boroughs-ny_hex.geojson'
-    df = alt.Data(url=hex_url, format=alt.DataFormat(property="features"))
+    df = topo_feature('hex')
 
     c1 = alt.Chart(df).mark_geoshape(
         stroke='white',
@@ -181,8 +189,7 @@ def plot_hex_chart() -> alt.Chart:
         title='Collisions by Borough'
     )
 
-    map_url = 'https://raw.githubusercontent.com/0J0P0/Visualization-Project/main/Data/new-york-city-boroughs-ny_.geojson'
-    borders = alt.Data(url=map_url, format=alt.DataFormat(property="features"))
+    borders = topo_feature('boroughs')
     
     c2 = alt.Chart(borders).mark_geoshape(
         stroke='#8367C7',
@@ -194,7 +201,7 @@ def plot_hex_chart() -> alt.Chart:
         type='identity', reflectY=True
     )
 
-    boroughs = pd.read_csv('./Data/new-york-city-boroughs-names.csv')
+    boroughs = asset_data('new-york-city-boroughs-names.csv')
 
     c3 = alt.Chart(boroughs).mark_text(
         fontWeight='bold',
@@ -210,8 +217,9 @@ def plot_hex_chart() -> alt.Chart:
     return (c1 + c2 + c3)
 
 
-@st.cache_data
-def plot_bar_chart(df: pd.DataFrame) -> alt.Chart:
+@cached(version_cache)
+@budgeted()
+def plot_bar_chart(df: pd.DataFrame, version: str = None) -> alt.Chart:
     """
     Creates a bar chart to show the number of collisions by contributing factor.
 
@@ -219,6 +227,8 @@ def plot_bar_chart(df: pd.DataFrame) -> alt.Chart:
     ----------
     df : pd.DataFrame
         Dataframe with the collisions data.
+    version : str
+        Version of the data (see dataset_version), only used to key the cache.
     
     Returns
     -------
@@ -226,7 +236,7 @@ def plot_bar_chart(df: pd.DataFrame) -> alt.Chart:
         Bar chart with the number of collisions by contributing factor.
     """
 
-    df = df.groupby('CONTRIBUTING FACTOR VEHICLE 1').count().reset_index()
+    df = df.groupby('CONTRIBUTING FACTOR VEHICLE 1', observed=True).count().reset_index()
     df = df.sort_values(by='COLLISION_ID', ascending=False)
 
     df = df[df['CONTRIBUTING FACTOR VEHICLE 1'] != 'Unspecified']
@@ -252,8 +262,9 @@ def plot_bar_chart(df: pd.DataFrame) -> alt.Chart:
     return c
 
 
-@st.cache_data
-def plot_heatmap(df: pd.DataFrame) -> alt.Chart:
+@cached(version_cache)
+@budgeted()
+def plot_heatmap(df: pd.DataFrame, version: str = None) -> alt.Chart:
     """
     Creates a heatmap to show the number of collisions by hour of the day and day of the week.
 
@@ -261,6 +272,8 @@ def plot_heatmap(df: pd.DataFrame) -> alt.Chart:
     ----------
     df : pd.DataFrame
         Dataframe with the collisions data.
+    version : str
+        Version of the data (see dataset_version), only used to key the cache.
     
     Returns
     -------
@@ -291,8 +304,9 @@ def plot_heatmap(df: pd.DataFrame) -> alt.Chart:
     return c1
 
 
-@st.cache_data
-def plot_slope_chart(df: pd.DataFrame) -> alt.Chart:
+@cached(version_cache)
+@budgeted()
+def plot_slope_chart(df: pd.DataFrame, version: str = None) -> alt.Chart:
     """
     Creates a slope chart to show the number of collisions by day type.
 
@@ -300,6 +314,8 @@ def plot_slope_chart(df: pd.DataFrame) -> alt.Chart:
     ----------
     df : pd.DataFrame
         Dataframe with the collisions data.
+    version : str
+        Version of the data (see dataset_version), only used to key the cache.
     
     Returns
     -------
@@ -307,8 +323,7 @@ def plot_slope_chart(df: pd.DataFrame) -> alt.Chart:
         Slope chart with the number of collisions by day type.
     """
 
-    df.insert(0, 'COUNT', 1)
-    df = df.groupby(['YEAR', 'TYPE OF DAY']).count().reset_index()
+    df = df.groupby(['YEAR', 'TYPE OF DAY'], observed=True).size().reset_index(name='COUNT')
     df['COUNT'] = df.apply(lambda x: x['COUNT']/5 if x['TYPE OF DAY'] == 'Weekday' else x['COUNT']/2, axis=1)
 
     slope = alt.Chart(df).mark_line().encode(
@@ -330,8 +345,9 @@ def plot_slope_chart(df: pd.DataFrame) -> alt.Chart:
     return alt.layer(slope, pts).properties(height=300, title='Collisions by Day Type')
 
 
-@st.cache_data
-def plot_scatterplots(df: pd.DataFrame) -> alt.Chart:
+@cached(version_cache)
+@budgeted()
+def plot_scatterplots(df: pd.DataFrame, version: str = None) -> alt.Chart:
     """
     Creates three scatterplots to compare the number of df with the weather conditions.
 
@@ -339,6 +355,8 @@ def plot_scatterplots(df: pd.DataFrame) -> alt.Chart:
     ----------
     df : pd.DataFrame
         Dataframe with the merged data.
+    version : str
+        Version of the data (see dataset_version), only used to key the cache.
     
     Returns
     -------
@@ -395,7 +413,8 @@ def plot_scatterplots(df: pd.DataFrame) -> alt.Chart:
     return t1, t2, t3
 
 
-@st.cache_data
+@cached(version_cache)
+@budgeted()
 def plot_cars(idx: int, year: str):
     """
     Creates a row of cars to show the number of collisions with injured people.
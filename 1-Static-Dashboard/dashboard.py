@@ -9,16 +9,36 @@ __version__ = "1.0.0"
 import pandas as pd
 import streamlit as st
 from Modules.visualizations import *
+from Modules.store import read_store, optimize_dtypes
+from Modules.versions import dataset_version
+from Modules.instrumentation import span, cached, render
+
+
+####################################################################################################
+# GLOBAL VARIABLES ################################################################ GLOBAL VARIABLES #
+####################################################################################################
+COLLISION_COLUMNS = ['COLLISION_ID', 'BOROUGH', 'VEHICLE TYPE CODE 1', 'CONTRIBUTING FACTOR VEHICLE 1', 'CRASH TIME INTERVAL', 'DAY NAME', 'TYPE OF DAY', 'YEAR']
+
+MERGED_COLUMNS = ['DATE', 'MEAN_TEMP', 'PRCP', 'AWND', 'COLLISION COUNT']
 
 
 ####################################################################################################
 # FUNCTIONS ############################################################################ FUNCTIONS #
 ####################################################################################################
-@st.cache_data
-def load_data(file: str, path: str = "./") -> pd.DataFrame:
-    return pd.read_csv(path + file)
+@cached(st.cache_data)
+def load_data(file: str, path: str = "./", columns: list = None) -> tuple:
+    df, memory = optimize_dtypes(read_store(file, path, columns))
+    # Version of the data, hashed once here and passed to the charts to key their cache
+    return df, memory, dataset_version(df)
+
+
+def show(chart: alt.Chart, view: str) -> None:
+    # Serialization of the chart to Vega-Lite and sending it to the browser
+    with span('st.altair_chart', view=view):
+        st.altair_chart(chart, use_container_width=True)
 
 
+@render('static')
 def app():
     st.set_page_config(page_title="Visualization Project", page_icon=":bar_chart:", layout="wide")
     st.header("Vehicle Collisions Analysis in New York City")
@@ -28,53 +48,53 @@ def app():
 
 
     # ----- LOAD DATA -----
-    collisions = load_data("collisions_clean.csv", "Data/")
-    weather = load_data("weather_clean.csv", "Data/")
+    collisions, memory, version = load_data("collisions_clean.csv", "Data/", COLLISION_COLUMNS)
+    weather, _, _ = load_data("weather_clean.csv", "Data/")
 
     # ----- DATA DASHBOARD -----
     col1, col2 = st.columns([1, 1.8])
     with col1:
-        c = plot_radial_chart(collisions[['VEHICLE TYPE CODE 1']])
-        st.altair_chart(c, use_container_width=True)
+        c = plot_radial_chart(collisions[['VEHICLE TYPE CODE 1']], version)
+        show(c, 'radial_chart')
 
     with col2:
-        c = plot_line_chart(collisions[['BOROUGH', 'CRASH TIME INTERVAL']])
-        st.altair_chart(c, use_container_width=True)
+        c = plot_line_chart(collisions[['BOROUGH', 'CRASH TIME INTERVAL']], version)
+        show(c, 'line_chart')
 
     col1, col2 = st.columns(2)
     with col1:
-        c = plot_bar_chart(collisions[['CONTRIBUTING FACTOR VEHICLE 1', 'COLLISION_ID']])
-        st.altair_chart(c, use_container_width=True)
+        c = plot_bar_chart(collisions[['CONTRIBUTING FACTOR VEHICLE 1', 'COLLISION_ID']], version)
+        show(c, 'bar_chart')
 
     with col2:
         c = plot_hex_chart()
-        st.altair_chart(c, use_container_width=True)
+        show(c, 'hex_chart')
 
     col1, col2 = st.columns([3, 1])
     with col1:
-        c = plot_heatmap(collisions[['CRASH TIME INTERVAL', 'DAY NAME', 'YEAR']])
-        st.altair_chart(c, use_container_width=True)
+        c = plot_heatmap(collisions[['CRASH TIME INTERVAL', 'DAY NAME', 'YEAR']], version)
+        show(c, 'heatmap')
 
     with col2:
-        c = plot_slope_chart(collisions[['YEAR', 'TYPE OF DAY']])
-        st.altair_chart(c, use_container_width=True)
+        c = plot_slope_chart(collisions[['YEAR', 'TYPE OF DAY']], version)
+        show(c, 'slope_chart')
 
     col1, col2, col3 = st.columns(3)
-    comb_data = load_data('merged_data.csv', 'Data/')
-    c1, c2, c3 = plot_scatterplots(comb_data)
+    comb_data, _, comb_version = load_data('merged_data.csv', 'Data/', MERGED_COLUMNS)
+    c1, c2, c3 = plot_scatterplots(comb_data, comb_version)
     
     with col1:
-        st.altair_chart(c1, use_container_width=True)
+        show(c1, 'scatterplot 1')
     with col2:
-        st.altair_chart(c2, use_container_width=True)
+        show(c2, 'scatterplot 2')
     with col3:
-        st.altair_chart(c3, use_container_width=True)
+        show(c3, 'scatterplot 3')
 
     # ----- DATA METRICS -----
     col1, col2, col3, col4 = st.columns([5, 1, 1, 1])
     with col1:
         c = plot_cars(5, '2018')
-        st.altair_chart(c, use_container_width=True)
+        show(c, 'cars 2018')
     with col2:
         st.metric(label='Deaths 2018', value='177', delta='')
     with col3:
@@ -85,7 +105,7 @@ def app():
     col1, col2, col3, col4 = st.columns([5, 1, 1, 1])
     with col1:
         c = plot_cars(9, '2020')
-        st.altair_chart(c, use_container_width=True)
+        show(c, 'cars 2020')
     with col2:
         st.metric(label='Deaths 2020', value='228', delta='29%')
     with col3:
@@ -96,6 +116,7 @@ def app():
     # ----- DATA PREVIEW -----
     with st.expander("Collisions Data Preview"):
         st.dataframe(collisions.head())
+        st.caption(f"{memory['bytes_before'] / 2**20:.2f} MB loaded, {memory['bytes_after'] / 2**20:.2f} MB in memory after optimizing the dtypes")
     with st.expander("Weather Data Preview"):
         st.dataframe(weather.head())
 
@@ -0,0 +1,27 @@
+####################################################################################################
+__author__ = "Juan P. Zaldivar & Enric Millan"
+__version__ = "1.0.0"
+####################################################################################################
+
+import os
+import sys
+import pytest
+
+
+PROJECT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(autouse=True)
+def project(monkeypatch):
+    """
+    This function runs a test from the dashboard folder, as the dashboard runs, with the Modules of
+    this project (both dashboards have a Modules package) and without the timing log.
+    """
+
+    for name in [m for m in sys.modules if m in ('Modules', 'dashboard') or m.startswith('Modules.')]:
+        monkeypatch.delitem(sys.modules, name)
+    monkeypatch.syspath_prepend(PROJECT)
+    monkeypatch.chdir(PROJECT)
+    monkeypatch.setenv('DASHBOARD_SPANS', '')
+
+    return PROJECT
@@ -0,0 +1,23 @@
+####################################################################################################
+__author__ = "Juan P. Zaldivar & Enric Millan"
+__version__ = "1.0.0"
+####################################################################################################
+
+import json
+import altair as alt
+
+
+def test_auto_mode_serves_map_layers_and_inlines_small_files(tmp_path, monkeypatch):
+    from Modules import assets
+
+    static = f'{tmp_path}/static/'
+    monkeypatch.setattr(assets, 'STATIC', static)
+
+    layer = assets.asset_data('new-york-city-boroughs-ny_hex.topojson', mode='auto')
+    names = assets.asset_data('new-york-city-boroughs-names.csv', mode='auto')
+
+    assert isinstance(layer, alt.UrlData)
+    assert isinstance(names, alt.InlineData)
+
+    with open(static + layer.url.split('/')[-1]) as f:
+        assert json.load(f) == assets.asset_data('new-york-city-boroughs-ny_hex.topojson', mode='inline').values
@@ -0,0 +1,37 @@
+####################################################################################################
+__author__ = "Juan P. Zaldivar & Enric Millan"
+__version__ = "1.0.0"
+####################################################################################################
+
+import numpy as np
+import pandas as pd
+
+
+def test_the_schema_compacts_the_data_without_losing_values():
+    from Modules.store import optimize_dtypes
+
+    df = pd.DataFrame({
+        'COLLISION_ID': np.arange(1000, dtype='int64'),
+        'CRASH DATE': pd.date_range('2018-06-01', periods=1000, freq='h').astype(str),
+        'BOROUGH': ['BRONX', 'QUEENS', 'UNKNOWN', None] * 250,
+        'DAY NAME': ['Sunday', 'Monday'] * 500,
+        'CRASH TIME INTERVAL': [1.0, 2.5] * 500,
+        'YEAR': [2018, 70000] * 500,
+        'OTHER': ['a'] * 1000,
+    })
+
+    optimized, memory = optimize_dtypes(df)
+
+    assert optimized['COLLISION_ID'].dtype == 'int32'
+    assert optimized['CRASH DATE'].dtype == 'datetime64[ns]'
+    # A borough missing from the fixed order is appended, not turned into NaN
+    assert list(optimized['BOROUGH'].cat.categories) == ['BRONX', 'BROOKLYN', 'MANHATTAN', 'QUEENS', 'STATEN ISLAND', 'UNKNOWN']
+    assert optimized['BOROUGH'].isna().sum() == 250
+    assert optimized['DAY NAME'].cat.ordered and optimized['DAY NAME'].min() == 'Monday'
+    # Decimals and values out of range keep their dtype
+    assert optimized['CRASH TIME INTERVAL'].dtype == 'float64' and optimized['YEAR'].dtype == 'int64'
+    assert optimized['OTHER'].dtype == df['OTHER'].dtype
+
+    assert memory['bytes_before'] == df.memory_usage(deep=True).sum()
+    assert memory['bytes_after'] == optimized.memory_usage(deep=True).sum() < memory['bytes_before']
+    assert set(memory['dtypes']) == {'COLLISION_ID', 'CRASH DATE', 'BOROUGH', 'DAY NAME'}
@@ -0,0 +1,26 @@
+####################################################################################################
+__author__ = "Juan P. Zaldivar & Enric Millan"
+__version__ = "1.0.0"
+####################################################################################################
+
+import shutil
+import geopandas as gpd
+
+
+def test_map_layers_keep_their_features_with_fewer_bytes(tmp_path):
+    from Modules.geometry import LAYERS, build_layers
+
+    for file, _ in LAYERS.values():
+        shutil.copy(f'Data/{file}', tmp_path)
+
+    reports = build_layers(f'{tmp_path}/')
+
+    assert [report['feature'] for report in reports] == list(LAYERS)
+    for report, (file, properties) in zip(reports, LAYERS.values()):
+        before, after = gpd.read_file(tmp_path / file), gpd.read_file(report['file'])
+
+        assert report['bytes_after'] < report['bytes_before']
+        assert report['vertices_after'] <= report['vertices_before']
+        assert len(after) == len(before)
+        assert after[properties].equals(before[properties])
+        assert abs(after.area.sum() / before.area.sum() - 1) < 0.01
@@ -0,0 +1,52 @@
+####################################################################################################
+__author__ = "Juan P. Zaldivar & Enric Millan"
+__version__ = "1.0.0"
+####################################################################################################
+
+import numpy as np
+import pandas as pd
+
+
+def _baseline(dataset: pd.DataFrame, imputed_col: str, reference_col: str, imputed_value: str) -> None:
+    # The row by row imputation as it was written before the rule batches
+    dataset[imputed_col] = dataset.apply(lambda x: imputed_value if not pd.isnull(x[reference_col]) and pd.isnull(x[imputed_col]) else x[imputed_col], axis=1)
+
+
+def _locations(n: int = 300) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        'BOROUGH': rng.choice(['BRONX', 'QUEENS', 'BROOKLYN'], n).astype(object),
+        'ZIP CODE': rng.choice(['10451', '11101', '11201'], n).astype(object),
+        'ON STREET NAME': rng.choice(['BROADWAY', 'MAIN STREET'], n).astype(object),
+    })
+    for col in df.columns:
+        df.loc[rng.random(n) < 0.3, col] = np.nan
+    return df
+
+
+def test_rule_batch_matches_the_row_loop_applied_rule_by_rule():
+    from Modules.preprocessing import impute_with_ref_cols
+
+    rules = [('BOROUGH', 'ZIP CODE', 'UNKNOWN'), ('ZIP CODE', 'BOROUGH', 'UNKNOWN'), ('ON STREET NAME', 'BOROUGH', 'UNKNOWN')]
+    df, expected = _locations(), _locations()
+    for rule in rules:
+        _baseline(expected, *rule)
+
+    filled = impute_with_ref_cols(df, rules)
+
+    pd.testing.assert_frame_equal(df, expected)
+    # The third rule sees the boroughs filled by the first one as not missing
+    before = _locations()
+    borough = before['BOROUGH'].notna() | before['ZIP CODE'].notna()
+    assert filled[('BOROUGH', 'ZIP CODE')] == int((before['BOROUGH'].isna() & before['ZIP CODE'].notna()).sum())
+    assert filled[('ON STREET NAME', 'BOROUGH')] == int((before['ON STREET NAME'].isna() & borough).sum())
+
+def test_single_rule_wrapper_matches_the_row_loop():
+    from Modules.preprocessing import imputation_with_ref_col
+
+    df, expected = _locations(), _locations()
+
+    imputation_with_ref_col(df, 'BOROUGH', 'ON STREET NAME', 'UNKNOWN')
+    _baseline(expected, 'BOROUGH', 'ON STREET NAME', 'UNKNOWN')
+
+    pd.testing.assert_frame_equal(df, expected)
@@ -0,0 +1,58 @@
+####################################################################################################
+__author__ = "Juan P. Zaldivar & Enric Millan"
+__version__ = "1.0.0"
+####################################################################################################
+
+import numpy as np
+import pandas as pd
+
+
+def _raw_collisions(path: str) -> pd.DataFrame:
+    # Days on both sides of the edges of the windows, at midday and around midnight
+    dates = ['05/31/2018', '06/01/2018', '07/15/2018', '09/30/2018', '10/01/2018', '12/31/2019',
+             '05/31/2020', '06/01/2020', '09/30/2020', '10/01/2020']
+    n = len(dates) * 3
+    raw = pd.DataFrame({
+        'COLLISION_ID': np.arange(1, n + 1),
+        'CRASH DATE': dates * 3,
+        'CRASH TIME': ['0:05'] * len(dates) + ['12:30'] * len(dates) + ['23:59'] * len(dates),
+        'BOROUGH': ['BRONX', None, 'QUEENS'] * len(dates),
+        'ZIP CODE': ['10451', '11101', None] * len(dates),
+        'LATITUDE': 40.7,
+        'LONGITUDE': -73.9,
+        'ON STREET NAME': 'BROADWAY',
+        'NUMBER OF PERSONS INJURED': 1.0,
+        'NUMBER OF PERSONS KILLED': 0.0,
+        'CONTRIBUTING FACTOR VEHICLE 1': 'Unspecified',
+        'VEHICLE TYPE CODE 1': ['SUV', 'BUS', None] * len(dates),
+    })
+    raw.to_csv(path, index=False)
+    return raw
+
+
+def test_ingestion_keeps_the_time_windows_whatever_the_chunk_size(tmp_path):
+    from Modules.preprocessing import SUMMER_WINDOWS, ingest_collisions
+
+    raw = _raw_collisions(tmp_path / 'raw.csv')
+    dates = pd.to_datetime(raw['CRASH DATE'], format='%m/%d/%Y')
+    inside = np.zeros(len(raw), dtype=bool)
+    for start, end in SUMMER_WINDOWS:
+        inside |= ((dates >= start) & (dates <= end)).to_numpy()
+
+    results = []
+    for chunksize in (4, 1000):
+        stats = ingest_collisions(str(tmp_path / 'raw.csv'), str(tmp_path / f'{chunksize}.parquet'), chunksize,
+                                  rules=[('BOROUGH', 'ZIP CODE', 'UNKNOWN')])
+        assert stats['rows_read'] == len(raw)
+        assert stats['rows_written'] == inside.sum()
+        assert stats['filled'] == {('BOROUGH', 'ZIP CODE'): int((raw['BOROUGH'].isna() & raw['ZIP CODE'].notna())[inside].sum())}
+        results.append(pd.read_parquet(tmp_path / f'{chunksize}.parquet'))
+
+    df = results[0]
+    assert sorted(df['COLLISION_ID']) == sorted(raw.loc[inside, 'COLLISION_ID'])
+    # The edges of the windows are kept, with the date parsed and the columns derived
+    assert set(df['CRASH DATE'].dt.strftime('%Y-%m-%d')) == {'2018-06-01', '2018-07-15', '2018-09-30', '2020-06-01', '2020-09-30'}
+    assert set(df['YEAR']) == {2018, 2020}
+    assert df.loc[df['CRASH TIME'] == '23:59', 'CRASH TIME INTERVAL'].eq(23).all()
+    assert df['VEHICLE TYPE CODE 1'].isna().sum() == 0
+    pd.testing.assert_frame_equal(results[0], results[1], check_categorical=False)
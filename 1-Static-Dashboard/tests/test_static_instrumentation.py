@@ -0,0 +1,49 @@
+####################################################################################################
+__author__ = "Juan P. Zaldivar & Enric Millan"
+__version__ = "1.0.0"
+####################################################################################################
+
+import json
+import pandas as pd
+
+
+def test_version_cached_builders_are_flagged_as_hits_and_misses(monkeypatch):
+    from Modules import instrumentation as ins
+    from Modules.versions import version_cache
+
+    monkeypatch.setattr(ins, 'RENDERS', ins.collections.deque(maxlen=ins.PANEL_RENDERS))
+
+    @ins.cached(version_cache)
+    def total(df, version=None):
+        return int(df['A'].sum())
+
+    @ins.render('page')
+    def app(df):
+        return [total(df, version='v1'), total(df, version='v1'), total(df)]
+
+    assert app(pd.DataFrame({'A': [1, 2]})) == [3, 3, 3]
+
+    spans = ins.recent_renders()[0]
+    assert [(s['span'], s['parent'], s['depth'], s.get('cache')) for s in spans] == [
+        ('render', None, 0, None), ('total', 'render', 1, 'miss'), ('total', 'render', 1, 'hit'),
+        ('total', 'render', 1, 'miss')]
+    assert spans[0]['page'] == 'page' and len({s['trace'] for s in spans}) == 1
+
+
+def test_the_log_is_opt_in(tmp_path, monkeypatch):
+    from Modules import instrumentation as ins
+
+    assert ins.LOG_FILE == ''
+    with ins.span('stage'):
+        pass
+    assert not ins.os.path.exists('logs')
+
+    log = tmp_path / 'spans.jsonl'
+    monkeypatch.setattr(ins, 'LOG_FILE', str(log))
+    with ins.span('load', rows=5):
+        with ins.span('parse'):
+            pass
+
+    records = [json.loads(line) for line in log.read_text().splitlines()]
+    assert [(r['span'], r['parent'], r['depth']) for r in records] == [('load', None, 0), ('parse', 'load', 1)]
+    assert records[0]['rows'] == 5 and records[0]['trace'] == records[1]['trace']
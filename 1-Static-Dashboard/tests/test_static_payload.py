@@ -0,0 +1,27 @@
+####################################################################################################
+__author__ = "Juan P. Zaldivar & Enric Millan"
+__version__ = "1.0.0"
+####################################################################################################
+
+import pytest
+import altair as alt
+import pandas as pd
+
+
+def test_budgeted_checks_every_returned_chart(monkeypatch):
+    from Modules import payload
+
+    small = alt.Chart(pd.DataFrame({'A': range(5)})).mark_point().encode(x='A')
+    large = alt.Chart(pd.DataFrame({'A': range(500)})).mark_point().encode(x='A')
+
+    @payload.budgeted(dataset_rows=100)
+    def charts(*charts):
+        return charts
+
+    assert charts(small, small) == (small, small)
+    with pytest.warns(UserWarning, match='Chart over its payload budget: dataset .* of 500 rows over 100'):
+        assert charts(small, large) == (small, large)
+
+    monkeypatch.setattr(payload, 'STRICT', True)
+    with pytest.raises(ValueError, match='of 500 rows over 100'):
+        charts(large)
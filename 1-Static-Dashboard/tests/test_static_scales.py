@@ -0,0 +1,66 @@
+####################################################################################################
+__author__ = "Juan P. Zaldivar & Enric Millan"
+__version__ = "1.0.0"
+####################################################################################################
+
+import numpy as np
+import pandas as pd
+
+
+# The scalar scales as they were written before the scales were registered as data
+def _moment(hour):
+    if 5 <= int(hour) < 12:
+        return "Morning"
+    elif 12 <= int(hour) < 18:
+        return "Afternoon"
+    else:
+        return "Night"
+
+
+def _beaufort(wind_speed_mps):
+    for limit, label in [(0.3, "Calm"), (1.5, "Light Air"), (3.4, "Light Breeze"), (5.5, "Gentle Breeze"),
+                         (8.0, "Moderate Breeze"), (10.8, "Fresh Breeze"), (13.9, "Strong Breeze"),
+                         (17.2, "Near Gale"), (20.8, "Gale"), (24.5, "Strong Gale"), (28.5, "Storm")]:
+        if wind_speed_mps < limit:
+            return label
+    return "Hurricane"
+
+
+def _rain_intensity(prcp_mm):
+    for limit, label in [(2.5*24, "Slight"), (10*24, "Moderate"), (50*24, "Heavy")]:
+        if prcp_mm < limit:
+            return label
+    return "Violent"
+
+
+def _edges(breakpoints: list) -> list:
+    # Every breakpoint, just below and above it, both ends and NaN (which fell in the last category)
+    values = [-1.0, 0.0, 1e6, np.nan]
+    for b in breakpoints:
+        values += [b, np.nextafter(b, -np.inf), np.nextafter(b, np.inf)]
+    return values
+
+
+def test_scales_match_the_scalar_functions_on_the_edges():
+    from Modules.preprocessing import SCALES, categorize, beaufort_scale, rain_intensity_scale
+
+    for scale, scalar, wrapper in [('beaufort', _beaufort, beaufort_scale), ('rain_intensity', _rain_intensity, rain_intensity_scale)]:
+        values = pd.Series(_edges(SCALES[scale]['breakpoints']))
+        expected = [scalar(v) for v in values]
+
+        assert categorize(values, scale).astype(object).tolist() == expected
+        assert [wrapper(v) for v in values] == expected
+
+
+def test_moment_matches_the_scalar_function_on_every_hour():
+    from Modules.preprocessing import categorize, categorize_moment
+
+    hours = pd.Series(range(24), index=range(100, 124), name='HOUR')
+    expected = [_moment(h) for h in hours]
+
+    labels = categorize(hours, 'moment')
+    assert labels.astype(object).tolist() == expected
+    assert labels.index.equals(hours.index) and labels.name == 'HOUR'
+    assert [categorize_moment(str(h)) for h in hours] == expected
+    # Night is one category, at both ends of the day
+    assert list(labels.cat.categories) == ['Night', 'Morning', 'Afternoon']
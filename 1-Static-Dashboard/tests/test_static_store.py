@@ -0,0 +1,42 @@
+####################################################################################################
+__author__ = "Juan P. Zaldivar & Enric Millan"
+__version__ = "1.0.0"
+####################################################################################################
+
+import os
+import pytest
+import pandas as pd
+
+
+def test_an_interrupted_write_keeps_the_store_and_an_unreadable_one_falls_back(tmp_path, monkeypatch):
+    from Modules.store import store_path, write_store, read_store
+
+    path = f'{tmp_path}/'
+    df = pd.DataFrame({'BOROUGH': ['BRONX', 'QUEENS'], 'YEAR': [2018, 2019]})
+    df.to_csv(path + 'data.csv', index=False)
+    store = write_store(df, 'data.csv', path)
+
+    def to_parquet(self, out, **kwargs):
+        open(out, 'wb').write(b'PAR1')
+        raise OSError('disk full')
+
+    monkeypatch.setattr(pd.DataFrame, 'to_parquet', to_parquet)
+    with pytest.raises(OSError, match='disk full'):
+        write_store(df.head(1), 'data.csv', path)
+    assert sorted(os.listdir(tmp_path)) == ['data.csv', 'data.parquet']
+    assert len(read_store('data.csv', path)) == 2
+
+    # A truncated store is read from the CSV file
+    with open(store, 'r+b') as f:
+        f.truncate(os.path.getsize(store) // 2)
+    with pytest.warns(UserWarning, match='Unreadable store'):
+        pd.testing.assert_frame_equal(read_store('data.csv', path, ['YEAR']), df[['YEAR']])
+    assert store == store_path('data.csv', path)
+
+
+def test_the_weather_merge_needs_the_collisions(tmp_path):
+    from Modules.preprocessing import preprocess_weather
+
+    with pytest.raises(FileNotFoundError, match='collisions_clean.csv nor its store'):
+        preprocess_weather(path=f'{tmp_path}/')
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,49 @@
+####################################################################################################
+__author__ = "Juan P. Zaldivar & Enric Millan"
+__version__ = "1.0.0"
+####################################################################################################
+
+import numpy as np
+import pandas as pd
+
+
+# The clusters as they were replaced one after the other before the mapping file
+CLUSTERS = [
+    (['SUV', 'FLAT', '3-DOOR', 'CHEVY EXPR', 'PC', 'ELEC. UNIC', 'E REVEL SC', 'F150XL PIC', '2- TO', 'NEW Y', 'STREE', 'RGS', 'OMR', 'DEMA-', 'BK', 'NYPD'], 'CAR'),
+    (['99999'], 'UNKNOWN'),
+    (['BULK AGRICULTURE', 'PK', 'TANK', 'SLINGSHOT', 'UTV', 'JOHN DEERE', '1C', 'STAK', 'PALLET', 'SPRIN', 'ACCES'], 'OTHERS'),
+    (['BOX', 'DOT EQUIPM', 'DRILL RIG', 'PAS', 'LOADE', 'SGWS', 'HEAVY'], 'TRUCK'),
+    (['MOTORIZED HOME', 'CHASSIS CAB', 'SWT', 'MESSAGE SI', 'RV', 'UHAUL', 'POSTO'], 'VAN'),
+    (['MOPED', 'J1'], 'MOTORCYCLE'),
+    (['SANIT'], 'AMBULANCE'),
+]
+
+
+def _replace_chain(values: pd.Series) -> pd.Series:
+    for codes, cluster in CLUSTERS:
+        values = values.replace(codes, cluster)
+    return values.fillna('UNKNOWN')
+
+
+def test_factorized_lookup_matches_the_replace_chain():
+    from Modules.preprocessing import clusterize_vehicle_type
+
+    codes = [code for codes, _ in CLUSTERS for code in codes] + ['CAR', 'TAXI', 'BUS', np.nan]
+    values = pd.Series(codes * 3, dtype=object).sample(frac=1, random_state=0).reset_index(drop=True)
+
+    df = clusterize_vehicle_type(pd.DataFrame({'VEHICLE TYPE CODE 1': values}), 'VEHICLE TYPE CODE 1')
+
+    assert isinstance(df['VEHICLE TYPE CODE 1'].dtype, pd.CategoricalDtype)
+    assert df['VEHICLE TYPE CODE 1'].astype(object).tolist() == _replace_chain(values).tolist()
+    # Each cluster is a single category, whatever the number of codes mapped to it
+    assert df['VEHICLE TYPE CODE 1'].cat.categories.is_unique
+
+
+def test_custom_mapping_and_unknown_value():
+    from Modules.preprocessing import clusterize_vehicle_type
+
+    df = pd.DataFrame({'VEHICLE': ['a', 'b', None, 'c', 'a']})
+
+    df = clusterize_vehicle_type(df, 'VEHICLE', mapping={'a': 'X', 'b': 'X'}, unknown='?')
+
+    assert df['VEHICLE'].astype(object).tolist() == ['X', 'X', '?', 'c', 'X']
@@ -0,0 +1,44 @@
+####################################################################################################
+__author__ = "Juan P. Zaldivar & Enric Millan"
+__version__ = "1.0.0"
+####################################################################################################
+
+import pandas as pd
+
+
+def test_charts_are_keyed_by_the_version_passed():
+    from Modules.versions import dataset_version, version_cache
+
+    calls = []
+
+    @version_cache
+    def rows(df: pd.DataFrame, version: str = None) -> list:
+        calls.append(len(df))
+        return df['a'].tolist()
+
+    df = pd.DataFrame({'a': [3, 1, 2], 'b': ['x', 'y', 'z']})
+    version = dataset_version(df)
+
+    assert rows(df[['a']], version) == [3, 1, 2]
+    assert rows(df[['a']], version=version) == [3, 1, 2]
+    assert calls == [3]
+
+    # Same columns and a clean index, but other rows: a new version is not served the old chart
+    other = df.sort_values('a').reset_index(drop=True)
+    assert rows(other[['a']], dataset_version(other)) == [1, 2, 3]
+    assert calls == [3, 3]
+
+    # Without a version the dataframe is never trusted
+    assert rows(df.assign(a=[0, 0, 0])[['a']]) == [0, 0, 0]
+    assert rows(df[['a']]) == [3, 1, 2]
+    assert calls == [3, 3, 3, 3]
+
+
+def test_dataset_version_follows_the_content():
+    from Modules.versions import dataset_version
+
+    df = pd.DataFrame({'a': [1, 2, 3]})
+
+    assert dataset_version(df) == dataset_version(df.copy())
+    assert dataset_version(df) != dataset_version(df.assign(a=[1, 2, 4]))
+    assert dataset_version(df) != dataset_version(df.astype('int32'))
@@ -0,0 +1,36 @@
+####################################################################################################
+__author__ = "Juan P. Zaldivar & Enric Millan"
+__version__ = "1.0.0"
+####################################################################################################
+
+import pandas as pd
+
+
+def test_chunked_aggregation_matches_the_daily_means_of_the_stations():
+    from Modules.preprocessing import WEATHER_COLUMNS, aggregate_weather
+
+    stations = pd.read_csv('Data/weather_2018-2020.csv', usecols=list(WEATHER_COLUMNS), dtype=WEATHER_COLUMNS)
+    expected = stations.assign(PRCP=stations['PRCP'].fillna(0)).groupby('DATE').mean().reset_index()
+
+    weather = aggregate_weather('Data/weather_2018-2020.csv', chunksize=997)
+
+    pd.testing.assert_frame_equal(weather[expected.columns], expected, check_exact=False)
+    pd.testing.assert_frame_equal(weather, aggregate_weather('Data/weather_2018-2020.csv'), check_exact=False)
+    # Same days, means and scales as the committed file
+    committed = pd.read_csv('Data/weather_aggregated.csv')
+    pd.testing.assert_frame_equal(weather.astype({'BEAUFORT_SCALE': object, 'PRCP_SCALE': object}), committed,
+                                  check_exact=False, check_dtype=False)
+
+
+def test_collision_counts_are_joined_per_day():
+    from Modules.preprocessing import merge_collision_counts
+
+    weather = pd.DataFrame({'DATE': ['2018-06-01', '2018-06-02', '2018-06-03'], 'MEAN_TEMP': [19.5, 20.0, 41.0]})
+    collisions = pd.DataFrame({'CRASH DATE': pd.to_datetime(['2018-06-01', '2018-06-01', '2018-06-03', '2018-07-01'])})
+
+    merged = merge_collision_counts(weather, collisions)
+
+    assert merged['COLLISION COUNT'].tolist() == [2, 0, 1]
+    assert merged['TEMP_SCALE'].astype(object).tolist()[:2] == ['[18, 20)', '[20, 22)']
+    assert pd.isna(merged['TEMP_SCALE'].iloc[2])
+    assert merged['CASES_COUNT'].tolist() == [1, 1, 1]
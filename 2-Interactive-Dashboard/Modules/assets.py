@@ -0,0 +1,146 @@
+##############################################################################################################
+__author__ = "Juan P. Zaldivar & Enric Millan"
+__version__ = "1.0.0"
+##############################################################################################################
+
+"""
+This module contains the functions to ship the files of the Data folder (map layers, labels) to the
+browser without depending on external URLs.
+
+Small files are inlined in the specification as named datasets. Larger files and map layers are
+copied to the static folder of the dashboard with the hash of their content in the name, and served
+by Streamlit (server.enableStaticServing in .streamlit/config.toml), so the URL of a file only
+changes when its content does and the browser can keep it cached. Map layers are served whatever
+their size: Altair copies an inline dataset into every layer and concatenation of a chart while it
+is composed, which made the dashboards several times slower to build.
+
+Functions:
+----------
+
+content_hash(file: str) -> str
+    Returns the hash of the content of a file.
+
+publish(file: str, path: str) -> str
+    Copies a file to the static folder with its content hash in the name and returns its URL.
+
+asset_data(file: str, path: str, format: alt.DataFormat, mode: str) -> alt.Data
+    Returns a file of the Data folder as Altair data, inlined or served depending on its size and type.
+"""
+
+##############################################################################################################
+# IMPORTS ################################################################################ IMPORTS ###########
+##############################################################################################################
+import os
+import json
+import shutil
+import hashlib
+import pandas as pd
+import altair as alt
+
+
+##############################################################################################################
+# GLOBAL VARIABLES ############################################################## GLOBAL VARIABLES ###########
+##############################################################################################################
+STATIC = 'static/'
+STATIC_URL = 'app/static/'
+
+ASSET_MODE = os.environ.get('DASHBOARD_ASSETS', 'auto')    # auto, inline or served
+INLINE_BYTES = 100000
+GEOMETRY = ('.geojson', '.topojson')    # always served in auto mode
+
+
+##############################################################################################################
+# FUNCTIONS ############################################################################ FUNCTIONS ###########
+##############################################################################################################
+def content_hash(file: str) -> str:
+    """
+    Returns the hash of the content of a file.
+
+    Parameters
+    ----------
+    file : str
+        Path of the file.
+
+    Returns
+    -------
+    str
+        First 12 hexadecimal digits of the SHA-256 of the file.
+    """
+
+    digest = hashlib.sha256()
+    with open(file, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 16), b''):
+            digest.update(block)
+
+    return digest.hexdigest()[:12]
+
+
+def publish(file: str, path: str = 'Data/') -> str:
+    """
+    Copies a file to the static folder with its content hash in the name and returns its URL.
+
+    The copy is skipped when the hashed file is already there.
+
+    Parameters
+    ----------
+    file : str
+        Name of the file.
+    path : str
+        Folder of the file.
+
+    Returns
+    -------
+    str
+        URL of the file served by Streamlit.
+    """
+
+    stem, ext = os.path.splitext(file)
+    name = f'{stem}.{content_hash(path + file)}{ext}'
+
+    if not os.path.exists(STATIC + name):
+        os.makedirs(STATIC, exist_ok=True)
+        shutil.copyfile(path + file, STATIC + name)
+
+    return STATIC_URL + name
+
+
+def asset_data(file: str, path: str = 'Data/', format: alt.DataFormat = None, mode: str = None) -> alt.Data:
+    """
+    Returns a file of the Data folder as Altair data, inlined or served depending on its size and type.
+
+    Parameters
+    ----------
+    file : str
+        Name of the file (JSON, GeoJSON, TopoJSON or CSV).
+    path : str
+        Folder of the file.
+    format : alt.DataFormat
+        Format of the data (e.g. the TopoJSON feature or the GeoJSON property to be read).
+    mode : str
+        'inline', 'served' or 'auto' (inline up to INLINE_BYTES, map layers served), ASSET_MODE by default.
+
+    Returns
+    -------
+    alt.Data
+        Inline data (a named dataset in the specification) or the URL of the served file.
+    """
+
+    mode = mode or ASSET_MODE
+    if mode not in ('auto', 'inline', 'served'):
+        raise ValueError(f"Unknown asset mode '{mode}', expected 'auto', 'inline' or 'served'")
+    if mode == 'auto':
+        mode = 'inline' if os.path.getsize(path + file) <= INLINE_BYTES and not file.endswith(GEOMETRY) else 'served'
+
+    if mode == 'served':
+        if format is None:
+            format = alt.DataFormat(type='csv') if file.endswith('.csv') else alt.Undefined
+        return alt.UrlData(url=publish(file, path), format=format)
+
+    # CSV files are inlined as records, Streamlit only accepts tabular or JSON values
+    if file.endswith('.csv'):
+        return alt.InlineData(values=pd.read_csv(path + file).to_dict('records'))
+
+    with open(path + file) as f:
+        values = json.load(f)
+
+    return alt.InlineData(values=values, format=format or alt.Undefined)
@@ -1,5 +1,8 @@
+import numpy as np
 import pandas as pd
 import altair as alt
+from Modules.geometry import topo_feature
+from Modules.instrumentation import traced
 
 
 
@@ -9,11 +12,223 @@ weekdays = alt.selection_multi(fields=['WEEKDAY'])
 vehicles = alt.selection_multi(fields=['VEHICLE TYPE CODE 1'])
 boroughs = alt.selection_multi(fields=['BOROUGH'])
 
+FILTERS = ['MONTH', 'ICON', 'WEEKDAY', 'VEHICLE TYPE CODE 1', 'BOROUGH']
+MONTHS = ['June', 'July', 'August', 'September']
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+# Largest density grid kept by filter dimensions (about 1 MB of specification)
+GRID_ROWS = 5000
+# Largest enlargement of the grid cells before dropping filter dimensions
+GRID_SCALE = 8
 
+
+def filter_rows(df: pd.DataFrame, selection):
+    """
+    Filters the collisions with the values selected for each field, as the selections would do.
+
+    A field without selected values (or missing from the selection) does not filter anything.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Dataframe with the collisions.
+    selection : dict or iterable
+        Selected values per field, as a dict or as (field, values) pairs.
+
+    Returns
+    -------
+    pd.DataFrame
+        Collisions that match every field of the selection.
+    """
+
+    mask = np.ones(len(df), dtype=bool)
+    for field, values in dict(selection or {}).items():
+        if len(values):
+            mask &= df[field].isin(list(values)).to_numpy()
+
+    return df if mask.all() else df[mask]
+
+
+def filter_chart(chart, selection=None, fields: list = FILTERS):
+    """
+    Filters a chart in the browser with the selections of the legends.
+
+    Charts built from a server-side selection are already filtered, so they are returned as is.
+
+    Parameters
+    ----------
+    chart : altair.Chart
+        Chart to be filtered.
+    selection : dict or iterable
+        Server-side selection the data was filtered with, if any.
+    fields : list
+        Fields of the data, only the selections on these fields filter the chart.
+
+    Returns
+    -------
+    altair.Chart
+        Chart filtered by months, conditions, vehicles, weekdays and boroughs.
+    """
+
+    if selection is not None:
+        return chart
+
+    for field, param in [('MONTH', months), ('ICON', conditions), ('VEHICLE TYPE CODE 1', vehicles),
+                         ('WEEKDAY', weekdays), ('BOROUGH', boroughs)]:
+        if field in fields:
+            chart = chart.transform_filter(param)
+
+    return chart
+
+
+def collision_cube(df: pd.DataFrame, axis=None, dims: list = FILTERS):
+    """
+    Pre-aggregates the collisions by the filter dimensions and the axis of a chart.
+
+    Each cell holds the number of collisions and the injured and killed sums, so the charts
+    add up cells instead of counting rows and the selections keep working on the same fields.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Dataframe with the collisions.
+    axis : str or list
+        Column (or columns) of the chart axis (e.g. HOUR or DAY), if any.
+    dims : list
+        Filter dimensions kept in the cube. Without dimensions nor axis the cube is a single row.
+
+    Returns
+    -------
+    pd.DataFrame
+        Cube with the dims (and axis) columns and COUNT, TOTAL INJURED and TOTAL KILLED.
+    """
+
+    dims = list(dims) + ([axis] if isinstance(axis, str) else list(axis or []))
+
+    if not dims:
+        return pd.DataFrame({'COUNT': [len(df)],
+                             'TOTAL INJURED': [df['TOTAL INJURED'].sum()],
+                             'TOTAL KILLED': [df['TOTAL KILLED'].sum()]})
+
+    groups = df.groupby(dims, observed=True, dropna=False)
+    cube = groups[['TOTAL INJURED', 'TOTAL KILLED']].sum()
+    cube.insert(0, 'COUNT', groups.size())
+
+    return cube.reset_index()
+
+
+def selection_cube(df: pd.DataFrame, selection=None, axis=None, dims: list = ()):
+    """
+    Pre-aggregates the collisions for a chart, filtering them server-side if there is a selection.
+
+    Without selection the cube keeps the FILTERS so the browser can filter it. With a selection
+    the rows are filtered in pandas and only the dims of the chart itself are kept.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Dataframe with the collisions.
+    selection : dict or iterable
+        Selected values per field (see filter_rows), or None to filter in the browser.
+    axis : str or list
+        Column (or columns) of the chart axis, if any.
+    dims : list
+        Dimensions encoded by the chart, kept when filtering server-side.
+
+    Returns
+    -------
+    pd.DataFrame
+        Cube of the collisions (see collision_cube).
+    """
+
+    if selection is None:
+        return collision_cube(df, axis)
+
+    return collision_cube(filter_rows(df, selection), axis, dims)
+
+
+def density_grid(df: pd.DataFrame, cell: float = 0.005, dims: list = FILTERS):
+    """
+    Bins the collisions into a square grid and aggregates them by cell and filter dimensions.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Dataframe with the collisions.
+    cell : float
+        Side of the grid cells, in degrees.
+    dims : list
+        Filter dimensions kept in the cube.
+
+    Returns
+    -------
+    pd.DataFrame
+        Cube with the dims columns, the LONGITUDE and LATITUDE of the cell centers and
+        COUNT, TOTAL INJURED and TOTAL KILLED.
+    """
+
+    df = df.dropna(subset=['LONGITUDE', 'LATITUDE'])
+    df = df[list(dims) + ['TOTAL INJURED', 'TOTAL KILLED']].assign(
+        LONGITUDE=(np.floor(df['LONGITUDE'].to_numpy(dtype=float) / cell) + 0.5) * cell,
+        LATITUDE=(np.floor(df['LATITUDE'].to_numpy(dtype=float) / cell) + 0.5) * cell
+    )
+
+    return collision_cube(df, ['LONGITUDE', 'LATITUDE'], dims)
+
+
+def fitted_grid(df: pd.DataFrame, cell: float = 0.005, dims: list = FILTERS):
+    """
+    Bins the collisions into the finest density grid that keeps the filter dimensions in GRID_ROWS.
+
+    The cell is doubled up to GRID_SCALE times its side and, if the grid is still too large, the
+    dimension with the most values is dropped, one at a time, until it fits. The sizes are counted
+    on integer keys, the grid itself is only aggregated once.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Dataframe with the collisions.
+    cell : float
+        Side of the finest grid cells, in degrees.
+    dims : list
+        Filter dimensions to keep, if they fit.
+
+    Returns
+    -------
+    tuple
+        Grid (see density_grid) and the filter dimensions it kept.
+    """
+
+    df = df.dropna(subset=['LONGITUDE', 'LATITUDE'])
+    lon, lat = df['LONGITUDE'].to_numpy(dtype=float), df['LATITUDE'].to_numpy(dtype=float)
+    codes = {dim: pd.factorize(df[dim], use_na_sentinel=False)[0] for dim in dims}
+
+    def size(scale, dims):
+        # Number of cells of the grid, from one integer key per collision (cell and dims codes)
+        key = np.zeros(len(df), dtype=np.int64)
+        bins = [np.floor(lon / (cell * scale)).astype(np.int64), np.floor(lat / (cell * scale)).astype(np.int64)]
+        for values in bins + [codes[dim] for dim in dims]:
+            values = values - values.min(initial=0)
+            key = key * (values.max(initial=0) + 1) + values
+        return len(pd.unique(key))
+
+    dims, scale = list(dims), 1
+    while dims and size(scale, dims) > GRID_ROWS:
+        if scale < GRID_SCALE:
+            scale *= 2
+        else:
+            dims.remove(max(dims, key=lambda dim: codes[dim].max(initial=-1) + 1))
+
+    return density_grid(df, cell * scale, dims), dims
+
+
+@traced()
 def legend_chart(df: pd.DataFrame):
     """
     Creates multiple interactive legends for the dashboard.
 
+    Each legend is drawn from the distinct values of its field, so it has one mark per category
+    regardless of the number of collisions.
+
     Parameters
     ----------
     df : pd.DataFrame
@@ -29,10 +244,10 @@ def legend_chart(df: pd.DataFrame):
 
     df = df[['BOROUGH', 'VEHICLE TYPE CODE 1', 'MONTH', 'WEEKDAY', 'ICON']]
 
-    month_legend = alt.Chart(df).mark_rect(tooltip=False).encode(
+    month_legend = alt.Chart(df[['MONTH']].drop_duplicates()).mark_rect(tooltip=False).encode(
         x = alt.X('MONTH:N',
                 title='Month',
-                sort=['June', 'July', 'August', 'September'],
+                sort=MONTHS,
                 axis=alt.Axis(labelAngle=0, labelFontSize=10)),
         color = alt.condition(months,
                               alt.Color('MONTH:N', scale=alt.Scale(scheme='category20'), legend=None),
@@ -43,7 +258,7 @@ def legend_chart(df: pd.DataFrame):
         width=584
     )
 
-    condition_legend = alt.Chart(df).mark_rect(tooltip=False).encode(
+    condition_legend = alt.Chart(df[['ICON']].drop_duplicates()).mark_rect(tooltip=False).encode(
         x = alt.X('ICON:N',
                 title='Weather Conditions',
                 axis=alt.Axis(labelAngle=0, labelFontSize=10)),
@@ -56,7 +271,7 @@ def legend_chart(df: pd.DataFrame):
         width=584
     )
 
-    vehicle_legend = alt.Chart(df).mark_rect(tooltip=False).encode(
+    vehicle_legend = alt.Chart(df[['VEHICLE TYPE CODE 1']].drop_duplicates()).mark_rect(tooltip=False).encode(
         x = alt.X('VEHICLE TYPE CODE 1:N',
                 title='Vehicle Type',
                 axis=alt.Axis(labelAngle=0, labelFontSize=10)),
@@ -69,10 +284,10 @@ def legend_chart(df: pd.DataFrame):
         width=400
     )
 
-    weekdays_legend = alt.Chart(df).mark_rect(tooltip=False).encode(
+    weekdays_legend = alt.Chart(df[['WEEKDAY']].drop_duplicates()).mark_rect(tooltip=False).encode(
         x = alt.X('WEEKDAY:N',
                 title='Day of the Week',
-                sort=['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'],
+                sort=WEEKDAYS,
                 axis=alt.Axis(labelAngle=0, labelFontSize=10)),
         color = alt.condition(weekdays,
                                 alt.Color('WEEKDAY:N', scale=alt.Scale(scheme='category20'), legend=None),
@@ -83,7 +298,7 @@ def legend_chart(df: pd.DataFrame):
         width=768
     )
 
-    boroughs_legend = alt.Chart(df).mark_rect(tooltip=False).encode(
+    boroughs_legend = alt.Chart(df[['BOROUGH']].drop_duplicates()).mark_rect(tooltip=False).encode(
         x = alt.X('BOROUGH:N',
                 title='',
                 axis=alt.Axis(labelAngle=0, labelFontSize=10, orient='top')),
@@ -101,18 +316,29 @@ def legend_chart(df: pd.DataFrame):
     return legends, boroughs_legend
 
 
-def dotmap_chart(df: pd.DataFrame):
+@traced()
+def dotmap_chart(df: pd.DataFrame, density: bool = False, cell: float = 0.005, selection=None):
     """
     Creates a dotmap chart with one dot per collision.
 
+    In density mode the collisions are binned server-side into a grid (see density_grid) and
+    each cell is drawn as a circle sized by its number of collisions. The grid keeps the filter
+    dimensions so the legends filter it, in at most GRID_ROWS rows: larger cells are used first,
+    then the dimensions with the most values are dropped (see fitted_grid). Collisions with people
+    killed are still drawn one by one.
+    With a server-side selection the map is always drawn in density mode.
+
     Parameters
     ----------
     df : pd.DataFrame
         Dataframe with the data to be plotted.
-    map : altair.topo_feature
-        Map to be used in the chart.
-    filters : list
-        List of filters to be applied to the chart.
+    density : bool
+        Whether to draw the grid cells instead of one dot per collision.
+    cell : float
+        Side of the grid cells, in degrees.
+    selection : dict or iterable
+        Selected values per field to filter and aggregate server-side (see filter_rows), or None
+        to filter in the browser with the legends.
 
     Returns
     -------
@@ -120,20 +346,19 @@ def dotmap_chart(df: pd.DataFrame):
         Dotmap chart with one dot per collision.
     """
 
-    map_url = 'https://raw.githubusercontent.com/0J0P0/NYC-Collisions-Visualization-Project/main/2-Interactive-Dashboard/Data/new-york-city-zipcodes-ny_.geojson'
-    zips = alt.Data(url=map_url, format=alt.DataFormat(property="features"))
-    
-    def determine_injured_or_killed(row):
-        if row['TOTAL KILLED'] > 0:
-            return 'Killed'
-        elif row['TOTAL INJURED'] > 0:
-            return 'Injured'
-        else:
-            return 'None'
+    zips = topo_feature('zipcodes')
+
+    if selection is not None:
+        df, density = filter_rows(df, selection), True
 
-    df['INJURED/KILLED'] = df.apply(determine_injured_or_killed, axis=1)
+    if density:
+        cells, dims = fitted_grid(df, cell, FILTERS if selection is None else ())
+        df = df[df['TOTAL KILLED'] > 0]
 
+    df = df.assign(**{'INJURED/KILLED': np.select([df['TOTAL KILLED'] > 0, df['TOTAL INJURED'] > 0], ['Killed', 'Injured'], 'None')})
     df = df[['LONGITUDE', 'LATITUDE', 'BOROUGH', 'VEHICLE TYPE CODE 1', 'MONTH', 'WEEKDAY', 'ICON', 'INJURED/KILLED']]
+    # float32 coordinates would be written with 16 digits in the specification
+    df = df.assign(LONGITUDE=df['LONGITUDE'].astype(float).round(5), LATITUDE=df['LATITUDE'].astype(float).round(5))
 
 
     nyc = alt.Chart(zips).mark_geoshape(
@@ -168,22 +393,39 @@ def dotmap_chart(df: pd.DataFrame):
         height=500
     )
 
-    points = points.transform_filter(
-        months
-    ).transform_filter(
-        conditions
-    ).transform_filter(
-        vehicles
-    ).transform_filter(
-        weekdays
-    ).transform_filter(
-        boroughs
+    points = filter_chart(points, selection)
+
+    if not density:
+        return (nyc + points)
+
+    grid = filter_chart(alt.Chart(cells), selection, dims)
+
+    grid = grid.transform_aggregate(
+        COUNT='sum(COUNT)',
+        INJURED='sum(TOTAL INJURED)',
+        KILLED='sum(TOTAL KILLED)',
+        groupby=['LONGITUDE', 'LATITUDE']
+    ).mark_circle(
+        opacity=0.6,
+        tooltip=True
+    ).encode(
+        longitude='LONGITUDE:Q',
+        latitude='LATITUDE:Q',
+        size=alt.Size('COUNT:Q', scale=alt.Scale(range=[5, 150]), legend=None),
+        color=alt.Color('INJURED:Q', scale=alt.Scale(range=['blue', 'green']), legend=alt.Legend(title='Injured', orient='top')),
+        tooltip=[alt.Tooltip('COUNT:Q', title='Collisions'), alt.Tooltip('INJURED:Q', title='Injured'), alt.Tooltip('KILLED:Q', title='Killed')]
+    ).project(
+        type='identity', reflectY=True
+    ).properties(
+        width=500,
+        height=500
     )
 
-    return (nyc + points)
+    return (nyc + grid + points)
 
 
-def bar_chart(df: pd.DataFrame):
+@traced()
+def bar_chart(df: pd.DataFrame, cube: bool = False, selection=None):
     """
     Creates a bar chart with the total number of collisions per vehicle type and weather conditions.
 
@@ -191,8 +433,11 @@ def bar_chart(df: pd.DataFrame):
     ----------
     df : pd.DataFrame
         Dataframe with the data to be plotted.
-    filters : list
-        List of filters to be applied to the chart.
+    cube : bool
+        Whether to plot the pre-aggregated cube of the data instead of its rows.
+    selection : dict or iterable
+        Selected values per field to filter and aggregate server-side (see filter_rows), or None
+        to filter in the browser with the legends.
 
     Returns
     -------
@@ -200,37 +445,31 @@ def bar_chart(df: pd.DataFrame):
         Bar chart with the total number of collisions per vehicle type and weather conditions.
     """
 
-    df = df[['BOROUGH', 'VEHICLE TYPE CODE 1', 'MONTH', 'WEEKDAY', 'ICON']]
+    if cube or selection is not None:
+        df, count = selection_cube(df, selection, dims=['ICON', 'VEHICLE TYPE CODE 1']), 'sum(COUNT)'
+    else:
+        df, count = df[['COLLISION_ID', 'BOROUGH', 'VEHICLE TYPE CODE 1', 'MONTH', 'WEEKDAY', 'ICON']], 'count()'
 
     bars = alt.Chart(df).mark_bar(
         tooltip=True
     ).encode(
         x=alt.X('VEHICLE TYPE CODE 1:N', axis=alt.Axis(labelAngle=0, labelFontSize=10), title='Vehicle Type'),
-        y=alt.Y('count():Q', title='Collisions'),
+        y=alt.Y(f'{count}:Q', title='Collisions'),
         color=alt.Color('VEHICLE TYPE CODE 1:N', scale=alt.Scale(domain=['Ambulance', 'Fire', 'Taxi'], range=['#9C9EDE', '#F7B6D2', '#AEC7E8']), legend=None),
         column=alt.Column('ICON', title='Weather Conditions'),
-        tooltip=[alt.Tooltip('count():Q', title='Collisions'), alt.Tooltip('VEHICLE TYPE CODE 1:N', title='Vehicle Type')]
+        tooltip=[alt.Tooltip(f'{count}:Q', title='Collisions'), alt.Tooltip('VEHICLE TYPE CODE 1:N', title='Vehicle Type')]
     ).properties(
         width=133,
         height=370
     )
 
-    bars = bars.transform_filter(
-        months
-    ).transform_filter(
-        conditions
-    ).transform_filter(
-        vehicles
-    ).transform_filter(
-        weekdays
-    ).transform_filter(
-        boroughs
-    )
+    bars = filter_chart(bars, selection)
 
     return bars
 
 
-def hour_line_chart(df: pd.DataFrame):
+@traced()
+def hour_line_chart(df: pd.DataFrame, cube: bool = False, selection=None):
     """
     Creates a line chart with the total number of collisions per hour of the day.
 
@@ -238,8 +477,11 @@ def hour_line_chart(df: pd.DataFrame):
     ----------
     df : pd.DataFrame
         Dataframe with the data to be plotted.
-    filters : list
-        List of filters to be applied to the chart.
+    cube : bool
+        Whether to plot the pre-aggregated cube of the data instead of its rows.
+    selection : dict or iterable
+        Selected values per field to filter and aggregate server-side (see filter_rows), or None
+        to filter in the browser with the legends.
 
     Returns
     -------
@@ -247,36 +489,41 @@ def hour_line_chart(df: pd.DataFrame):
         Line chart with the total number of collisions per hour of the day.
     """
 
-    df = df[['BOROUGH', 'VEHICLE TYPE CODE 1', 'HOUR', 'MONTH', 'WEEKDAY', 'ICON']] 
-
-    line = alt.Chart(df).mark_line(
+    hours = []
+    if cube or selection is not None:
+        cells = selection_cube(df, selection, 'HOUR', dims=['BOROUGH'])
+        dims = [c for c in cells.columns if c not in ['HOUR', 'COUNT', 'TOTAL INJURED', 'TOTAL KILLED']]
+        # One row per combination of the filters with a column per hour, folded back in the browser,
+        # so the hours do not multiply the rows of the cube
+        df = cells.set_index(dims + ['HOUR'])['COUNT'].unstack('HOUR', fill_value=0)
+        df.columns = hours = [str(hour) for hour in df.columns]
+        df, count = df.reset_index(), 'sum(COUNT)'
+    else:
+        df, count = df[['COLLISION_ID', 'BOROUGH', 'VEHICLE TYPE CODE 1', 'HOUR', 'MONTH', 'WEEKDAY', 'ICON']], 'count()'
+
+    line = alt.Chart(df)
+    if hours:
+        line = line.transform_fold(hours, as_=['HOUR', 'COUNT']).transform_calculate(HOUR='toNumber(datum.HOUR)')
+
+    line = line.mark_line(
         point=True,
         tooltip=True
     ).encode(
         x=alt.X('HOUR:O', axis=alt.Axis(labelAngle=0, grid=True), title='Hour of the Day'),
-        y=alt.Y('count():Q', title='Collisions'),
+        y=alt.Y(f'{count}:Q', title='Collisions'),
         color=alt.Color('BOROUGH:N', scale=alt.Scale(domain=['Bronx', 'Brooklyn', 'Manhattan', 'Queens', 'Staten Island'], range=['#393B79', '#D62728', '#7B4173', '#FFBB78', '#AEC7E8']), legend=None),
-        tooltip=[alt.Tooltip('count():Q', title='Collisions'), alt.Tooltip('BOROUGH:N', title='Borough')]
+        tooltip=[alt.Tooltip(f'{count}:Q', title='Collisions'), alt.Tooltip('BOROUGH:N', title='Borough')]
     )
 
-    line = line.transform_filter(
-        months
-    ).transform_filter(
-        conditions
-    ).transform_filter(
-        vehicles
-    ).transform_filter(
-        weekdays
-    ).transform_filter(
-        boroughs    
-    ).add_params(
-        boroughs
-    )
+    line = filter_chart(line, selection)
+    if selection is None:
+        line = line.add_params(boroughs)
 
     return line
 
 
-def day_line_chart(df: pd.DataFrame):
+@traced()
+def day_line_chart(df: pd.DataFrame, cube: bool = False, selection=None):
     """
     Creates a line chart with the total number of collisions per day of the month.
 
@@ -284,8 +531,11 @@ def day_line_chart(df: pd.DataFrame):
     ----------
     df : pd.DataFrame
         Dataframe with the data to be plotted.
-    filters : list
-        List of filters to be applied to the chart.
+    cube : bool
+        Whether to plot the pre-aggregated cube of the data instead of its rows.
+    selection : dict or iterable
+        Selected values per field to filter and aggregate server-side (see filter_rows), or None
+        to filter in the browser with the legends.
 
     Returns
     -------
@@ -297,7 +547,11 @@ def day_line_chart(df: pd.DataFrame):
     df_copy['CRASH DATE'] = pd.to_datetime(df_copy['CRASH DATE'])
     df_copy['DAY'] = df_copy['CRASH DATE'].dt.day
 
-    df_copy = df_copy[['BOROUGH', 'VEHICLE TYPE CODE 1', 'DAY', 'MONTH', 'WEEKDAY', 'ICON']]
+    if cube or selection is not None:
+        cells = selection_cube(df_copy, selection, 'DAY')
+        df_copy, count = cells.drop(columns=['TOTAL INJURED', 'TOTAL KILLED']), 'sum(COUNT)'
+    else:
+        df_copy, count = df_copy[['COLLISION_ID', 'BOROUGH', 'VEHICLE TYPE CODE 1', 'DAY', 'MONTH', 'WEEKDAY', 'ICON']], 'count()'
 
     base = alt.Chart(df_copy)
 
@@ -307,9 +561,9 @@ def day_line_chart(df: pd.DataFrame):
         tooltip=True
     ).encode(
         x=alt.X('DAY:O', axis=alt.Axis(labelAngle=0, grid=True), title='Day of the Month'),
-        y=alt.Y('count():Q', scale=alt.Scale(zero=False), title='Collisions'),
+        y=alt.Y(f'{count}:Q', scale=alt.Scale(zero=False), title='Collisions'),
         color=alt.value('purple'),
-        tooltip=[alt.Tooltip('count():Q', title='Collisions'), alt.Tooltip('DAY:O', title='Day of the Month')]
+        tooltip=[alt.Tooltip(f'{count}:Q', title='Collisions'), alt.Tooltip('DAY:O', title='Day of the Month')]
     ).properties(
         width=600,
         height=300
@@ -326,22 +580,13 @@ def day_line_chart(df: pd.DataFrame):
 
     # line = line + rule
 
-    line = line.transform_filter(
-        months
-    ).transform_filter(
-        conditions
-    ).transform_filter(
-        vehicles
-    ).transform_filter(
-        weekdays
-    ).transform_filter(
-        boroughs
-    )
+    line = filter_chart(line, selection)
 
     return line
 
 
-def kpi_collisions(df: pd.DataFrame, dim: int = 200):
+@traced()
+def kpi_collisions(df: pd.DataFrame, dim: int = 200, cube: bool = False, selection=None):
     """
     Creates a KPI chart with the total number of collisions.
 
@@ -353,8 +598,11 @@ def kpi_collisions(df: pd.DataFrame, dim: int = 200):
         Text to be displayed in the KPI chart.
     dim : int
         Dimension of the KPI chart.
-    filters : list
-        List of filters to be applied to the chart.
+    cube : bool
+        Whether to plot the pre-aggregated cube of the data instead of its rows.
+    selection : dict or iterable
+        Selected values per field to filter and aggregate server-side (see filter_rows), or None
+        to filter in the browser with the legends.
 
     Returns
     -------
@@ -362,24 +610,17 @@ def kpi_collisions(df: pd.DataFrame, dim: int = 200):
         KPI chart with the total number of collisions.
     """
 
-    df = df[['BOROUGH', 'VEHICLE TYPE CODE 1', 'MONTH', 'WEEKDAY', 'ICON']]
+    if cube or selection is not None:
+        df, count = selection_cube(df, selection), 'sum(COUNT)'
+    else:
+        df, count = df[['COLLISION_ID', 'BOROUGH', 'VEHICLE TYPE CODE 1', 'MONTH', 'WEEKDAY', 'ICON']], 'count()'
 
     kpi = alt.Chart(df).mark_text(size=dim/5)
 
-    kpi = kpi.transform_filter(
-        months
-    ).transform_filter(
-        conditions
-    ).transform_filter(
-        vehicles
-    ).transform_filter(
-        weekdays
-    ).transform_filter(
-        boroughs
-    )
+    kpi = filter_chart(kpi, selection)
     
     kpi = kpi.transform_aggregate(
-        count='count()'
+        count=count
     ).encode(
         x=alt.value(dim/2-0.35*dim),
         y=alt.value((dim/4)/2-0.3*(dim/4)),
@@ -394,7 +635,8 @@ def kpi_collisions(df: pd.DataFrame, dim: int = 200):
     return kpi
 
 
-def kpi_persons(df: pd.DataFrame, dim: int = 200):
+@traced()
+def kpi_persons(df: pd.DataFrame, dim: int = 200, cube: bool = False, selection=None):
     """
     Creates two KPI charts with the total number of injured and killed.
 
@@ -408,8 +650,11 @@ def kpi_persons(df: pd.DataFrame, dim: int = 200):
         Text to be displayed in the KPI chart for the total number of killed.
     dim : int
         Dimension of the KPI chart.
-    filters : list
-        List of filters to be applied to the chart.
+    cube : bool
+        Whether to plot the pre-aggregated cube of the data instead of its rows.
+    selection : dict or iterable
+        Selected values per field to filter and aggregate server-side (see filter_rows), or None
+        to filter in the browser with the legends.
 
     Returns
     -------
@@ -419,21 +664,14 @@ def kpi_persons(df: pd.DataFrame, dim: int = 200):
         KPI chart with the total number of killed.
     """
 
-    df = df[['BOROUGH', 'VEHICLE TYPE CODE 1', 'MONTH', 'WEEKDAY', 'ICON', 'TOTAL INJURED', 'TOTAL KILLED']]
+    if cube or selection is not None:
+        df = selection_cube(df, selection)
+    else:
+        df = df[['COLLISION_ID', 'BOROUGH', 'VEHICLE TYPE CODE 1', 'MONTH', 'WEEKDAY', 'ICON', 'TOTAL INJURED', 'TOTAL KILLED']]
 
     kpi = alt.Chart(df).mark_text(size=dim/5)
 
-    kpi = kpi.transform_filter(
-        months
-    ).transform_filter(
-        conditions
-    ).transform_filter(
-        vehicles
-    ).transform_filter(
-        weekdays
-    ).transform_filter(
-        boroughs
-    )
+    kpi = filter_chart(kpi, selection)
     
     kpi_injured = kpi.transform_aggregate(
         injured='sum(TOTAL INJURED)'
@@ -0,0 +1,282 @@
+##############################################################################################################
+__author__ = "Juan P. Zaldivar & Enric Millan"
+__version__ = "1.0.0"
+##############################################################################################################
+
+"""
+This module contains the functions to time the stages of the dashboard and of the preprocessing.
+
+A span times a named stage (loading a file, building a chart, serializing it) and can be nested. When the
+outermost span of a thread ends, the spans it holds are written as JSON lines to LOG_FILE (DASHBOARD_SPANS
+environment variable, e.g. logs/spans.jsonl; unset by default, so no log) with a shared trace id. A page
+render is the outermost span of a run of app(); the last PANEL_RENDERS renders of the process are kept in
+memory and shown in the sidebar when DASHBOARD_PANEL=1.
+
+Cached functions are traced with cached(), which flags each call as a cache hit or miss depending
+on whether the body of the function ran.
+
+Functions:
+----------
+
+span(name: str, **fields) -> contextmanager
+    Times a stage, yielding its record so more fields can be added.
+
+traced(name: str) -> callable
+    Decorator that times every call of a function in a span.
+
+cached(cache: callable, name: str) -> callable
+    Decorator that caches a function with a Streamlit cache and times its calls with the cache hit or miss.
+
+render(page: str) -> callable
+    Decorator that times a run of app() as a page render and draws the developer panel.
+
+recent_renders(n: int) -> list
+    Returns the spans of the last page renders of the process.
+
+developer_panel(n: int) -> None
+    Draws the timings of the last page renders in the sidebar.
+"""
+
+##############################################################################################################
+# IMPORTS ################################################################################ IMPORTS ###########
+##############################################################################################################
+import os
+import json
+import time
+import uuid
+import threading
+import functools
+import collections
+from contextlib import contextmanager
+
+
+##############################################################################################################
+# GLOBAL VARIABLES ############################################################## GLOBAL VARIABLES ###########
+##############################################################################################################
+LOG_FILE = os.environ.get('DASHBOARD_SPANS', '')
+
+PANEL = os.environ.get('DASHBOARD_PANEL', '0') == '1'
+PANEL_RENDERS = 10
+
+RENDERS = collections.deque(maxlen=PANEL_RENDERS)
+
+_local = threading.local()
+_lock = threading.Lock()
+
+
+##############################################################################################################
+# FUNCTIONS ############################################################################ FUNCTIONS ###########
+##############################################################################################################
+def _state() -> threading.local:
+    """
+    Returns the spans of the current thread, initializing them on the first call.
+    """
+
+    if not hasattr(_local, 'stack'):
+        _local.stack, _local.done, _local.misses = [], [], 0
+
+    return _local
+
+
+def _flush(spans: list) -> None:
+    """
+    Writes the spans of a trace to the log and keeps the page renders in memory.
+    """
+
+    trace = uuid.uuid4().hex[:12]
+    spans = sorted(spans, key=lambda s: (s['start'], s['depth']))
+    for s in spans:
+        s['trace'] = trace
+
+    if spans[0]['span'] == 'render':
+        RENDERS.append(spans)
+
+    if LOG_FILE:
+        with _lock:
+            os.makedirs(os.path.dirname(LOG_FILE) or '.', exist_ok=True)
+            with open(LOG_FILE, 'a') as f:
+                f.writelines(json.dumps(s, default=str) + '\n' for s in spans)
+
+
+@contextmanager
+def span(name: str, **fields):
+    """
+    Times a stage. The record of the span is yielded so the stage can add fields to it (e.g. the number of
+    rows). The spans are flushed when the outermost one ends.
+
+    Parameters
+    ----------
+    name : str
+        The name of the stage.
+    **fields
+        Extra fields of the record.
+
+    Yields
+    ------
+    dict
+        The record of the span, with its ms once it ends.
+    """
+
+    state = _state()
+    record = {'span': name, 'parent': state.stack[-1]['span'] if state.stack else None,
+              'depth': len(state.stack), 'start': time.time(), **fields}
+
+    state.stack.append(record)
+    begin = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record['ms'] = round((time.perf_counter() - begin) * 1000, 3)
+        state.stack.pop()
+        state.done.append(record)
+        if not state.stack:
+            spans, state.done = state.done, []
+            _flush(spans)
+
+
+def traced(name: str = None):
+    """
+    Returns a decorator that times every call of a function in a span.
+
+    Parameters
+    ----------
+    name : str
+        The name of the span, the name of the function by default.
+
+    Returns
+    -------
+    callable
+        The decorator.
+    """
+
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name or fn.__name__):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    return decorate
+
+
+def cached(cache, name: str = None):
+    """
+    Returns a decorator that caches a function with a Streamlit cache (e.g. st.cache_data or
+    st.cache_data(max_entries=64)) and times its calls with the cache hit or miss. A call is a miss when the
+    body of the function runs. The original function stays available as __wrapped__ and the cache as clear().
+
+    Parameters
+    ----------
+    cache : callable
+        The cache decorator.
+    name : str
+        The name of the span, the name of the function by default.
+
+    Returns
+    -------
+    callable
+        The decorator.
+    """
+
+    def decorate(fn):
+        @functools.wraps(fn)
+        def body(*args, **kwargs):
+            _state().misses += 1
+            return fn(*args, **kwargs)
+
+        cached_fn = cache(body)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            state = _state()
+            with span(name or fn.__name__) as record:
+                misses = state.misses
+                result = cached_fn(*args, **kwargs)
+                record['cache'] = 'miss' if state.misses > misses else 'hit'
+            return result
+
+        wrapper.clear = cached_fn.clear
+        return wrapper
+
+    return decorate
+
+
+def render(page: str):
+    """
+    Returns a decorator that times a run of app() as a page render and draws the developer panel once the
+    render ends, if enabled.
+
+    Parameters
+    ----------
+    page : str
+        The name of the page.
+
+    Returns
+    -------
+    callable
+        The decorator.
+    """
+
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span('render', page=page):
+                result = fn(*args, **kwargs)
+            if PANEL:
+                developer_panel()
+            return result
+        return wrapper
+
+    return decorate
+
+
+def recent_renders(n: int = PANEL_RENDERS) -> list:
+    """
+    Returns the spans of the last page renders of the process.
+
+    Parameters
+    ----------
+    n : int
+        The number of renders.
+
+    Returns
+    -------
+    list
+        The spans of each render, the most recent first.
+    """
+
+    return list(RENDERS)[::-1][:n]
+
+
+def developer_panel(n: int = PANEL_RENDERS) -> None:
+    """
+    Draws the timings of the last page renders in the sidebar: one row per render with its total time and
+    cache hits and misses, and the spans of the most recent one.
+
+    Parameters
+    ----------
+    n : int
+        The number of renders.
+    """
+
+    import pandas as pd
+    import streamlit as st
+
+    renders = recent_renders(n)
+    if not renders:
+        return
+
+    with st.sidebar.expander('Developer: render timings'):
+        st.dataframe(pd.DataFrame([{
+            'time': time.strftime('%H:%M:%S', time.localtime(spans[0]['start'])),
+            'page': spans[0].get('page'),
+            'ms': spans[0]['ms'],
+            'hits': sum(s.get('cache') == 'hit' for s in spans),
+            'misses': sum(s.get('cache') == 'miss' for s in spans),
+        } for spans in renders]), hide_index=True)
+
+        st.dataframe(pd.DataFrame([{
+            'span': '  ' * s['depth'] + s['span'],
+            'ms': s['ms'],
+            'cache': s.get('cache', ''),
+        } for spans in renders[:1] for s in spans]), hide_index=True)
@@ -12,11 +12,40 @@
 #                                                                                                  #
 ###################################################################################################
 
+import os
+import json
 import time
+import sqlite3
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import pandas as pd
+from functools import lru_cache
 import geopandas as gpd
+import shapely
+from shapely import STRtree, points
 from shapely.geometry import Point
 from geopy.geocoders import Nominatim
+from Modules.instrumentation import span, traced
+from Modules.store import STORE_PARTITIONS, store_path, read_store, write_store, read_partitions, write_partitions, read_watermark, write_watermark
+
+####################################################################################################
+#                                                                                                  #
+#   Global variables                                                                               #
+#                                                                                                  #
+####################################################################################################
+
+GEOCODE_CACHE = 'Data/geocode_cache.sqlite'
+
+BOROUGH_MAP = 'Data/new-york-city-boroughs-ny_.geojson'
+ZIP_MAP = 'Data/new-york-city-zipcodes-ny_.geojson'
+
+# Geometries parsed in this process, keyed by (map file, key column)
+GEOMETRY_STORE = {}
+
+WEATHER = 'Data/weather_clean.csv'
+
+LOCATION_COLUMNS = ['BOROUGH', 'ZIP CODE', 'LATITUDE', 'LONGITUDE']
 
 ####################################################################################################
 #                                                                                                  #
@@ -67,46 +96,644 @@ def capitalize_street(street_name):
     return street.strip()   
 
 
-def fill_missing_coordinates(row):
+@lru_cache(maxsize=None)
+def load_vehicle_mapping(file='Data/vehicle_types.json'):
+    """
+    Load the vehicle type clusters from a mapping file
+
+    The file is a JSON object with one list of raw vehicle codes per cluster, in the same
+    format used by the static dashboard pipeline. The compiled table is cached per file.
+
+    Parameters
+    ----------
+    file : str
+        Path of the mapping file
+
+    Returns
+    -------
+    mapping : dict
+        Lookup table from raw vehicle code to cluster
+    """
+
+    with open(file) as f:
+        clusters = json.load(f)
+
+    return {code: cluster for cluster, codes in clusters.items() for code in codes}
+
+
+@traced()
+def clusterize_vehicle_type(df, col='VEHICLE TYPE CODE 1', mapping=None, unknown='Unknown'):
+    """
+    Cluster the vehicle types into the project categories (Taxi, Fire and Ambulance)
+
+    Each distinct vehicle code is looked up once and the column is stored as categorical.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        DataFrame containing the data
+    col : str
+        Column with the vehicle type codes
+    mapping : dict
+        Lookup table from raw vehicle code to cluster, by default the one in Data/vehicle_types.json
+    unknown : str
+        Category given to missing values
+
+    Returns
+    -------
+    df : pandas.DataFrame
+        DataFrame containing the data with the clustered vehicle types
+    """
+
+    if mapping is None:
+        mapping = load_vehicle_mapping()
+
+    codes, uniques = pd.factorize(df[col])
+    clustered = [mapping.get(code, code) for code in uniques]
+    if (codes < 0).any():
+        clustered.append(unknown)
+
+    categories = pd.Index(pd.unique(np.asarray(clustered, dtype=object)))
+    lookup = categories.get_indexer(clustered)
+
+    df[col] = pd.Categorical.from_codes(lookup[codes], categories=categories)
+
+    return df
+
+
+def build_addresses(df):
+    """
+    Build the geocoding query of each row from the street name, borough and zip code
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        DataFrame containing the data
+
+    Returns
+    -------
+    addresses : pandas.Series
+        Query of each row, missing when the street name is missing
+    """
+
+    addresses = df['STREET NAME'].astype(object)
+
+    borough = df['BOROUGH']
+    addresses = addresses.where(borough.isna(), addresses + ', ' + borough.astype(object))
+
+    zip_code = pd.to_numeric(df['ZIP CODE'], errors='coerce')
+    has_zip = zip_code.notna()
+    addresses[has_zip] = addresses[has_zip] + ', ' + zip_code[has_zip].astype('int64').astype(str)
+
+    return addresses + ', New York City'
+
+
+def normalize_addresses(addresses):
+    """
+    Normalize the addresses so that the same place always gets the same cache key
+
+    Parameters
+    ----------
+    addresses : pandas.Series
+        Addresses to be normalized
+
+    Returns
+    -------
+    keys : pandas.Series
+        Lower case addresses with single spaces
+    """
+
+    return addresses.str.lower().str.replace(r'\s+', ' ', regex=True).str.strip()
+
+
+def open_geocode_cache(path=GEOCODE_CACHE):
+    """
+    Open (and create if needed) the on-disk geocoding cache
+
+    Every address looked up is stored with its coordinates, or with found = 0 when the
+    geocoder did not find it, so negative results are not requested again either.
+
+    Parameters
+    ----------
+    path : str
+        Path of the SQLite database
+
+    Returns
+    -------
+    cache : sqlite3.Connection
+        Connection to the cache
+    """
+
+    cache = sqlite3.connect(path)
+    cache.execute(
+        'CREATE TABLE IF NOT EXISTS geocode ('
+        'address TEXT PRIMARY KEY, latitude REAL, longitude REAL, '
+        'found INTEGER NOT NULL, hits INTEGER NOT NULL DEFAULT 0, updated TEXT)'
+    )
+    return cache
+
+
+def read_geocode_cache(cache, keys):
+    """
+    Read the cached results of some addresses
+
+    Parameters
+    ----------
+    cache : sqlite3.Connection
+        Connection to the cache
+    keys : list
+        Normalized addresses to be read
+
+    Returns
+    -------
+    cached : pandas.DataFrame
+        Cached address, latitude, longitude and found flag
+    """
+
+    chunks = []
+    for i in range(0, len(keys), 500):
+        chunk = keys[i:i + 500]
+        query = 'SELECT address, latitude, longitude, found FROM geocode WHERE address IN ({})'.format(', '.join('?' * len(chunk)))
+        chunks.append(pd.read_sql_query(query, cache, params=chunk))
+
+    if not chunks:
+        return pd.DataFrame(columns=['address', 'latitude', 'longitude', 'found'])
+    return pd.concat(chunks, ignore_index=True)
+
+
+class TokenBucket:
+    """
+    Token bucket limiting the rate of the requests sent to a geocoding backend
+
+    The same bucket can be shared by several event loops run one after the other (e.g. one
+    per batch), so the rate holds across them.
+
+    Parameters
+    ----------
+    rate : float
+        Requests allowed per second
+    capacity : int
+        Maximum number of requests allowed in a burst
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.loop = None
+        self.lock = None
+
+    async def acquire(self):
+        """
+        Wait until a request can be sent
+        """
+
+        # An asyncio lock belongs to the event loop it is first used in
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            self.loop, self.lock = loop, asyncio.Lock()
+
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def nominatim_backend(geolocator=None):
+    """
+    Geocoding backend using a geopy geocoder (Nominatim by default)
+
+    A backend is an async function that takes a query and returns its (latitude, longitude),
+    None when the address is not found, or raises an exception when the request fails.
+    The blocking geopy call runs in a worker thread.
+
+    Parameters
+    ----------
+    geolocator : geopy.geocoders.Geocoder
+        Geocoder to be used, a single client is shared by all the requests
+
+    Returns
+    -------
+    backend : coroutine function
+        Geocoding backend
+    """
+
+    if geolocator is None:
+        geolocator = Nominatim(user_agent="my_geocoder")
+
+    async def backend(query):
+        location = await asyncio.to_thread(geolocator.geocode, query)
+        if location:
+            return location.latitude, location.longitude
+        return None
+
+    return backend
+
+
+def table_backend(coordinates, latency=0):
+    """
+    Stand-in geocoding backend answering from a table, used to test the pipeline offline
+
+    Parameters
+    ----------
+    coordinates : dict
+        (latitude, longitude) of each known query
+    latency : float
+        Seconds each request takes
+
+    Returns
+    -------
+    backend : coroutine function
+        Geocoding backend
+    """
+
+    async def backend(query):
+        await asyncio.sleep(latency)
+        return coordinates.get(query)
+
+    return backend
+
+
+async def _geocode_all(queries, backend, bucket, concurrency, retries, backoff):
+    """
+    Geocode the queries concurrently, with a rate limit and retries with exponential backoff
+    """
+
+    pool = asyncio.Semaphore(concurrency)
+
+    async def geocode(query):
+        async with pool:
+            for attempt in range(retries + 1):
+                await bucket.acquire()
+                try:
+                    return await backend(query), None
+                except Exception as e:
+                    if attempt == retries:
+                        return None, e
+                    await asyncio.sleep(backoff * 2 ** attempt)
+
+    return await asyncio.gather(*(geocode(q) for q in queries))
+
+
+def geocode_concurrently(queries, backend=None, rate=1, concurrency=4, retries=3, backoff=1, bucket=None):
+    """
+    Geocode a list of queries with a bounded pool of concurrent requests
+
+    The requests never exceed the rate allowed by the provider, so the total time depends on
+    that rate instead of on the latency of each request.
+
+    Parameters
+    ----------
+    queries : list
+        Queries to be geocoded (already deduplicated)
+    backend : coroutine function
+        Geocoding backend, by default nominatim_backend()
+    rate : float
+        Requests allowed per second
+    concurrency : int
+        Maximum number of requests in flight
+    retries : int
+        Times a failed request is retried
+    backoff : float
+        Seconds to wait before the first retry, doubled on each retry
+    bucket : TokenBucket
+        Rate limit shared with other calls (e.g. the other batches of a run), by default a new
+        one allowing rate requests per second
+
+    Returns
+    -------
+    coordinates : pandas.DataFrame
+        Query, latitude, longitude, whether it was found and the error of the failed ones
+    """
+
+    if backend is None:
+        backend = nominatim_backend()
+
+    if bucket is None:
+        bucket = TokenBucket(rate)
+
+    coroutine = _geocode_all(list(queries), backend, bucket, concurrency, retries, backoff)
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        results = asyncio.run(coroutine)
+    else:
+        # Already inside an event loop (e.g. a notebook), so run in a separate thread
+        with ThreadPoolExecutor(1) as executor:
+            results = executor.submit(asyncio.run, coroutine).result()
+
+    return pd.DataFrame({
+        'query': list(queries),
+        'LATITUDE': [r[0] if r else None for r, _ in results],
+        'LONGITUDE': [r[1] if r else None for r, _ in results],
+        'found': [r is not None for r, _ in results],
+        'error': [e for _, e in results],
+    }, columns=['query', 'LATITUDE', 'LONGITUDE', 'found', 'error'])
+
+
+@traced()
+def geocode_addresses(addresses, cache, backend=None, rate=1, concurrency=4, batch=100):
+    """
+    Geocode a list of addresses going to the backend only for the ones not in the cache
+
+    The addresses are deduplicated by their normalized form before any lookup. The misses
+    are geocoded concurrently in batches, and each batch is saved in the cache as soon as
+    it finishes, so an interrupted run keeps its progress.
+
+    Parameters
+    ----------
+    addresses : pandas.Series
+        Addresses to be geocoded (may contain duplicates)
+    cache : sqlite3.Connection
+        Connection to the cache
+    backend : coroutine function
+        Geocoding backend used for the cache misses, by default nominatim_backend()
+    rate : float
+        Requests per second allowed by the backend
+    concurrency : int
+        Maximum number of requests in flight
+    batch : int
+        Number of addresses saved in the cache at once
+
+    Returns
+    -------
+    coordinates : pandas.DataFrame
+        Latitude and longitude of each normalized address (missing when not found)
+    stats : dict
+        Number of addresses, unique addresses, cache hits, negative hits, misses, found,
+        not found and errors
+    """
+
+    queries = pd.Series(addresses).dropna()
+    unique = pd.DataFrame({'address': normalize_addresses(queries), 'query': queries}).drop_duplicates('address')
+
+    cached = read_geocode_cache(cache, unique['address'].tolist())
+    cache.executemany('UPDATE geocode SET hits = hits + 1 WHERE address = ?', [(a,) for a in cached['address']])
+    cache.commit()
+
+    misses = unique[~unique['address'].isin(cached['address'])]
+    stats = {
+        'addresses': len(queries),
+        'unique': len(unique),
+        'hits': len(cached),
+        'negative_hits': int((cached['found'] == 0).sum()),
+        'misses': len(misses),
+        'found': 0,
+        'not_found': 0,
+        'errors': 0,
+    }
+
+    if len(misses) > 0 and backend is None:
+        backend = nominatim_backend()
+
+    # One rate limit for the whole run, a new bucket per batch would start full at every batch
+    bucket = TokenBucket(rate)
+    results = []
+    for i in range(0, len(misses), batch):
+        chunk = misses.iloc[i:i + batch]
+        geocoded = geocode_concurrently(chunk['query'], backend, rate, concurrency, bucket=bucket)
+        geocoded['address'] = chunk['address'].to_numpy()
+
+        for e in geocoded['error'].dropna():
+            print(f"Error: {e}")
+
+        # Failed requests are not cached, so they are tried again in the next run
+        geocoded = geocoded[geocoded['error'].isna()]
+        stats['errors'] += len(chunk) - len(geocoded)
+        stats['found'] += int(geocoded['found'].sum())
+        stats['not_found'] += int((~geocoded['found']).sum())
+
+        cache.executemany(
+            "INSERT OR REPLACE INTO geocode (address, latitude, longitude, found, hits, updated) VALUES (?, ?, ?, ?, 0, datetime('now'))",
+            [(a, lat, lon, int(f)) for a, lat, lon, f in zip(geocoded['address'], geocoded['LATITUDE'], geocoded['LONGITUDE'], geocoded['found'])]
+        )
+        cache.commit()
+
+        results.append(geocoded[['address', 'LATITUDE', 'LONGITUDE']].rename(columns={'LATITUDE': 'latitude', 'LONGITUDE': 'longitude'}))
+
+    coordinates = pd.concat([cached[['address', 'latitude', 'longitude']]] + results, ignore_index=True).set_index('address')
+    coordinates = coordinates.rename(columns={'latitude': 'LATITUDE', 'longitude': 'LONGITUDE'})
+
+    return coordinates, stats
+
+
+def _gazetteer_keys(df):
+    """
+    Normalized street, borough and zip code used as gazetteer keys
+    """
+
+    return pd.DataFrame({
+        'STREET': normalize_addresses(df['STREET NAME'].astype(object)),
+        'BOROUGH': df['BOROUGH'].astype(object).str.lower(),
+        'ZIP': pd.to_numeric(df['ZIP CODE'], errors='coerce'),
+    }, index=df.index)
+
+
+def build_gazetteer(df):
+    """
+    Build an offline street index from the rows that already have coordinates
+
+    The centroid of each street is computed at three levels: street, borough and zip code;
+    street and zip code; and street and borough. A street alone is only indexed when all its
+    rows are in the same borough, so common names such as Broadway are not mixed up.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        DataFrame containing the data
+
+    Returns
+    -------
+    gazetteer : list
+        (key columns, centroids) pairs, from the most to the least specific
+    """
+
+    known = df.dropna(subset=['LATITUDE', 'LONGITUDE', 'STREET NAME'])
+    keys = _gazetteer_keys(known)
+    keys['LATITUDE'] = known['LATITUDE']
+    keys['LONGITUDE'] = known['LONGITUDE']
+
+    gazetteer = []
+    for cols in [['STREET', 'BOROUGH', 'ZIP'], ['STREET', 'ZIP'], ['STREET', 'BOROUGH']]:
+        centroids = keys.dropna(subset=cols).groupby(cols)[['LATITUDE', 'LONGITUDE']].mean()
+        gazetteer.append((cols, centroids))
+
+    streets = keys.groupby('STREET').agg(LATITUDE=('LATITUDE', 'mean'), LONGITUDE=('LONGITUDE', 'mean'), BOROUGHS=('BOROUGH', 'nunique'))
+    gazetteer.append((['STREET'], streets[streets['BOROUGHS'] <= 1][['LATITUDE', 'LONGITUDE']]))
+
+    return gazetteer
+
+
+def geocode_offline(df, gazetteer):
+    """
+    Geocode rows with the gazetteer, trying each level from the most specific one
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        Rows to be geocoded
+    gazetteer : list
+        Street index built with build_gazetteer
+
+    Returns
+    -------
+    coordinates : pandas.DataFrame
+        Latitude and longitude of the rows found, with the index of df
+    """
+
+    pending = _gazetteer_keys(df.dropna(subset=['STREET NAME']))
+
+    found = []
+    for cols, centroids in gazetteer:
+        if pending.empty:
+            break
+        matched = pending.join(centroids, on=cols, how='inner')
+        found.append(matched[['LATITUDE', 'LONGITUDE']])
+        pending = pending.drop(matched.index)
+
+    if not found:
+        return pd.DataFrame(columns=['LATITUDE', 'LONGITUDE'])
+    return pd.concat(found)
+
+
+@traced()
+def fill_missing_coordinates(df, cache_path=GEOCODE_CACHE, backend=None, rate=1, concurrency=4, gazetteer=None, offline=False):
     """
     Fill missing coordinates using the street name, borough and zip code
 
+    Rows are first looked up in a gazetteer built from the rows that already have
+    coordinates. Only the remaining ones go to the geocoding backend, each distinct address
+    once and with several concurrent requests within the allowed rate. The results are kept in
+    an on-disk cache so a rerun only requests addresses it has never seen. The cache hits,
+    misses and errors are recorded in the 'geocoding' span (see instrumentation).
+
     Parameters
     ----------
-    row : pandas.Series
-        Row of the dataframe
+    df : pandas.DataFrame
+        DataFrame containing the data
+    cache_path : str
+        Path of the geocoding cache
+    backend : coroutine function
+        Geocoding backend used for the cache misses, by default nominatim_backend()
+    rate : float
+        Requests per second allowed by the backend
+    concurrency : int
+        Maximum number of requests in flight
+    gazetteer : list
+        Street index built with build_gazetteer, by default built from df
+    offline : bool
+        Whether to skip the geocoding backend and use only the gazetteer
     
     Returns
     -------
-    row : pandas.Series
-        Row of the dataframe with the filled coordinates
+    df : pandas.DataFrame
+        DataFrame containing the data with the filled coordinates
     """
 
-    geolocator = Nominatim(user_agent="my_geocoder")
+    missing = df['LATITUDE'].isna() | df['LONGITUDE'].isna()
 
-    street_name = row['STREET NAME']
-    latitude = row['LATITUDE']
-    longitude = row['LONGITUDE']
-    
-    if pd.isnull(latitude) or pd.isnull(longitude):
+    if gazetteer is None:
+        gazetteer = build_gazetteer(df)
+    found = geocode_offline(df[missing], gazetteer)
+    df.loc[found.index, ['LATITUDE', 'LONGITUDE']] = found[['LATITUDE', 'LONGITUDE']].to_numpy()
+    missing[found.index] = False
+
+    if offline or not missing.any():
+        return df
+
+    addresses = build_addresses(df[missing]).dropna()
+
+    # The counts of geocode_addresses are kept in the span of the stage instead of being printed
+    with span('geocoding', gazetteer=len(found)) as record:
+        cache = open_geocode_cache(cache_path)
         try:
-            borough = row['BOROUGH']
-            if not pd.isnull(borough):
-                street_name = street_name + ', ' + borough
-            zip_code = row['ZIP CODE']
-            if not pd.isnull(zip_code):
-                street_name = street_name + ', ' + str(int(zip_code))
-
-            time.sleep(1)
-
-            location = geolocator.geocode(street_name + ', New York City')
-            if location:
-                row['LATITUDE'] = location.latitude
-                row['LONGITUDE'] = location.longitude
-        except Exception as e:
-            print(f"Error: {e}")
-    
-    return row
+            coordinates, stats = geocode_addresses(addresses, cache, backend, rate, concurrency)
+        finally:
+            cache.close()
+        record.update(stats)
+
+    found = coordinates.reindex(normalize_addresses(addresses))
+    found.index = addresses.index
+    found = found.dropna()
+    df.loc[found.index, ['LATITUDE', 'LONGITUDE']] = found[['LATITUDE', 'LONGITUDE']].to_numpy()
+
+    return df
+
+
+def geometry_cache_path(file):
+    """
+    Get the path of the WKB cache of a geojson file
+
+    Parameters
+    ----------
+    file : str
+        Path of the geojson file
+
+    Returns
+    -------
+    path : str
+        Path of the Feather file next to the geojson
+    """
+
+    return os.path.splitext(file)[0] + '.feather'
+
+
+@traced()
+def load_geometries(file, key):
+    """
+    Load the geometries of a map keyed by one of its properties
+
+    The map is parsed once per process. The first load also writes the geometries as WKB
+    in a Feather file next to the geojson, so the next processes skip the JSON parsing
+    while the geojson is not modified. The geometries are prepared for repeated
+    predicates and, when a key is repeated, the first feature is kept.
+
+    Parameters
+    ----------
+    file : str
+        Path of the geojson file
+    key : str
+        Property used as key of the geometries
+
+    Returns
+    -------
+    geometries : dict
+        Dictionary containing the prepared geometry of each key
+    """
+
+    if (file, key) in GEOMETRY_STORE:
+        return GEOMETRY_STORE[(file, key)]
+
+    cache = geometry_cache_path(file)
+    table = None
+    if os.path.exists(cache) and os.path.getmtime(cache) >= os.path.getmtime(file):
+        try:
+            table = pd.read_feather(cache)
+        except ImportError:
+            pass
+        if table is not None and key not in table.columns:
+            table = None
+
+    if table is None:
+        nyc_map = gpd.read_file(file).drop_duplicates(subset=key, keep='first')
+        table = pd.DataFrame({key: nyc_map[key].to_numpy(), 'geometry': shapely.to_wkb(nyc_map.geometry.values)})
+        try:
+            table.to_feather(cache)
+        except ImportError:
+            pass
+
+    geometries = shapely.from_wkb(table['geometry'].to_numpy())
+    shapely.prepare(geometries)
+
+    GEOMETRY_STORE[(file, key)] = dict(zip(table[key].tolist(), geometries))
+
+    return GEOMETRY_STORE[(file, key)]
 
 
 def get_borough_polygons():
@@ -119,16 +746,11 @@ def get_borough_polygons():
         Dictionary containing the polygon of each borough
     """
 
-    nyc_map = gpd.read_file('Data/new-york-city-boroughs-ny_.geojson')
+    polygons = load_geometries(BOROUGH_MAP, 'name')
 
     boroughs = ['Bronx', 'Brooklyn', 'Manhattan', 'Queens', 'Staten Island']
 
-    borough_poly = {}
-    for b in boroughs:
-        poly = nyc_map[nyc_map['name'] == b]['geometry']
-        borough_poly[b] = poly.values[0]
-
-    return borough_poly
+    return {b: polygons[b] for b in boroughs}
 
 
 def get_zip_polygons():
@@ -141,23 +763,61 @@ def get_zip_polygons():
         Dictionary containing the polygon of each zip code
     """
 
-    nyc_map = gpd.read_file('Data/new-york-city-zipcodes-ny_.geojson')
+    return dict(load_geometries(ZIP_MAP, 'postalCode'))
 
-    zips = nyc_map['postalCode'].unique().tolist()
 
-    # Extraction of the zips polygon
-    zip_poly = {}
-    for z in zips:
-        poly = nyc_map[nyc_map['postalCode'] == z]['geometry']
-        zip_poly[z] = poly.values[0]
+def locate_points(lon, lat, polygons):
+    """
+    Find the polygon that contains each point using a spatial index
 
-    return zip_poly
+    When a point falls inside several polygons, the first one in the dictionary order is
+    taken, as in a linear search over the polygons.
 
+    Parameters
+    ----------
+    lon : numpy.ndarray
+        Longitude of the points
+    lat : numpy.ndarray
+        Latitude of the points
+    polygons : dict
+        Dictionary containing the polygons keyed by name
 
-def fill_missing_borough_zip(df, borough_poly, zip_poly):
+    Returns
+    -------
+    rows : numpy.ndarray
+        Positions of the points that fall inside a polygon
+    keys : numpy.ndarray
+        Key of the polygon containing each of those points
+    """
+
+    keys = np.empty(len(polygons), dtype=object)
+    keys[:] = list(polygons.keys())
+    geoms = np.empty(len(polygons), dtype=object)
+    geoms[:] = list(polygons.values())
+
+    # Candidates by bounding box, then a point in polygon test against the prepared polygons
+    # (a 'within' predicate would prepare the points instead)
+    shapely.prepare(geoms)
+    tree = STRtree(geoms)
+    pts, polys = tree.query(points(lon, lat))
+    inside = shapely.contains_xy(geoms[polys], lon[pts], lat[pts])
+    pts, polys = pts[inside], polys[inside]
+
+    order = np.lexsort((polys, pts))
+    pts, polys = pts[order], polys[order]
+    rows, first = np.unique(pts, return_index=True)
+
+    return rows, keys[polys[first]]
+
+
+@traced()
+def fill_missing_borough_zip(df, borough_poly, zip_poly, check=0):
     """
     Fill missing borough and zip code using the coordinates
 
+    All the coordinates are located at once against an STRtree of the polygons, and the
+    borough and zip code columns are written with a single assignment each.
+
     Parameters
     ----------
     df : pandas.DataFrame
@@ -168,6 +828,9 @@ def fill_missing_borough_zip(df, borough_poly, zip_poly):
     
     zip_poly : dict
         Dictionary containing the polygon of each zip code
+
+    check : int
+        Number of rows sampled to compare the result with the row by row search
     
     Returns
     -------
@@ -175,6 +838,45 @@ def fill_missing_borough_zip(df, borough_poly, zip_poly):
         DataFrame containing the data with the filled borough and zip code
     """
 
+    # Boroughs are written in upper case and zip codes with the dtype of the column
+    borough_poly = {b.upper(): poly for b, poly in borough_poly.items()}
+    if pd.api.types.is_numeric_dtype(df['ZIP CODE']):
+        zip_poly = {float(z): poly for z, poly in zip_poly.items()}
+
+    sample = None
+    if check > 0:
+        sample = df.sample(min(check, len(df)), random_state=0).copy()
+        _fill_missing_borough_zip_loop(sample, borough_poly, zip_poly)
+
+    lon = df['LONGITUDE'].to_numpy(dtype=float)
+    lat = df['LATITUDE'].to_numpy(dtype=float)
+
+    for col, polygons in [('BOROUGH', borough_poly), ('ZIP CODE', zip_poly)]:
+        rows, keys = locate_points(lon, lat, polygons)
+        if pd.api.types.is_numeric_dtype(df[col]):
+            keys = keys.astype(float)
+
+        # Rows whose value is None are left untouched, as in the row by row search
+        keep = np.not_equal(df[col].to_numpy(dtype=object)[rows], None)
+        # Positional write, a duplicated index label would write every row sharing it
+        df.iloc[rows[keep], df.columns.get_loc(col)] = keys[keep]
+
+    if sample is not None:
+        cols = ['BOROUGH', 'ZIP CODE']
+        mismatches = (~((df.loc[sample.index, cols] == sample[cols]) | (df.loc[sample.index, cols].isna() & sample[cols].isna()))).any(axis=1)
+        if mismatches.any():
+            raise AssertionError(f'{int(mismatches.sum())} of {len(sample)} sampled rows differ from the row by row search')
+
+    return df
+
+
+def _fill_missing_borough_zip_loop(df, borough_poly, zip_poly):
+    """
+    Fill missing borough and zip code testing each row against every polygon
+
+    Reference implementation used to check fill_missing_borough_zip.
+    """
+
     for idx, row in df.iterrows():
         lon = row['LONGITUDE']
         lat = row['LATITUDE']
@@ -195,3 +897,161 @@ def fill_missing_borough_zip(df, borough_poly, zip_poly):
                     if p.within(poly):
                         df.loc[idx, 'ZIP CODE'] = z
                         break
+
+
+@traced()
+def process_collisions(df, weather=None, borough_poly=None, zip_poly=None, geocode=False):
+    """
+    Run the cleaning, clusterizing, geocoding and merging flow on a batch of collisions
+
+    The batch has the columns of the preprocessed collisions file and the result has the
+    columns of merged.csv. Collisions that cannot be located are dropped.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        DataFrame containing the collisions
+    weather : pandas.DataFrame
+        Daily weather, by default the one in Data/weather_clean.csv
+    borough_poly : dict
+        Dictionary containing the polygon of each borough, by default the geometry store one
+    zip_poly : dict
+        Dictionary containing the polygon of each zip code, by default the geometry store one
+    geocode : bool
+        Whether to fill the missing coordinates from the street names first
+
+    Returns
+    -------
+    df : pandas.DataFrame
+        DataFrame containing the processed collisions merged with the weather
+    """
+
+    if weather is None:
+        weather = pd.read_csv(WEATHER)
+    if borough_poly is None:
+        borough_poly = get_borough_polygons()
+    if zip_poly is None:
+        zip_poly = get_zip_polygons()
+
+    df = df.copy()
+    if geocode:
+        fill_missing_coordinates(df)
+    fill_missing_borough_zip(df, borough_poly, zip_poly)
+    # (0, 0) is used as a missing location in the raw data
+    df = df.dropna(subset=LOCATION_COLUMNS)
+    df = df[(df['LATITUDE'] != 0) & (df['LONGITUDE'] != 0)]
+
+    # Each distinct borough is capitalized once
+    boroughs = df['BOROUGH'].unique()
+    df['BOROUGH'] = df['BOROUGH'].map(dict(zip(boroughs, [capitalize_boroughs(b) for b in boroughs])))
+    clusterize_vehicle_type(df)
+
+    dates = pd.to_datetime(df['CRASH DATE'])
+    df['HOUR'] = df['CRASH TIME'].str.split(':').str[0].astype(int)
+    df['MONTH'] = dates.dt.month_name()
+    df['WEEKDAY'] = dates.dt.day_name()
+
+    return df.merge(weather, left_on='CRASH DATE', right_on='datetime', how='left')
+
+
+def _after_watermark(df, watermark):
+    """
+    Mask of the collisions beyond a (CRASH DATE, COLLISION_ID) watermark
+    """
+
+    date, collision_id = watermark
+    dates = df['CRASH DATE'].astype(str)
+
+    return ((dates > date) | ((dates == date) & (df['COLLISION_ID'] > collision_id))).to_numpy()
+
+
+def _last_key(df):
+    """
+    Largest (CRASH DATE, COLLISION_ID) of a DataFrame
+    """
+
+    last = df.sort_values(['CRASH DATE', 'COLLISION_ID']).iloc[-1]
+
+    return str(last['CRASH DATE']), int(last['COLLISION_ID'])
+
+
+@traced()
+def update_collisions(new, corrections=None, file='merged.csv', path='Data/', **kwargs):
+    """
+    Append new collisions and merge late corrections into the partitioned store
+
+    Only the new collisions beyond the watermark of the store are processed, so running
+    the same daily file twice does nothing. Corrections replace the stored collisions
+    with the same COLLISION_ID (or are added if there is none), so they can be applied
+    again with the same result. Only the partitions (days) of the processed collisions,
+    and those the corrected ones come from, are rewritten.
+
+    Parameters
+    ----------
+    new : pandas.DataFrame
+        New collisions, with the columns of the preprocessed collisions file
+    corrections : pandas.DataFrame
+        Corrected collisions, with the same columns
+    file : str
+        Name of the CSV file of the store
+    path : str
+        Folder of the store
+    **kwargs
+        Arguments passed to process_collisions
+
+    Returns
+    -------
+    stats : dict
+        Number of new and corrected collisions, rewritten partitions and new watermark
+    """
+
+    partition_by = STORE_PARTITIONS[file]
+    store = store_path(file, path)
+
+    # A store written as a single file (or only the CSV file) is split into partitions the first time
+    if not os.path.isdir(store) and (os.path.exists(store) or os.path.exists(path + file)):
+        stored = read_store(file, path)
+        write_store(stored, file, path, partition_by)
+        if len(stored):
+            write_watermark(_last_key(stored), file, path)
+
+    watermark = read_watermark(file, path)
+    if watermark is not None:
+        new = new[_after_watermark(new, watermark)]
+
+    if corrections is None:
+        corrections = new.iloc[:0]
+
+    batch = pd.concat([new, corrections], ignore_index=True).drop_duplicates('COLLISION_ID', keep='last')
+    stats = {'new': len(new), 'corrected': len(corrections), 'partitions': 0, 'watermark': watermark}
+    if batch.empty:
+        return stats
+
+    processed = process_collisions(batch, **kwargs)
+
+    # Partitions holding the previous version of the corrected collisions
+    days = set(processed[partition_by].astype(str))
+    if len(corrections):
+        stored = read_store(file, path, ['COLLISION_ID', partition_by])
+        days |= set(stored.loc[stored['COLLISION_ID'].isin(corrections['COLLISION_ID']), partition_by].astype(str))
+
+    days = sorted(days)
+    current = read_partitions(file, path, days)
+    if current is not None:
+        current = current[~current['COLLISION_ID'].isin(processed['COLLISION_ID'])]
+        current = current.astype({col: object for col in current.columns if isinstance(current[col].dtype, pd.CategoricalDtype)})
+        processed = pd.concat([current, processed], ignore_index=True)
+
+    # Partitions left empty are removed before writing, so the write (and the new generation) comes last
+    for day in set(days) - set(processed[partition_by].astype(str)):
+        os.remove(os.path.join(store, f'{day}.parquet'))
+    write_partitions(processed, file, path, partition_by)
+
+    last = _last_key(processed)
+    if watermark is None or last > tuple(watermark):
+        write_watermark(last, file, path)
+        watermark = last
+
+    stats.update(partitions=len(days), watermark=watermark)
+
+    return stats
@@ -0,0 +1,155 @@
+##############################################################################################################
+__author__ = "Juan P. Zaldivar & Enric Millan"
+__version__ = "1.0.0"
+##############################################################################################################
+
+"""
+This module contains the optimization passes applied to the Vega-Lite specification of the dashboard.
+
+Functions:
+----------
+
+shared_datasets(chart: alt.TopLevelMixin, name: str, key: str) -> tuple
+    Hoists the row-level datasets of the views into one named dataset with the union of their columns.
+"""
+
+##############################################################################################################
+# IMPORTS ################################################################################ IMPORTS ###########
+##############################################################################################################
+import json
+import altair as alt
+from Modules.instrumentation import traced
+
+
+##############################################################################################################
+# FUNCTIONS ############################################################################ FUNCTIONS ###########
+##############################################################################################################
+@traced()
+def shared_datasets(chart: alt.TopLevelMixin, name: str = 'collisions', key: str = 'COLLISION_ID') -> tuple:
+    """
+    Hoists the row-level datasets of the views into one named dataset with the union of their columns.
+
+    Every view built with alt.Chart(df[[...]]) over the same collisions embeds its own projection of
+    the rows, so the payload grows with the number of views. The row-level projections carry the key
+    column, and two datasets are merged when they hold the same keys (each once) and the same values
+    in the columns they share; the merged dataset holds the union of their columns, joined on the key,
+    and every view references it by name. Datasets without the key (legends, aggregated cubes) are
+    kept as they are, as are the row-level ones that do not match any other. When no two datasets
+    are merged (e.g. the charts are drawn from cubes) the specification is returned as is, without
+    serializing it. Otherwise the key is dropped afterwards when no view encodes it.
+
+    Parameters
+    ----------
+    chart : alt.TopLevelMixin
+        Chart to be optimized.
+    name : str
+        Name of the merged dataset (a suffix is added when there is more than one).
+    key : str
+        Column identifying the rows.
+
+    Returns
+    -------
+    dict
+        Optimized Vega-Lite specification.
+    dict
+        Number of datasets of the specification before and after the pass.
+    """
+
+    spec = chart.to_dict()
+    datasets = spec.get('datasets', {})
+
+    # Greedy grouping, starting from the datasets with more columns (inlined assets are not records)
+    records = [k for k in datasets if isinstance(datasets[k], list) and key in _columns(datasets[k])]
+    groups = []
+    for k in sorted(records, key=lambda k: -len(_columns(datasets[k]))):
+        for group in groups:
+            if _aligned(group['values'], datasets[k], key):
+                group['keys'].append(k)
+                group['values'] = _merge(group['values'], datasets[k], key)
+                break
+        else:
+            groups.append({'keys': [k], 'values': datasets[k]})
+
+    shared = [group for group in groups if len(group['keys']) > 1]
+    if not shared:
+        return spec, {'datasets_before': len(datasets), 'datasets_after': len(datasets)}
+
+    renames = {}
+    merged = {}
+    for i, group in enumerate(shared):
+        new = name if i == 0 else f'{name}-{i + 1}'
+        merged[new] = group['values']
+        renames.update({k: new for k in group['keys']})
+
+    spec = _rename_data(spec, renames)
+    spec['datasets'] = {k: v for k, v in datasets.items() if k not in renames}
+    spec['datasets'].update(merged)
+
+    # The key only aligns the datasets, it is not sent unless a view encodes it
+    views = json.dumps({k: v for k, v in spec.items() if k != 'datasets'})
+    if key not in views:
+        spec['datasets'] = {k: _drop(v, key) if k in records or k in merged else v for k, v in spec['datasets'].items()}
+
+    report = {
+        'datasets_before': len(datasets),
+        'datasets_after': len(spec['datasets']),
+    }
+
+    return spec, report
+
+
+def _columns(values: list) -> list:
+    """
+    Returns the columns of a dataset given as a list of records.
+    """
+
+    return list(values[0].keys()) if values else []
+
+
+def _aligned(a: list, b: list, key: str) -> bool:
+    """
+    Tells whether two datasets hold the same rows, that is, the same keys (each once) and the same
+    values in the columns they share.
+    """
+
+    if len(a) != len(b) or not a or key not in _columns(a) or key not in _columns(b):
+        return False
+
+    rows = {ra[key]: ra for ra in a}
+    if len(rows) != len(a):
+        return False
+
+    common = set(_columns(a)) & set(_columns(b))
+    return all(rb[key] in rows and all(rows[rb[key]].get(c) == rb.get(c) for c in common) for rb in b)
+
+
+def _merge(a: list, b: list, key: str) -> list:
+    """
+    Merges the columns of two aligned datasets, joined on the key.
+    """
+
+    rows = {rb[key]: rb for rb in b}
+    return [{**ra, **rows[ra[key]]} for ra in a]
+
+
+def _drop(values: list, column: str) -> list:
+    """
+    Drops a column of a dataset given as a list of records.
+    """
+
+    return [{c: v for c, v in record.items() if c != column} for record in values]
+
+
+def _rename_data(spec, renames: dict):
+    """
+    Replaces the named data references of a specification.
+    """
+
+    if isinstance(spec, dict):
+        spec = {k: _rename_data(v, renames) for k, v in spec.items()}
+        if 'data' in spec and isinstance(spec['data'], dict) and spec['data'].get('name') in renames:
+            spec['data'] = {**spec['data'], 'name': renames[spec['data']['name']]}
+        return spec
+    if isinstance(spec, list):
+        return [_rename_data(v, renames) for v in spec]
+    return spec
@@ -0,0 +1,487 @@
+##############################################################################################################
+__author__ = "Juan P. Zaldivar & Enric Millan"
+__version__ = "1.0.0"
+##############################################################################################################
+
+"""
+This module contains the functions to write and read the columnar data store of the dashboard.
+
+The store is a Parquet copy of a CSV file of the Data folder, with categorical dtypes for the
+columns used by the filters. It is built by the preprocessing pipeline, or from the current CSV
+files running this module from the dashboard folder:
+
+    python Modules/store.py
+
+The stores in STORE_PARTITIONS are folders with one Parquet file per value of a column (e.g. one per
+day), so an incremental update only rewrites the partitions it touches. Their watermark, the last
+(CRASH DATE, COLLISION_ID) processed, is kept in a JSON file next to the store. Every write of a store
+also bumps its generation, a counter kept in another JSON file, which keys the caches of the dashboard
+(the watermark does not move when an update only corrects stored collisions).
+
+The dashboard compacts the loaded data with the dtypes of SCHEMA: categoricals with a fixed order
+of categories (so months and weekdays sort by the calendar), downcast integers, float32 coordinates
+and a datetime CRASH DATE.
+
+Functions:
+----------
+
+store_path(file: str, path: str) -> str
+    Returns the path of the columnar store of a CSV file.
+
+write_store(df: pd.DataFrame, file: str, path: str, partition_by: str) -> str
+    Writes a DataFrame to the columnar store of a CSV file, optionally partitioned by a column.
+
+write_partitions(df: pd.DataFrame, file: str, path: str, partition_by: str) -> list
+    Writes (replacing) the partitions of a partitioned store with the rows of a DataFrame.
+
+read_partitions(file: str, path: str, values: list) -> pd.DataFrame
+    Reads some partitions of a partitioned store.
+
+read_store(file: str, path: str, columns: list) -> pd.DataFrame
+    Reads the projected columns of a CSV file from its columnar store, or from the CSV if there is no store.
+
+read_watermark(file: str, path: str) -> tuple
+    Reads the watermark of a store.
+
+write_watermark(watermark: tuple, file: str, path: str) -> str
+    Writes the watermark of a store.
+
+read_generation(file: str, path: str) -> int
+    Reads the generation of a store, the number of times it has been written.
+
+optimize_dtypes(df: pd.DataFrame, schema: dict) -> tuple
+    Converts the columns of a DataFrame to the compact dtypes of a schema and reports the memory saved.
+"""
+
+##############################################################################################################
+# IMPORTS ################################################################################ IMPORTS ###########
+##############################################################################################################
+import os
+import sys
+import json
+import shutil
+import warnings
+import numpy as np
+import pandas as pd
+
+# Parquet is optional: without pyarrow the CSV files are read instead
+try:
+    from pyarrow import ArrowInvalid
+except ImportError:
+    ArrowInvalid = OSError
+
+
+##############################################################################################################
+# GLOBAL VARIABLES ############################################################## GLOBAL VARIABLES ###########
+##############################################################################################################
+CATEGORICAL = ['BOROUGH', 'MONTH', 'WEEKDAY', 'ICON', 'VEHICLE TYPE CODE 1']
+
+STORE_FILES = ['merged.csv', 'collisions_clean.csv']
+
+STORE_PARTITIONS = {'merged.csv': 'CRASH DATE'}
+
+SCHEMA = {
+    'COLLISION_ID': 'int32',
+    'CRASH DATE': 'datetime64[ns]',
+    'BOROUGH': pd.CategoricalDtype(['Bronx', 'Brooklyn', 'Manhattan', 'Queens', 'Staten Island']),
+    'ZIP CODE': 'int32',
+    'LATITUDE': 'float32',
+    'LONGITUDE': 'float32',
+    'STREET NAME': 'category',
+    'CONTRIBUTING FACTOR VEHICLE 1': 'category',
+    'VEHICLE TYPE CODE 1': 'category',
+    'TOTAL INJURED': 'int16',
+    'TOTAL KILLED': 'int16',
+    'HOUR': 'int8',
+    'MONTH': pd.CategoricalDtype(['June', 'July', 'August', 'September'], ordered=True),
+    'WEEKDAY': pd.CategoricalDtype(['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'], ordered=True),
+    'ICON': pd.CategoricalDtype(['Clear', 'Partly cloudy', 'Cloudy', 'Rainy']),
+}
+
+
+##############################################################################################################
+# FUNCTIONS ############################################################################ FUNCTIONS ###########
+##############################################################################################################
+def store_path(file: str, path: str = './') -> str:
+    """
+    Returns the path of the columnar store of a CSV file.
+
+    Parameters
+    ----------
+    file : str
+        Name of the CSV file.
+    path : str
+        Folder of the CSV file.
+
+    Returns
+    -------
+    str
+        Path of the Parquet file.
+    """
+
+    return path + os.path.splitext(file)[0] + '.parquet'
+
+
+def _remove(out: str) -> None:
+    """
+    Removes a file or a folder, if it exists.
+    """
+
+    if os.path.isdir(out):
+        shutil.rmtree(out)
+    elif os.path.exists(out):
+        os.remove(out)
+
+
+def _tmp_path(out: str) -> str:
+    """
+    Returns the temporary path of a new file or folder, hidden (the Parquet readers skip the files whose name
+    starts with a dot) so it is not read as a partition of the store being written.
+    """
+
+    return os.path.join(os.path.dirname(out), f'.{os.path.basename(out)}.{os.getpid()}.tmp')
+
+
+def _replace(tmp: str, out: str) -> None:
+    """
+    Moves a new file or folder to out. A file replaces a file atomically; a folder (or a file replacing a folder)
+    takes the place of the previous store right after it is moved aside, so a reader may miss it for a moment but
+    never reads a partial store.
+    """
+
+    if os.path.isdir(tmp) or os.path.isdir(out):
+        old = tmp + '.old'
+        if os.path.exists(out):
+            os.replace(out, old)
+        os.replace(tmp, out)
+        _remove(old)
+    else:
+        os.replace(tmp, out)
+
+
+def _write_parquet(df: pd.DataFrame, out: str) -> None:
+    """
+    Writes a DataFrame to a temporary Parquet file next to out and then moves it to out.
+    """
+
+    tmp = _tmp_path(out)
+    try:
+        df.to_parquet(tmp, index=False)
+        _replace(tmp, out)
+    finally:
+        _remove(tmp)
+
+
+def write_store(df: pd.DataFrame, file: str, path: str = './', partition_by: str = None) -> str:
+    """
+    Writes a DataFrame to the columnar store of a CSV file, replacing the previous store. The new store is written
+    next to the previous one and then takes its place (see _replace).
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Data to be stored.
+    file : str
+        Name of the CSV file the store replaces.
+    path : str
+        Folder of the CSV file.
+    partition_by : str
+        Column whose values split the store into one Parquet file each, if any.
+
+    Returns
+    -------
+    str
+        Path of the Parquet file (or folder).
+    """
+
+    store = store_path(file, path)
+    df = df.astype({col: 'category' for col in CATEGORICAL if col in df.columns})
+
+    if partition_by is None:
+        _write_parquet(df, store)
+    else:
+        tmp = _tmp_path(store)
+        try:
+            os.makedirs(tmp)
+            for value, part in df.groupby(partition_by, sort=True, observed=True):
+                part.to_parquet(os.path.join(tmp, f'{value}.parquet'), index=False)
+            _replace(tmp, store)
+        finally:
+            _remove(tmp)
+
+    _bump_generation(file, path)
+
+    return store
+
+
+def write_partitions(df: pd.DataFrame, file: str, path: str = './', partition_by: str = 'CRASH DATE') -> list:
+    """
+    Writes (replacing) the partitions of a partitioned store with the rows of a DataFrame.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Rows of the partitions to be written, all of them (partitions are not merged).
+    file : str
+        Name of the CSV file the store replaces.
+    path : str
+        Folder of the CSV file.
+    partition_by : str
+        Column whose values split the store.
+
+    Returns
+    -------
+    list
+        Values of the written partitions.
+    """
+
+    store = store_path(file, path)
+    os.makedirs(store, exist_ok=True)
+
+    df = df.astype({col: 'category' for col in CATEGORICAL if col in df.columns})
+    values = []
+    for value, part in df.groupby(partition_by, sort=True, observed=True):
+        _write_parquet(part, os.path.join(store, f'{value}.parquet'))
+        values.append(value)
+    _bump_generation(file, path)
+
+    return values
+
+
+def read_partitions(file: str, path: str = './', values: list = ()) -> pd.DataFrame:
+    """
+    Reads some partitions of a partitioned store. Missing partitions are skipped.
+
+    Parameters
+    ----------
+    file : str
+        Name of the CSV file.
+    path : str
+        Folder of the CSV file.
+    values : list
+        Values of the partitions to be read.
+
+    Returns
+    -------
+    pd.DataFrame
+        Rows of the partitions, or None if none of them exists.
+    """
+
+    store = store_path(file, path)
+    parts = [os.path.join(store, f'{value}.parquet') for value in values]
+    parts = [part for part in parts if os.path.exists(part)]
+
+    return pd.concat([pd.read_parquet(part) for part in parts], ignore_index=True) if parts else None
+
+
+def read_store(file: str, path: str = './', columns: list = None) -> pd.DataFrame:
+    """
+    Reads the projected columns of a CSV file from its columnar store, memory-mapped. When there is no store, no
+    Parquet engine installed or an unreadable store (e.g. one truncated by an interrupted write) the CSV file is
+    parsed instead.
+
+    Parameters
+    ----------
+    file : str
+        Name of the CSV file.
+    path : str
+        Folder of the CSV file.
+    columns : list
+        Columns to be read, all of them by default.
+
+    Returns
+    -------
+    pd.DataFrame
+        The data, with the columns in the requested order.
+    """
+
+    store = store_path(file, path)
+    if os.path.exists(store):
+        try:
+            return pd.read_parquet(store, columns=columns, memory_map=True)
+        except ImportError:
+            pass
+        except (OSError, ArrowInvalid) as e:
+            warnings.warn(f'Unreadable store {store} ({e}), reading {path + file} instead', stacklevel=2)
+
+    df = pd.read_csv(path + file, usecols=columns)
+
+    return df if columns is None else df[columns]
+
+
+def watermark_path(file: str, path: str = './') -> str:
+    """
+    Returns the path of the watermark of the store of a CSV file.
+    """
+
+    return path + os.path.splitext(file)[0] + '.watermark.json'
+
+
+def read_watermark(file: str, path: str = './') -> tuple:
+    """
+    Reads the watermark of a store, the last (CRASH DATE, COLLISION_ID) it holds.
+
+    Parameters
+    ----------
+    file : str
+        Name of the CSV file.
+    path : str
+        Folder of the CSV file.
+
+    Returns
+    -------
+    tuple
+        The CRASH DATE and COLLISION_ID of the watermark, or None if it has not been written.
+    """
+
+    watermark = watermark_path(file, path)
+    if not os.path.exists(watermark):
+        return None
+
+    with open(watermark) as f:
+        data = json.load(f)
+
+    return data['CRASH DATE'], data['COLLISION_ID']
+
+
+def write_watermark(watermark: tuple, file: str, path: str = './') -> str:
+    """
+    Writes the watermark of a store.
+
+    Parameters
+    ----------
+    watermark : tuple
+        The CRASH DATE and COLLISION_ID of the last row of the store.
+    file : str
+        Name of the CSV file.
+    path : str
+        Folder of the CSV file.
+
+    Returns
+    -------
+    str
+        Path of the watermark file.
+    """
+
+    out = watermark_path(file, path)
+    with open(out, 'w') as f:
+        json.dump({'CRASH DATE': str(watermark[0]), 'COLLISION_ID': int(watermark[1])}, f)
+
+    return out
+
+
+def generation_path(file: str, path: str = './') -> str:
+    """
+    Returns the path of the generation of the store of a CSV file.
+    """
+
+    return path + os.path.splitext(file)[0] + '.generation.json'
+
+
+def read_generation(file: str, path: str = './') -> int:
+    """
+    Reads the generation of a store, the number of times it has been written (by write_store or
+    write_partitions). It changes on every write, corrections included, unlike the watermark.
+
+    Parameters
+    ----------
+    file : str
+        Name of the CSV file.
+    path : str
+        Folder of the CSV file.
+
+    Returns
+    -------
+    int
+        The generation of the store, 0 if it has not been written.
+    """
+
+    generation = generation_path(file, path)
+    if not os.path.exists(generation):
+        return 0
+
+    with open(generation) as f:
+        return json.load(f)['generation']
+
+
+def _bump_generation(file: str, path: str = './') -> int:
+    """
+    Increments the generation of a store and returns it.
+    """
+
+    generation = read_generation(file, path) + 1
+    with open(generation_path(file, path), 'w') as f:
+        json.dump({'generation': generation}, f)
+
+    return generation
+
+
+def _convert(values: pd.Series, dtype) -> pd.Series:
+    """
+    Converts a column to a dtype of the schema. Categories missing from a fixed order are appended
+    (sorted) instead of becoming NaN, and integer columns with NaN, decimals or values out of range
+    are left as they are.
+    """
+
+    if isinstance(dtype, pd.CategoricalDtype):
+        extra = sorted(set(values.dropna().unique()) - set(dtype.categories))
+        if extra:
+            dtype = pd.CategoricalDtype(list(dtype.categories) + extra, ordered=dtype.ordered)
+        return values.astype(dtype)
+
+    if str(dtype).startswith('datetime64'):
+        return pd.to_datetime(values).astype(dtype)
+
+    if pd.api.types.is_integer_dtype(dtype):
+        if values.isna().any():
+            return values
+        info = np.iinfo(dtype)
+        numbers = values.to_numpy()
+        if numbers.min(initial=0) < info.min or numbers.max(initial=0) > info.max or not np.array_equal(numbers, np.round(numbers)):
+            return values
+
+    return values.astype(dtype)
+
+
+def optimize_dtypes(df: pd.DataFrame, schema: dict = SCHEMA) -> tuple:
+    """
+    Converts the columns of a DataFrame to the compact dtypes of a schema and reports the memory
+    saved. Columns missing from the schema are kept as they are.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Data to be converted.
+    schema : dict
+        Dtype of each column (a dtype name or a pd.CategoricalDtype with a fixed order).
+
+    Returns
+    -------
+    pd.DataFrame
+        The converted data.
+    dict
+        Memory of the data before and after the conversion (deep, in bytes) and the dtypes changed.
+    """
+
+    before = int(df.memory_usage(deep=True).sum())
+    dtypes = df.dtypes
+
+    df = df.assign(**{col: _convert(df[col], dtype) for col, dtype in schema.items() if col in df.columns})
+
+    report = {
+        'bytes_before': before,
+        'bytes_after': int(df.memory_usage(deep=True).sum()),
+        'dtypes': {col: f'{dtypes[col]} -> {df[col].dtype}' for col in df.columns if str(dtypes[col]) != str(df[col].dtype)},
+    }
+
+    return df, report
+
+
+if __name__ == '__main__':
+    for file in STORE_FILES:
+        if os.path.exists('Data/' + file):
+            print(write_store(pd.read_csv('Data/' + file), file, 'Data/', STORE_PARTITIONS.get(file)))
+        elif os.path.exists(store_path(file, 'Data/')):
+            print(f'Kept {store_path(file, "Data/")}: there is no Data/{file}', file=sys.stderr)
+        else:
+            print(f'Skipped Data/{file}: there is no CSV file nor store (see preprocessing)', file=sys.stderr)
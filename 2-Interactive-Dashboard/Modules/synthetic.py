@@ -0,0 +1,441 @@
+##############################################################################################################
+__author__ = "Juan P. Zaldivar & Enric Millan"
+__version__ = "1.0.0"
+##############################################################################################################
+
+"""
+This module contains the functions to generate synthetic collisions and daily weather with the schema
+of merged.csv and weather_clean.csv, at any number of rows.
+
+The distributions (borough and zip code, hour, weekday, vehicle type, contributing factor, street,
+injured and killed) are fitted on the real merged.csv. Coordinates are drawn uniformly inside the
+intersection of the polygons of the zip code and its borough, from a pool built once by rejection
+sampling, so every collision falls inside its real borough. The daily weather follows the real
+weather of the same calendar day with some noise. Every column is drawn for a whole chunk at once
+and the chunks are streamed to the output file, so the memory does not depend on the number of rows
+(Parquet is much faster to write than CSV). Run from the dashboard folder:
+
+    python -m Modules.synthetic 10000000 Data/synthetic.parquet [Data/synthetic_weather.csv]
+
+Functions:
+----------
+
+fit_profile(df: pd.DataFrame) -> dict
+    Fits the distributions of the columns of the collisions.
+
+location_pool(locations: pd.DataFrame, borough_poly: dict, zip_poly: dict, size: int, rng: np.random.Generator) -> np.ndarray
+    Draws a pool of coordinates inside each (borough, zip code) pair.
+
+season_days(years: list) -> pd.DatetimeIndex
+    Returns the days of the dashboard season of some years.
+
+synthetic_weather(days: pd.DatetimeIndex, weather: pd.DataFrame, noise: float, rng: np.random.Generator) -> pd.DataFrame
+    Generates the daily weather of some days from the real weather of the same calendar days.
+
+build_model(years: list, seed: int, pool_size: int, noise: float) -> dict
+    Fits everything the generator needs from the Data folder.
+
+synthetic_collisions(n: int, model: dict, start: int, rng: np.random.Generator) -> pd.DataFrame
+    Generates a chunk of collisions with the schema of merged.csv.
+
+write_synthetic(n: int, out: str, weather_out: str, chunk_rows: int, years: list, seed: int) -> dict
+    Generates collisions and streams them to a CSV or Parquet file, with their daily weather.
+"""
+
+##############################################################################################################
+# IMPORTS ################################################################################ IMPORTS ###########
+##############################################################################################################
+import os
+import sys
+import time
+import shapely
+import numpy as np
+import pandas as pd
+from Modules.store import read_store
+from Modules.preprocessing import WEATHER, get_borough_polygons, get_zip_polygons
+
+
+##############################################################################################################
+# GLOBAL VARIABLES ############################################################## GLOBAL VARIABLES ###########
+##############################################################################################################
+SEASON = [6, 7, 8, 9]    # months of the dashboard, June to September
+
+COLUMNS = ['COLLISION_ID', 'CRASH DATE', 'CRASH TIME', 'BOROUGH', 'ZIP CODE', 'LATITUDE', 'LONGITUDE',
+           'STREET NAME', 'CONTRIBUTING FACTOR VEHICLE 1', 'VEHICLE TYPE CODE 1', 'TOTAL INJURED',
+           'TOTAL KILLED', 'HOUR', 'MONTH', 'WEEKDAY', 'datetime', 'temp', 'ICON', 'tempmin', 'tempmax']
+
+POOL_SIZE = 2000        # coordinates per (borough, zip code) pair
+CHUNK_ROWS = 1000000
+
+
+##############################################################################################################
+# FUNCTIONS ############################################################################ FUNCTIONS ###########
+##############################################################################################################
+def _distribution(values: pd.Series) -> tuple:
+    """
+    Returns the distinct values of a column and their frequencies.
+    """
+
+    counts = values.value_counts(sort=False)
+
+    return counts.index.to_numpy(), (counts / counts.sum()).to_numpy()
+
+
+def fit_profile(df: pd.DataFrame) -> dict:
+    """
+    Fits the distributions of the columns of the collisions.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Collisions with the schema of merged.csv.
+
+    Returns
+    -------
+    dict
+        The (values, probabilities) of each column, the (borough, zip code) pairs with their
+        probabilities in 'locations' and the streets of each borough in 'streets'.
+    """
+
+    locations = df.groupby(['BOROUGH', 'ZIP CODE'], observed=True).size().rename('p').reset_index()
+    locations['p'] /= locations['p'].sum()
+
+    weekdays = pd.to_datetime(df['CRASH DATE']).dt.dayofweek
+
+    return {
+        'locations': locations,
+        'streets': {borough: _distribution(group) for borough, group in df.groupby('BOROUGH', observed=True)['STREET NAME']},
+        'hour': _distribution(df['HOUR']),
+        'weekday': _distribution(weekdays),
+        'VEHICLE TYPE CODE 1': _distribution(df['VEHICLE TYPE CODE 1']),
+        'CONTRIBUTING FACTOR VEHICLE 1': _distribution(df['CONTRIBUTING FACTOR VEHICLE 1']),
+        'TOTAL INJURED': _distribution(df['TOTAL INJURED']),
+        'TOTAL KILLED': _distribution(df['TOTAL KILLED']),
+    }
+
+
+def location_pool(locations: pd.DataFrame, borough_poly: dict, zip_poly: dict, size: int = POOL_SIZE,
+                  rng: np.random.Generator = None) -> tuple:
+    """
+    Draws a pool of coordinates inside each (borough, zip code) pair.
+
+    The points are drawn uniformly in the bounding box of the intersection of both polygons and
+    rounded as in merged.csv (5 decimals) before being tested, until there are enough of them.
+    Pairs whose polygons do not intersect (or are not in the maps) are dropped.
+
+    Parameters
+    ----------
+    locations : pd.DataFrame
+        The BOROUGH, ZIP CODE and p (probability) of each pair (see fit_profile).
+    borough_poly : dict
+        Polygon of each borough.
+    zip_poly : dict
+        Polygon of each zip code, keyed by the zip code as a string.
+    size : int
+        Number of coordinates per pair.
+    rng : np.random.Generator
+        Random generator.
+
+    Returns
+    -------
+    pd.DataFrame
+        The pairs kept, with their probabilities normalized.
+    np.ndarray
+        Longitude and latitude of the pool of each pair, with shape (pairs, size, 2).
+    """
+
+    rng = rng or np.random.default_rng()
+
+    kept, pools = [], []
+    for i, (borough, zip_code) in enumerate(zip(locations['BOROUGH'], locations['ZIP CODE'])):
+        zone = zip_poly.get(str(int(zip_code)))
+        if zone is None or borough not in borough_poly:
+            continue
+        area = shapely.intersection(zone, borough_poly[borough])
+        if area.is_empty or area.area == 0:
+            continue
+        shapely.prepare(area)
+
+        xmin, ymin, xmax, ymax = area.bounds
+        ratio = max(area.area / ((xmax - xmin) * (ymax - ymin)), 0.01)
+        pool = np.empty((0, 2))
+        while len(pool) < size:
+            draw = int((size - len(pool)) / ratio * 1.2) + 16
+            lon = np.round(rng.uniform(xmin, xmax, draw), 5)
+            lat = np.round(rng.uniform(ymin, ymax, draw), 5)
+            inside = shapely.contains_xy(area, lon, lat)
+            pool = np.concatenate([pool, np.column_stack([lon[inside], lat[inside]])])
+
+        kept.append(i)
+        pools.append(pool[:size])
+
+    locations = locations.iloc[kept].reset_index(drop=True)
+    locations['p'] /= locations['p'].sum()
+
+    return locations, np.stack(pools)
+
+
+def season_days(years: list = (2018,)) -> pd.DatetimeIndex:
+    """
+    Returns the days of the dashboard season (SEASON months) of some years.
+
+    Parameters
+    ----------
+    years : list
+        Years of the days.
+
+    Returns
+    -------
+    pd.DatetimeIndex
+        The days, in order.
+    """
+
+    days = pd.DatetimeIndex(np.concatenate([pd.date_range(f'{year}-01-01', f'{year}-12-31').to_numpy() for year in years]))
+
+    return days[days.month.isin(SEASON)]
+
+
+def synthetic_weather(days: pd.DatetimeIndex, weather: pd.DataFrame, noise: float = 1.5,
+                      rng: np.random.Generator = None) -> pd.DataFrame:
+    """
+    Generates the daily weather of some days from the real weather of the same calendar days.
+
+    The temperatures of each day are shifted together by a normal noise, so tempmin <= temp <=
+    tempmax still holds, and the icon is drawn from the icons of the real month.
+
+    Parameters
+    ----------
+    days : pd.DatetimeIndex
+        Days to be generated.
+    weather : pd.DataFrame
+        Real daily weather with the schema of weather_clean.csv.
+    noise : float
+        Standard deviation of the noise of the temperatures, in degrees (0 keeps the real ones).
+    rng : np.random.Generator
+        Random generator.
+
+    Returns
+    -------
+    pd.DataFrame
+        The weather of the days with the schema of weather_clean.csv.
+    """
+
+    rng = rng or np.random.default_rng()
+
+    real = weather.assign(DAY=pd.to_datetime(weather['datetime']).dt.strftime('%m-%d')).drop_duplicates('DAY').set_index('DAY')
+    base = real.reindex(days.strftime('%m-%d'))
+    shift = np.round(rng.normal(0, noise, len(days)), 1) if noise else np.zeros(len(days))
+
+    icons = np.empty(len(days), dtype=object)
+    months = pd.to_datetime(weather['datetime']).dt.month
+    for month in np.unique(days.month):
+        values, p = _distribution(weather.loc[months == month, 'ICON'])
+        mask = days.month == month
+        icons[mask] = rng.choice(values, mask.sum(), p=p)
+
+    return pd.DataFrame({
+        'datetime': days.strftime('%Y-%m-%d'),
+        'temp': np.round(base['temp'].to_numpy() + shift, 1),
+        'ICON': icons,
+        'tempmin': np.round(base['tempmin'].to_numpy() + shift, 1),
+        'tempmax': np.round(base['tempmax'].to_numpy() + shift, 1),
+    })
+
+
+def build_model(years: list = (2018,), seed: int = 0, pool_size: int = POOL_SIZE, noise: float = 1.5) -> dict:
+    """
+    Fits everything the generator needs from the Data folder: the profile of merged.csv, the pool
+    of coordinates and the daily weather of the season.
+
+    Parameters
+    ----------
+    years : list
+        Years of the collisions.
+    seed : int
+        Seed of the random generator.
+    pool_size : int
+        Number of coordinates per (borough, zip code) pair.
+    noise : float
+        Standard deviation of the noise of the temperatures.
+
+    Returns
+    -------
+    dict
+        The profile, locations, pool, days (with their probabilities) and weather.
+    """
+
+    rng = np.random.default_rng(seed)
+    profile = fit_profile(read_store('merged.csv', 'Data/'))
+    locations, pool = location_pool(profile['locations'], get_borough_polygons(), get_zip_polygons(), pool_size, rng)
+
+    # Each day weighs the frequency of its weekday, split among the days of that weekday
+    days = season_days(years)
+    weekdays, p = profile['weekday']
+    weights = pd.Series(p, index=weekdays).reindex(range(7), fill_value=0)
+    p_days = weights.to_numpy()[days.dayofweek] / np.bincount(days.dayofweek, minlength=7)[days.dayofweek]
+
+    return {
+        'profile': profile,
+        'locations': locations,
+        'pool': pool,
+        'days': days,
+        'p_days': p_days / p_days.sum(),
+        'weather': synthetic_weather(days, pd.read_csv(WEATHER), noise, rng),
+    }
+
+
+def _draw(distribution: tuple, n: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Draws the codes of n values of a (values, probabilities) distribution.
+    """
+
+    return rng.choice(len(distribution[0]), n, p=distribution[1])
+
+
+def synthetic_collisions(n: int, model: dict, start: int = 1, rng: np.random.Generator = None) -> pd.DataFrame:
+    """
+    Generates a chunk of collisions with the schema of merged.csv. The text columns are
+    categorical, with the same categories in every chunk.
+
+    Parameters
+    ----------
+    n : int
+        Number of collisions.
+    model : dict
+        Model of the generator (see build_model).
+    start : int
+        COLLISION_ID of the first collision.
+    rng : np.random.Generator
+        Random generator.
+
+    Returns
+    -------
+    pd.DataFrame
+        The collisions.
+    """
+
+    rng = rng or np.random.default_rng()
+    profile, locations, days, weather = model['profile'], model['locations'], model['days'], model['weather']
+
+    day = rng.choice(len(days), n, p=model['p_days'])
+    hours, p_hours = profile['hour']
+    hour = hours[rng.choice(len(hours), n, p=p_hours)].astype('int64')
+    minute = rng.integers(0, 60, n)
+
+    pair = rng.choice(len(locations), n, p=locations['p'].to_numpy())
+    point = model['pool'][pair, rng.integers(0, model['pool'].shape[1], n)]
+
+    boroughs = pd.Categorical(locations['BOROUGH'])
+    borough = boroughs.codes[pair]
+
+    # Streets are drawn from the streets of the borough, all boroughs sharing one set of categories
+    streets = pd.unique(np.concatenate([values for values, _ in profile['streets'].values()]))
+    street = np.empty(n, dtype='int32')
+    for code, name in enumerate(boroughs.categories):
+        mask = borough == code
+        values, p = profile['streets'][name]
+        street[mask] = pd.Index(streets).get_indexer(values)[rng.choice(len(values), mask.sum(), p=p)]
+
+    # Hours are not padded in merged.csv (e.g. 2:36)
+    times = pd.Index([f'{h}:{m:02d}' for h in range(24) for m in range(60)])
+    dates = pd.Index(days.strftime('%Y-%m-%d'))
+    months = pd.Index([pd.Timestamp(2018, m, 1).month_name() for m in SEASON])
+    weekdays = pd.Index(['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'])
+    icons = pd.Categorical(weather['ICON'])
+
+    categorical = lambda codes, categories: pd.Categorical.from_codes(codes, categories=categories)
+    value = lambda column: profile[column][0][_draw(profile[column], n, rng)]
+
+    df = pd.DataFrame({
+        'COLLISION_ID': np.arange(start, start + n, dtype='int64'),
+        'CRASH DATE': categorical(day, dates),
+        'CRASH TIME': categorical(hour * 60 + minute, times),
+        'BOROUGH': categorical(borough, boroughs.categories),
+        'ZIP CODE': locations['ZIP CODE'].to_numpy(dtype=float)[pair],
+        'LATITUDE': point[:, 1],
+        'LONGITUDE': point[:, 0],
+        'STREET NAME': categorical(street, streets),
+        'CONTRIBUTING FACTOR VEHICLE 1': categorical(_draw(profile['CONTRIBUTING FACTOR VEHICLE 1'], n, rng), profile['CONTRIBUTING FACTOR VEHICLE 1'][0]),
+        'VEHICLE TYPE CODE 1': categorical(_draw(profile['VEHICLE TYPE CODE 1'], n, rng), profile['VEHICLE TYPE CODE 1'][0]),
+        'TOTAL INJURED': value('TOTAL INJURED').astype(float),
+        'TOTAL KILLED': value('TOTAL KILLED').astype(float),
+        'HOUR': hour,
+        'MONTH': categorical(months.get_indexer(days.month_name()[day]), months),
+        'WEEKDAY': categorical(days.dayofweek[day], weekdays),
+        'datetime': categorical(day, dates),
+        'temp': weather['temp'].to_numpy()[day],
+        'ICON': categorical(icons.codes[day], icons.categories),
+        'tempmin': weather['tempmin'].to_numpy()[day],
+        'tempmax': weather['tempmax'].to_numpy()[day],
+    })
+
+    return df[COLUMNS]
+
+
+def write_synthetic(n: int, out: str, weather_out: str = None, chunk_rows: int = CHUNK_ROWS, years: list = (2018,),
+                    seed: int = 0) -> dict:
+    """
+    Generates collisions and streams them to a CSV or Parquet file (by its extension), chunk by
+    chunk, with their daily weather in a separate file if given.
+
+    Parameters
+    ----------
+    n : int
+        Number of collisions.
+    out : str
+        Path of the collisions file (.csv or .parquet).
+    weather_out : str
+        Path of the daily weather file (.csv or .parquet), if any.
+    chunk_rows : int
+        Number of collisions generated at once.
+    years : list
+        Years of the collisions.
+    seed : int
+        Seed of the random generator.
+
+    Returns
+    -------
+    dict
+        The rows, days, chunks and seconds of the generation.
+    """
+
+    begin = time.perf_counter()
+    model = build_model(years, seed)
+    rng = np.random.default_rng(seed + 1)
+    parquet = out.endswith('.parquet')
+    if parquet:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+    writer = None
+    chunks = 0
+    try:
+        for start in range(0, n, chunk_rows):
+            df = synthetic_collisions(min(chunk_rows, n - start), model, start + 1, rng)
+            if parquet:
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                writer = writer or pq.ParquetWriter(out, table.schema)
+                writer.write_table(table)
+            else:
+                df.to_csv(out, mode='w' if start == 0 else 'a', header=start == 0, index=False)
+            chunks += 1
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if weather_out is not None:
+        if weather_out.endswith('.parquet'):
+            model['weather'].to_parquet(weather_out, index=False)
+        else:
+            model['weather'].to_csv(weather_out, index=False)
+
+    return {'rows': n, 'days': len(model['days']), 'chunks': chunks, 'seconds': time.perf_counter() - begin}
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    out = sys.argv[2] if len(sys.argv) > 2 else 'Data/synthetic.parquet'
+    weather_out = sys.argv[3] if len(sys.argv) > 3 else None
+
+    stats = write_synthetic(n, out, weather_out)
+    print('{rows} collisions over {days} days in {chunks} chunks, {seconds:.1f} s: '.format(**stats) + os.path.abspath(out))
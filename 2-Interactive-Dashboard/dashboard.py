@@ -11,16 +11,110 @@ import pandas as pd
 import altair as alt
 import streamlit as st
 from Modules import final_visualization as vi
+from Modules.store import read_store, read_generation, optimize_dtypes
+from Modules.spec import shared_datasets
+from Modules.payload import check_budget
+from Modules.instrumentation import PANEL, span, cached, render
+
+
+##############################################################################################################
+# GLOBAL VARIABLES ############################################################## GLOBAL VARIABLES ###########
+##############################################################################################################
+COLUMNS = ['COLLISION_ID', 'LONGITUDE', 'LATITUDE', 'BOROUGH', 'ZIP CODE', 'VEHICLE TYPE CODE 1', 'TOTAL INJURED', 'TOTAL KILLED', 'CRASH DATE', 'HOUR', 'MONTH', 'WEEKDAY', 'ICON']
+
+DENSITY_ROWS = 50000
+
+# The size of the specification is bounded by the payload budgets (see check_budget), not by a number of rows
+alt.data_transformers.disable_max_rows()
+
+SELECTORS = {'MONTH': 'Month', 'ICON': 'Weather Conditions', 'VEHICLE TYPE CODE 1': 'Vehicle Type', 'WEEKDAY': 'Day of the Week', 'BOROUGH': 'Borough'}
 
 
 ##############################################################################################################
 # FUNCTIONS ############################################################################ FUNCTIONS ###########
 ##############################################################################################################
-@st.cache_data
-def load_data(file: str, path: str = './') -> pd.DataFrame:
-    return pd.read_csv(path + file)
+@cached(st.cache_data)
+def load_data(file: str, path: str = './', columns: list = None, version: int = None) -> tuple:
+    # version (the generation of the store) only keys the cache, so updates and corrections are picked up
+    return optimize_dtypes(read_store(file, path, columns))
+
+
+def browser_spec(df: pd.DataFrame) -> tuple:
+    """
+    Builds the dashboard filtered in the browser with the interactive legends.
+    """
+
+    hour_line = vi.hour_line_chart(df, cube=True)
+
+    day_line = vi.day_line_chart(df, cube=True)
+
+    dot_map = vi.dotmap_chart(df, density=len(df) > DENSITY_ROWS)
+
+    bars = vi.bar_chart(df, cube=True)
+
+    kpi1 = vi.kpi_collisions(df, cube=True)
+    kpi2, kpi3 = vi.kpi_persons(df, cube=True)
+
+    legends, boroughs_legends = vi.legend_chart(df)
+
+    with span('alt.vconcat'):
+        final = alt.vconcat(alt.vconcat(legends, alt.hconcat(alt.vconcat(dot_map, boroughs_legends, hour_line).resolve_scale(color='independent'), alt.vconcat(alt.hconcat(kpi1, kpi2, kpi3), alt.vconcat(day_line, bars).resolve_scale(color='independent')))))  
+
+    spec, report = shared_datasets(final)
+    report['payload'] = check_budget(spec)
+
+    return spec, report
+
+
+@cached(st.cache_data(max_entries=64))
+def server_spec(_df: pd.DataFrame, dataset: str, selection: tuple, version: int = None) -> tuple:
+    """
+    Builds the dashboard filtered and aggregated server-side with a selection.
+
+    The result is memoized per dataset (and generation of its store) and selection, so only the aggregated tables of each
+    selection are computed once and sent to the browser.
+    """
+
+    hour_line = vi.hour_line_chart(_df, selection=selection)
+
+    day_line = vi.day_line_chart(_df, selection=selection)
+
+    dot_map = vi.dotmap_chart(_df, selection=selection)
 
+    bars = vi.bar_chart(_df, selection=selection)
 
+    kpi1 = vi.kpi_collisions(_df, selection=selection)
+    kpi2, kpi3 = vi.kpi_persons(_df, selection=selection)
+
+    with span('alt.vconcat'):
+        final = alt.vconcat(alt.hconcat(alt.vconcat(dot_map, hour_line).resolve_scale(color='independent'), alt.vconcat(alt.hconcat(kpi1, kpi2, kpi3), alt.vconcat(day_line, bars).resolve_scale(color='independent'))))
+
+    spec, report = shared_datasets(final)
+    report['payload'] = check_budget(spec)
+
+    return spec, report
+
+
+def server_selection(df: pd.DataFrame) -> tuple:
+    """
+    Draws one multiselect per filter in the sidebar and returns the selected values as
+    (field, values) pairs, skipping the fields without selected values.
+    """
+
+    orders = {'MONTH': vi.MONTHS, 'WEEKDAY': vi.WEEKDAYS}
+
+    selection = []
+    for field, title in SELECTORS.items():
+        values = df[field].dropna().unique().tolist()
+        options = [v for v in orders[field] if v in values] if field in orders else sorted(values)
+        chosen = st.sidebar.multiselect(title, options)
+        if chosen:
+            selection.append((field, tuple(chosen)))
+
+    return tuple(selection)
+
+
+@render('interactive')
 def app():
     """
     .
@@ -34,32 +128,29 @@ def app():
 
 
     # ----- LOAD DATA -----
-    merged = load_data('merged.csv', 'Data/')
-    df = merged[['COLLISION_ID', 'LONGITUDE', 'LATITUDE', 'BOROUGH', 'ZIP CODE', 'VEHICLE TYPE CODE 1', 'TOTAL INJURED', 'TOTAL KILLED', 'CRASH DATE', 'HOUR', 'MONTH', 'WEEKDAY', 'ICON']]
+    version = read_generation('merged.csv', 'Data/')
+    df, memory = load_data('merged.csv', 'Data/', COLUMNS, version)
 
 
     # ----- DATA DASHBOARD -----
-    hour_line = vi.hour_line_chart(df)
+    mode = st.sidebar.radio('Filtering', ['Browser', 'Server'], help='Filter with the legends in the browser or with the widgets below on the server.')
 
-    day_line = vi.day_line_chart(df)
-
-    dot_map = vi.dotmap_chart(df)
-
-    bars = vi.bar_chart(df)
-
-    kpi1 = vi.kpi_collisions(df,)
-    kpi2, kpi3 = vi.kpi_persons(df)
-
-    legends, boroughs_legends = vi.legend_chart(df)
+    if mode == 'Server':
+        spec, spec_report = server_spec(df, 'merged.csv', server_selection(df), version)
+    else:
+        spec, spec_report = browser_spec(df)
 
-    final = alt.vconcat(alt.vconcat(legends, alt.hconcat(alt.vconcat(dot_map, boroughs_legends, hour_line).resolve_scale(color='independent'), alt.vconcat(alt.hconcat(kpi1, kpi2, kpi3), alt.vconcat(day_line, bars).resolve_scale(color='independent')))))  
-    
-    st.altair_chart(final, use_container_width=True)
+    with span('st.vega_lite_chart', mode=mode, bytes=spec_report['payload']['bytes']):
+        st.vega_lite_chart(spec, use_container_width=True)
 
 
     # ----- DATA PREVIEW -----
     with st.expander("Data Preview"):
         st.dataframe(df.head())
+        st.caption(f"{memory['bytes_before'] / 2**20:.2f} MB loaded, {memory['bytes_after'] / 2**20:.2f} MB in memory after optimizing the dtypes")
+    if PANEL:
+        with st.sidebar.expander('Developer: chart specification size'):
+            st.json(spec_report)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,48 @@
+##############################################################################################################
+__author__ = "Juan P. Zaldivar & Enric Millan"
+__version__ = "1.0.0"
+##############################################################################################################
+
+import json
+
+
+def resolve(spec, datasets: dict, static: str):
+    """
+    Replaces the named and served data of a specification with their values.
+    """
+
+    if isinstance(spec, dict):
+        spec = {k: resolve(v, datasets, static) for k, v in spec.items() if k != 'datasets'}
+        data = spec.get('data')
+        if isinstance(data, dict) and 'name' in data:
+            values = datasets[data['name']]
+        elif isinstance(data, dict) and 'url' in data:
+            with open(static + data['url'].split('/')[-1]) as f:
+                values = json.load(f)
+        else:
+            return spec
+        spec['data'] = {**{k: v for k, v in data.items() if k not in ('name', 'url')}, 'values': values}
+        return spec
+    if isinstance(spec, list):
+        return [resolve(v, datasets, static) for v in spec]
+    return spec
+
+
+def test_map_layers_are_served_by_default_and_equivalent_inline(tmp_path, monkeypatch):
+    import dashboard
+    from Modules import assets
+    from Modules import final_visualization as vi
+
+    static = f'{tmp_path}/static/'
+    monkeypatch.setattr(assets, 'STATIC', static)
+    df, _ = dashboard.load_data('merged.csv', 'Data/', dashboard.COLUMNS)
+
+    specs = {}
+    for mode in ('auto', 'inline', 'served'):
+        monkeypatch.setattr(assets, 'ASSET_MODE', mode)
+        spec = vi.dotmap_chart(df).to_dict()
+        specs[mode] = resolve(spec, spec.get('datasets', {}), static)
+        if mode == 'auto':
+            assert 'url' in spec['layer'][0]['data']
+
+    assert specs['inline'] == specs['served'] == specs['auto']
@@ -0,0 +1,39 @@
+##############################################################################################################
+__author__ = "Juan P. Zaldivar & Enric Millan"
+__version__ = "1.0.0"
+##############################################################################################################
+
+import pandas as pd
+
+
+def test_hour_cube_folds_back_to_the_collisions_per_hour():
+    import dashboard
+    from Modules import final_visualization as vi
+    from Modules.synthetic import build_model, synthetic_collisions
+
+    merged = synthetic_collisions(100000, build_model())
+    df, _ = dashboard.optimize_dtypes(merged[dashboard.COLUMNS])
+
+    spec = vi.hour_line_chart(df, cube=True).to_dict()
+    fold = [transform['fold'] for transform in spec['transform'] if 'fold' in transform][0]
+    cells = pd.DataFrame(spec['datasets'][spec['data']['name']])
+
+    # What the browser draws: the hour columns folded and summed per hour and borough
+    drawn = cells.melt(id_vars=[c for c in cells.columns if c not in fold], value_vars=fold, var_name='HOUR', value_name='COUNT')
+    drawn = drawn.astype({'HOUR': int}).groupby(['HOUR', 'BOROUGH'])['COUNT'].sum()
+    expected = df.groupby(['HOUR', 'BOROUGH'], observed=True).size()
+
+    assert drawn[drawn > 0].sort_index().to_dict() == expected.sort_index().to_dict()
+    assert len(cells) <= df[vi.FILTERS].drop_duplicates().shape[0]
+
+
+def test_browser_spec_fits_the_budget_at_100k_rows():
+    import dashboard
+    from Modules.synthetic import build_model, synthetic_collisions
+
+    merged = synthetic_collisions(100000, build_model())
+    df, _ = dashboard.optimize_dtypes(merged[dashboard.COLUMNS])
+
+    spec, report = dashboard.browser_spec(df)
+
+    assert report['payload']['exceeded'] == []
@@ -0,0 +1,21 @@
+##############################################################################################################
+__author__ = "Juan P. Zaldivar & Enric Millan"
+__version__ = "1.0.0"
+##############################################################################################################
+
+
+def test_browser_spec_renders_in_density_mode():
+    import dashboard
+    from Modules import final_visualization as vi
+    from Modules.synthetic import build_model, synthetic_collisions
+
+    merged = synthetic_collisions(2 * dashboard.DENSITY_ROWS, build_model())
+    df, _ = dashboard.optimize_dtypes(merged[dashboard.COLUMNS])
+
+    spec, report = dashboard.browser_spec(df)
+
+    # The map is drawn from the grid (and the killed collisions), whatever the number of collisions
+    dot_map = [view for view in report['payload']['views'] if 'circle' in view['title']]
+    assert len(dot_map) == 1
+    assert dot_map[0]['rows'] <= vi.GRID_ROWS
+    assert not [message for message in report['payload']['exceeded'] if dot_map[0]['view'] in message]
@@ -0,0 +1,37 @@
+##############################################################################################################
+__author__ = "Juan P. Zaldivar & Enric Millan"
+__version__ = "1.0.0"
+##############################################################################################################
+
+import numpy as np
+import pandas as pd
+
+
+def test_the_schema_compacts_the_data_without_losing_values():
+    from Modules.store import optimize_dtypes
+
+    df = pd.DataFrame({
+        'ZIP CODE': [10001.0, np.nan] * 500,
+        'LATITUDE': np.linspace(40.5, 40.9, 1000),
+        'TOTAL INJURED': np.arange(1000) % 7,
+        'HOUR': np.arange(1000) % 24,
+        'MONTH': ['June', 'October'] * 500,
+        'ICON': ['Clear', 'Rainy'] * 500,
+        'STREET NAME': ['BROADWAY', '5 AVENUE'] * 500,
+    })
+
+    optimized, memory = optimize_dtypes(df)
+
+    # A ZIP code column with NaN stays float instead of failing the conversion
+    assert optimized['ZIP CODE'].dtype == 'float64' and optimized['ZIP CODE'].isna().sum() == 500
+    assert optimized['LATITUDE'].dtype == 'float32'
+    assert np.allclose(optimized['LATITUDE'], df['LATITUDE'], atol=1e-5)
+    assert (optimized['TOTAL INJURED'].dtype, optimized['HOUR'].dtype) == ('int16', 'int8')
+    assert (optimized['HOUR'] == df['HOUR']).all()
+    # A month missing from the fixed order is appended after it
+    assert list(optimized['MONTH'].cat.categories) == ['June', 'July', 'August', 'September', 'October']
+    assert optimized['MONTH'].cat.ordered and optimized['MONTH'].max() == 'October'
+    assert optimized['STREET NAME'].dtype == 'category'
+
+    assert memory['bytes_after'] == optimized.memory_usage(deep=True).sum() < memory['bytes_before']
+    assert 'ZIP CODE' not in memory['dtypes'] and memory['dtypes']['HOUR'] == 'int64 -> int8'
@@ -0,0 +1,29 @@
+##############################################################################################################
+__author__ = "Juan P. Zaldivar & Enric Millan"
+__version__ = "1.0.0"
+##############################################################################################################
+
+import shutil
+import shapely
+import geopandas as gpd
+
+
+def test_simplified_zipcodes_keep_their_features_and_shared_borders(tmp_path):
+    from Modules.geometry import LAYERS, build_topojson
+
+    file, properties = LAYERS['zipcodes']
+    shutil.copy(f'Data/{file}', tmp_path)
+
+    report = build_topojson('zipcodes', f'{tmp_path}/')
+    before, after = gpd.read_file(tmp_path / file), gpd.read_file(report['file'])
+
+    assert report['bytes_after'] < report['bytes_before'] / 4
+    assert report['vertices_after'] < report['vertices_before']
+    # Same features in the same order, with only the properties the charts use
+    assert sorted(after.columns) == sorted(['id', 'geometry'] + properties)
+    assert after[properties].equals(before[properties])
+
+    # The borders are simplified once per topology: no gaps nor overlaps between neighbours
+    union = shapely.union_all(shapely.make_valid(after.geometry.values)).area
+    assert abs(after.area.sum() / before.area.sum() - 1) < 0.005
+    assert abs(after.area.sum() / union - 1) < 0.005
@@ -0,0 +1,46 @@
+##############################################################################################################
+__author__ = "Juan P. Zaldivar & Enric Millan"
+__version__ = "1.0.0"
+##############################################################################################################
+
+import os
+import shutil
+import shapely
+import geopandas as gpd
+
+
+def test_geometries_are_parsed_once_then_read_from_the_cache(tmp_path, monkeypatch):
+    from Modules import preprocessing as pre
+
+    file = str(tmp_path / os.path.basename(pre.ZIP_MAP))
+    shutil.copy(pre.ZIP_MAP, file)
+    expected = gpd.read_file(file).drop_duplicates(subset='postalCode', keep='first')
+    monkeypatch.setattr(pre, 'GEOMETRY_STORE', {})
+
+    polygons = pre.load_geometries(file, 'postalCode')
+
+    assert list(polygons) == expected['postalCode'].tolist()
+    assert all(shapely.equals_exact(polygons[k], g, 0) for k, g in zip(expected['postalCode'], expected.geometry))
+    assert os.path.exists(pre.geometry_cache_path(file))
+
+    def read_file(*args, **kwargs):
+        raise AssertionError('the geojson was parsed again')
+
+    # Same process: the same prepared geometries; next process: the WKB cache
+    read = gpd.read_file
+    monkeypatch.setattr(pre.gpd, 'read_file', read_file)
+    assert pre.load_geometries(file, 'postalCode') is polygons
+    monkeypatch.setattr(pre, 'GEOMETRY_STORE', {})
+    cached = pre.load_geometries(file, 'postalCode')
+    assert cached is not polygons and list(cached) == list(polygons)
+    assert all(shapely.equals_exact(cached[k], polygons[k], 0) for k in polygons)
+    assert shapely.is_prepared(list(cached.values())).all()
+
+    # A geojson modified after its cache is parsed again
+    stamp = os.path.getmtime(pre.geometry_cache_path(file)) + 10
+    os.utime(file, (stamp, stamp))
+    monkeypatch.setattr(pre, 'GEOMETRY_STORE', {})
+    parsed = []
+    monkeypatch.setattr(pre.gpd, 'read_file', lambda *args, **kwargs: parsed.append(1) or read(*args, **kwargs))
+    assert list(pre.load_geometries(file, 'postalCode')) == list(polygons)
+    assert parsed == [1]
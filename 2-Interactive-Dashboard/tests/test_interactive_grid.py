@@ -0,0 +1,26 @@
+##############################################################################################################
+__author__ = "Juan P. Zaldivar & Enric Millan"
+__version__ = "1.0.0"
+##############################################################################################################
+
+
+def test_density_grid_keeps_the_legend_filters_at_200k_rows():
+    import dashboard
+    from Modules import final_visualization as vi
+    from Modules.synthetic import build_model, synthetic_collisions
+
+    merged = synthetic_collisions(200000, build_model())
+    df, _ = dashboard.optimize_dtypes(merged[dashboard.COLUMNS])
+
+    cells, dims = vi.fitted_grid(df)
+    assert len(cells) <= vi.GRID_ROWS
+    assert dims and set(dims) <= set(vi.FILTERS)
+
+    spec = vi.dotmap_chart(df, density=True).to_dict()
+    grid = [layer for layer in spec['layer'] if layer['mark']['type'] == 'circle']
+    filters = [transform['filter']['param'] for transform in grid[0]['transform'] if 'filter' in transform]
+
+    # One filter per dimension kept in the grid, bound to the selection of its legend
+    params = {vi.months.name: 'MONTH', vi.conditions.name: 'ICON', vi.weekdays.name: 'WEEKDAY',
+              vi.vehicles.name: 'VEHICLE TYPE CODE 1', vi.boroughs.name: 'BOROUGH'}
+    assert sorted(params[name] for name in filters) == sorted(dims)
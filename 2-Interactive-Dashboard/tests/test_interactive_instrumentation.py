@@ -0,0 +1,60 @@
+##############################################################################################################
+__author__ = "Juan P. Zaldivar & Enric Millan"
+__version__ = "1.0.0"
+##############################################################################################################
+
+import json
+import streamlit as st
+
+
+def test_spans_nest_and_flag_cache_hits(monkeypatch):
+    from Modules import instrumentation as ins
+
+    monkeypatch.setattr(ins, 'RENDERS', ins.collections.deque(maxlen=ins.PANEL_RENDERS))
+
+    @ins.cached(st.cache_data)
+    def square(x):
+        return x * x
+
+    @ins.traced('chart')
+    def chart(x):
+        return square(x)
+
+    @ins.render('page')
+    def app(x):
+        with ins.span('load', rows=x):
+            pass
+        return chart(x) + chart(x)
+
+    square.clear()
+    assert app(3) == 18
+
+    spans = ins.recent_renders()[0]
+    assert [(s['span'], s['parent'], s['depth']) for s in spans] == [
+        ('render', None, 0), ('load', 'render', 1), ('chart', 'render', 1), ('square', 'chart', 2),
+        ('chart', 'render', 1), ('square', 'chart', 2)]
+    assert [s.get('cache') for s in spans if s['span'] == 'square'] == ['miss', 'hit']
+    assert spans[0]['page'] == 'page' and spans[1]['rows'] == 3
+    assert len({s['trace'] for s in spans}) == 1 and all(s['ms'] >= 0 for s in spans)
+
+
+def test_the_log_is_written_only_when_named(tmp_path, monkeypatch):
+    from Modules import instrumentation as ins
+
+    assert ins.LOG_FILE == ''
+    with ins.span('stage'):
+        pass
+    assert not (tmp_path / 'logs').exists() and not ins.os.path.exists('logs')
+
+    log = tmp_path / 'logs' / 'spans.jsonl'
+    monkeypatch.setattr(ins, 'LOG_FILE', str(log))
+    with ins.span('outer'):
+        with ins.span('inner', rows=5):
+            pass
+    with ins.span('next'):
+        pass
+
+    records = [json.loads(line) for line in log.read_text().splitlines()]
+    assert [(r['span'], r['parent']) for r in records] == [('outer', None), ('inner', 'outer'), ('next', None)]
+    assert records[1]['rows'] == 5
+    assert records[0]['trace'] == records[1]['trace'] != records[2]['trace']
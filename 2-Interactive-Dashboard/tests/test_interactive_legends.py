@@ -0,0 +1,38 @@
+##############################################################################################################
+__author__ = "Juan P. Zaldivar & Enric Millan"
+__version__ = "1.0.0"
+##############################################################################################################
+
+
+def _views(spec: dict) -> list:
+    views = [spec] if 'mark' in spec else []
+    for concat in ('vconcat', 'hconcat', 'layer'):
+        for child in spec.get(concat, []):
+            views += _views(child)
+    return views
+
+
+def test_legends_hold_one_row_per_category_bound_to_their_selection():
+    import dashboard
+    from Modules import final_visualization as vi
+    from Modules.synthetic import build_model, synthetic_collisions
+
+    merged = synthetic_collisions(5000, build_model())
+    df, _ = dashboard.optimize_dtypes(merged[dashboard.COLUMNS])
+    selections = {vi.months.name: 'MONTH', vi.conditions.name: 'ICON', vi.vehicles.name: 'VEHICLE TYPE CODE 1',
+                  vi.weekdays.name: 'WEEKDAY', vi.boroughs.name: 'BOROUGH'}
+
+    fields = []
+    for legend in vi.legend_chart(df):
+        spec = legend.to_dict()
+        params = {param['name']: param['select']['fields'] for param in spec['params']}
+        for view in _views(spec):
+            condition = view['encoding']['color']['condition']
+            field = condition['field']
+            rows = spec['datasets'][view['data']['name']]
+
+            assert selections[condition['param']] == field and params[condition['param']] == [field]
+            assert sorted(row[field] for row in rows) == sorted(df[field].dropna().unique())
+            fields.append(field)
+
+    assert sorted(fields) == sorted(selections.values())
@@ -0,0 +1,29 @@
+##############################################################################################################
+__author__ = "Juan P. Zaldivar & Enric Millan"
+__version__ = "1.0.0"
+##############################################################################################################
+
+import numpy as np
+import pandas as pd
+
+
+def test_fill_missing_borough_zip_matches_row_loop():
+    from Modules.preprocessing import get_borough_polygons, get_zip_polygons, fill_missing_borough_zip, _fill_missing_borough_zip_loop
+
+    df = pd.read_csv('Data/collisions_clean.csv').head(500)
+    df.loc[:9, 'BOROUGH'] = None
+    df.loc[10:19, 'ZIP CODE'] = np.nan
+    df.loc[20:24, ['LATITUDE', 'LONGITUDE']] = np.nan    # no coordinates
+    df.loc[25:29, ['LATITUDE', 'LONGITUDE']] = [40.0, -75.0]    # outside the city
+
+    borough_poly, zip_poly = get_borough_polygons(), get_zip_polygons()
+
+    expected = df.copy()
+    _fill_missing_borough_zip_loop(expected, {b.upper(): p for b, p in borough_poly.items()}, {float(z): p for z, p in zip_poly.items()})
+
+    # A duplicated index must not spread the values of a row to the others with the same label
+    result = df.set_axis(np.arange(len(df)) // 2)
+    fill_missing_borough_zip(result, borough_poly, zip_poly)
+
+    cols = ['BOROUGH', 'ZIP CODE']
+    pd.testing.assert_frame_equal(result[cols].reset_index(drop=True), expected[cols], check_dtype=False)
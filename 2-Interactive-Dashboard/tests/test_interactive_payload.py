@@ -0,0 +1,47 @@
+##############################################################################################################
+__author__ = "Juan P. Zaldivar & Enric Millan"
+__version__ = "1.0.0"
+##############################################################################################################
+
+import json
+import pytest
+import warnings
+import altair as alt
+import pandas as pd
+
+
+def test_the_report_counts_views_and_the_datasets_they_read():
+    from Modules.payload import payload_report
+
+    df = pd.DataFrame({'A': range(100), 'B': ['x'] * 100})
+    line = alt.Chart(df).mark_line().encode(x='A', y='count()').properties(title='Line')
+    bars = alt.Chart(df).mark_bar().encode(x='B', y='count()')
+    spec = alt.vconcat(line, bars + bars.mark_tick()).to_dict()
+
+    report = payload_report(spec)
+
+    assert report['bytes'] == len(json.dumps(spec, default=str))
+    [dataset] = report['datasets']
+    values = spec['datasets'][dataset['dataset']]
+    assert (dataset['rows'], dataset['columns'], dataset['bytes']) == (100, 2, len(json.dumps(values)))
+    assert [v['title'] for v in report['views']] == ['Line', 'bar+tick']
+    assert dataset['views'] == [v['view'] for v in report['views']]
+    assert all(v['datasets'] == [dataset['dataset']] and v['rows'] == 100 for v in report['views'])
+    assert all(v['bytes'] > dataset['bytes'] for v in report['views'])
+
+
+def test_an_exceeded_budget_warns_or_raises():
+    from Modules.payload import check_budget
+
+    chart = alt.Chart(pd.DataFrame({'A': range(100)})).mark_point().encode(x='A')
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        assert check_budget(chart, strict=False)['exceeded'] == []
+
+    with pytest.warns(UserWarning, match='of 100 rows over 10'):
+        report = check_budget(chart, strict=False, dataset_rows=10, total_bytes=None)
+    assert len(report['exceeded']) == 1
+
+    with pytest.raises(ValueError, match='specification of .* bytes over 100'):
+        check_budget(chart, strict=True, total_bytes=100, dataset_rows=None)
@@ -0,0 +1,65 @@
+##############################################################################################################
+__author__ = "Juan P. Zaldivar & Enric Millan"
+__version__ = "1.0.0"
+##############################################################################################################
+
+import json
+import pandas as pd
+
+
+SELECTION = (('BOROUGH', ('Manhattan', 'Brooklyn')), ('MONTH', ('July',)), ('ICON', ()))
+
+
+def _collisions(n: int) -> pd.DataFrame:
+    import dashboard
+    from Modules.synthetic import build_model, synthetic_collisions
+
+    merged = synthetic_collisions(n, build_model())
+    return dashboard.optimize_dtypes(merged[dashboard.COLUMNS])[0]
+
+
+def test_filter_rows_matches_the_selected_values():
+    from Modules.final_visualization import filter_rows
+
+    df = _collisions(5000)
+
+    rows = filter_rows(df, SELECTION)
+
+    expected = df[df['BOROUGH'].isin(['Manhattan', 'Brooklyn']) & (df['MONTH'] == 'July')]
+    pd.testing.assert_frame_equal(rows, expected)
+    # Fields without selected values do not filter anything
+    assert filter_rows(df, (('ICON', ()),)) is df
+    assert filter_rows(df, None) is df
+
+
+def test_server_cubes_aggregate_the_selected_rows():
+    from Modules.final_visualization import filter_rows, selection_cube
+
+    df = _collisions(5000)
+    rows = filter_rows(df, SELECTION)
+
+    cube = selection_cube(df, SELECTION, 'HOUR', dims=['BOROUGH'])
+
+    assert list(cube.columns) == ['BOROUGH', 'HOUR', 'COUNT', 'TOTAL INJURED', 'TOTAL KILLED']
+    assert cube.set_index(['BOROUGH', 'HOUR'])['COUNT'].to_dict() == rows.groupby(['BOROUGH', 'HOUR'], observed=True).size().to_dict()
+    assert cube['TOTAL INJURED'].sum() == rows['TOTAL INJURED'].sum()
+
+
+def test_server_spec_is_filtered_without_browser_selections(monkeypatch):
+    import dashboard
+
+    df = _collisions(5000)
+    dashboard.server_spec.clear()
+    calls, hour_line_chart = [], dashboard.vi.hour_line_chart
+    monkeypatch.setattr(dashboard.vi, 'hour_line_chart', lambda *args, **kwargs: calls.append(1) or hour_line_chart(*args, **kwargs))
+
+    spec, report = dashboard.server_spec(df, 'synthetic', SELECTION, 1)
+
+    views = json.dumps({k: v for k, v in spec.items() if k != 'datasets'})
+    assert '"param"' not in views and 'params' not in spec
+    assert report['payload']['exceeded'] == []
+    # The selection is memoized with the dataset and its version
+    assert dashboard.server_spec(df, 'synthetic', SELECTION, 1)[0] == spec
+    assert len(calls) == 1
+    dashboard.server_spec(df, 'synthetic', SELECTION, 2)
+    assert len(calls) == 2
@@ -0,0 +1,52 @@
+##############################################################################################################
+__author__ = "Juan P. Zaldivar & Enric Millan"
+__version__ = "1.0.0"
+##############################################################################################################
+
+import altair as alt
+import pandas as pd
+
+
+def test_datasets_without_key_are_not_merged():
+    from Modules.spec import shared_datasets
+
+    months = alt.Chart(pd.DataFrame({'MONTH': ['June', 'July', 'August', 'September']})).mark_rect().encode(x='MONTH:N')
+    icons = alt.Chart(pd.DataFrame({'ICON': ['Clear', 'Cloudy', 'Rainy', 'Sunny']})).mark_rect().encode(x='ICON:N')
+
+    spec, report = shared_datasets(alt.hconcat(months, icons))
+
+    assert report['datasets_before'] == report['datasets_after'] == 2
+    assert 'collisions' not in spec['datasets']
+
+
+def test_row_datasets_are_merged_on_key():
+    from Modules.spec import shared_datasets
+
+    df = pd.DataFrame({'COLLISION_ID': [1, 2, 3], 'BOROUGH': ['Bronx', 'Queens', 'Bronx'], 'HOUR': [1, 2, 3]})
+    by_borough = alt.Chart(df[['COLLISION_ID', 'BOROUGH']]).mark_bar().encode(x='BOROUGH:N', y='count()')
+    by_hour = alt.Chart(df[['COLLISION_ID', 'HOUR', 'BOROUGH']].iloc[::-1]).mark_line().encode(x='HOUR:O', y='count()', color='BOROUGH:N')
+    # Same length and no column in common with the collisions, but no key either
+    legend = alt.Chart(pd.DataFrame({'ICON': ['Clear', 'Cloudy', 'Rainy']})).mark_rect().encode(x='ICON:N')
+
+    spec, report = shared_datasets(alt.vconcat(by_borough, by_hour, legend))
+
+    assert report['datasets_after'] == 2
+    assert sorted(spec['datasets']['collisions'], key=lambda r: r['HOUR']) == df.drop(columns='COLLISION_ID').to_dict('records')
+    assert [view['data']['name'] for view in spec['vconcat'][:2]] == ['collisions', 'collisions']
+
+
+def test_nothing_is_serialized_without_datasets_to_merge(monkeypatch):
+    from Modules import spec as passes
+
+    class Json:
+        def dumps(*args, **kwargs):
+            raise AssertionError('the specification was serialized')
+
+    # Only the json of the pass, altair serializes the datasets to name them
+    monkeypatch.setattr(passes, 'json', Json)
+    df = pd.DataFrame({'COLLISION_ID': [1, 2, 3], 'BOROUGH': ['Bronx', 'Queens', 'Bronx']})
+
+    spec, report = passes.shared_datasets(alt.Chart(df).mark_bar().encode(x='BOROUGH:N', y='count()'))
+
+    assert report == {'datasets_before': 1, 'datasets_after': 1}
+    assert spec == alt.Chart(df).mark_bar().encode(x='BOROUGH:N', y='count()').to_dict()
@@ -0,0 +1,83 @@
+##############################################################################################################
+__author__ = "Juan P. Zaldivar & Enric Millan"
+__version__ = "1.0.0"
+##############################################################################################################
+
+import os
+import shutil
+import pytest
+import pandas as pd
+
+
+def test_correction_refreshes_cached_data(tmp_path):
+    from dashboard import load_data
+    from Modules.store import read_generation, read_watermark
+    from Modules.preprocessing import update_collisions
+
+    path = f'{tmp_path}/'
+    shutil.copy('Data/merged.csv', path)
+    columns = ['COLLISION_ID', 'TOTAL INJURED']
+
+    # The first update splits the store into partitions
+    update_collisions(pd.read_csv('Data/collisions_clean.csv').iloc[:0], path=path)
+    before, _ = load_data('merged.csv', path, columns, read_generation('merged.csv', path))
+    watermark = read_watermark('merged.csv', path)
+
+    stored = set(before['COLLISION_ID'])
+    corrections = pd.read_csv('Data/collisions_clean.csv')
+    corrections = corrections[corrections['COLLISION_ID'].isin(stored)].head(1).assign(**{'TOTAL INJURED': 99})
+    collision_id = int(corrections['COLLISION_ID'].iloc[0])
+
+    stats = update_collisions(corrections.iloc[:0], corrections, path=path)
+    after, _ = load_data('merged.csv', path, columns, read_generation('merged.csv', path))
+
+    assert stats['corrected'] == 1
+    assert read_watermark('merged.csv', path) == watermark
+    assert after.loc[after['COLLISION_ID'] == collision_id, 'TOTAL INJURED'].tolist() == [99]
+    assert len(after) == len(before)
+
+
+def test_stores_are_replaced_whole(tmp_path, monkeypatch):
+    from Modules.store import store_path, write_store, write_partitions, read_store, read_generation
+
+    path = f'{tmp_path}/'
+    df = pd.DataFrame({'CRASH DATE': ['2018-06-01', '2018-06-01', '2018-06-02'], 'HOUR': [1, 2, 3]})
+    df.to_csv(path + 'data.csv', index=False)
+    store = store_path('data.csv', path)
+
+    # A partitioned store replaces a store file, and the other way round
+    write_store(df, 'data.csv', path)
+    write_store(df, 'data.csv', path, 'CRASH DATE')
+    assert sorted(os.listdir(store)) == ['2018-06-01.parquet', '2018-06-02.parquet']
+    write_partitions(df.tail(1).assign(HOUR=9), 'data.csv', path)
+    assert sorted(read_store('data.csv', path)['HOUR']) == [1, 2, 9]
+    write_store(df, 'data.csv', path)
+    assert os.path.isfile(store) and read_generation('data.csv', path) == 4
+
+    # An interrupted write leaves the previous store and no temporary file
+    to_parquet = pd.DataFrame.to_parquet
+
+    def interrupted(self, out, **kwargs):
+        to_parquet(self.head(0), out, **kwargs)
+        raise OSError('disk full')
+
+    monkeypatch.setattr(pd.DataFrame, 'to_parquet', interrupted)
+    for partition_by in (None, 'CRASH DATE'):
+        with pytest.raises(OSError, match='disk full'):
+            write_store(df.head(1), 'data.csv', path, partition_by)
+        assert sorted(os.listdir(tmp_path)) == ['data.csv', 'data.generation.json', 'data.parquet']
+        assert len(read_store('data.csv', path)) == 3
+
+
+def test_an_unreadable_store_falls_back_to_the_csv(tmp_path):
+    from Modules.store import write_store, read_store
+
+    path = f'{tmp_path}/'
+    df = pd.DataFrame({'HOUR': [1, 2, 3], 'TOTAL INJURED': [0, 1, 0]})
+    df.to_csv(path + 'data.csv', index=False)
+    store = write_store(df, 'data.csv', path)
+    with open(store, 'wb') as f:
+        f.write(b'not a parquet file')
+
+    with pytest.warns(UserWarning, match='Unreadable store'):
+        pd.testing.assert_frame_equal(read_store('data.csv', path, ['TOTAL INJURED', 'HOUR']), df[['TOTAL INJURED', 'HOUR']])
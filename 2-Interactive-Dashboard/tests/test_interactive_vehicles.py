@@ -0,0 +1,22 @@
+##############################################################################################################
+__author__ = "Juan P. Zaldivar & Enric Millan"
+__version__ = "1.0.0"
+##############################################################################################################
+
+import numpy as np
+import pandas as pd
+
+
+def test_factorized_lookup_matches_the_row_by_row_mapping():
+    from Modules.preprocessing import load_vehicle_mapping, clusterize_vehicle_type
+
+    mapping = load_vehicle_mapping()
+    codes = list(mapping) + ['Bicycle', 'Bus', np.nan]
+    values = pd.Series(codes * 3, dtype=object).sample(frac=1, random_state=0).reset_index(drop=True)
+
+    df = clusterize_vehicle_type(pd.DataFrame({'VEHICLE TYPE CODE 1': values}))
+
+    expected = ['Unknown' if pd.isna(code) else mapping.get(code, code) for code in values]
+    assert isinstance(df['VEHICLE TYPE CODE 1'].dtype, pd.CategoricalDtype)
+    assert df['VEHICLE TYPE CODE 1'].astype(object).tolist() == expected
+    assert set(df['VEHICLE TYPE CODE 1'].cat.categories) == set(expected)
@@ -0,0 +1,599 @@
+####################################################################################################
+__author__ = "Juan P. Zaldivar & Enric Millan"
+__version__ = "1.0.0"
+####################################################################################################
+
+"""
+This module benchmarks the preprocessing functions and the chart builders of both dashboards at
+several data scales.
+
+Every case is timed (best of --repeat runs), then run once more under tracemalloc for its peak
+memory. Chart builders are also timed on the Vega-Lite serialization (to_dict) and report the size
+of the emitted specification. Builders that embed one record per row in the specification are
+skipped above --raw-limit rows. The collisions are generated with the synthetic module of the
+interactive dashboard (Modules.synthetic). Results are written to a JSON file, and two result files can be
+diffed with the compare command. Run from the root of the repository:
+
+    python Benchmarks/benchmark.py run --sizes 10000 100000 1000000 10000000 --out before.json
+    python Benchmarks/benchmark.py compare before.json after.json
+
+Functions:
+----------
+
+load_project(folder: str, modules: list) -> dict
+    Imports the Modules of one of the dashboards, isolated from the other one.
+
+resample(df: pd.DataFrame, n: int, seed: int) -> pd.DataFrame
+    Resamples the rows of a DataFrame to n rows with new collision ids.
+
+raw_collisions(merged: pd.DataFrame) -> pd.DataFrame
+    Returns the synthetic collisions with the schema of the raw Motor Vehicle Collisions file.
+
+collision_batch(merged: pd.DataFrame, missing: float, seed: int) -> tuple
+    Returns the synthetic collisions as a batch to be processed, with missing locations.
+
+measure(fn: callable, repeat: int, memory: bool) -> tuple
+    Times a call and measures its peak memory.
+
+run_case(project: str, kind: str, name: str, rows: int, fn: callable, repeat: int, chart: bool) -> dict
+    Runs a benchmark case and returns its result record.
+
+static_cases(mods: dict, merged: pd.DataFrame, weather_file: str, tmp: str) -> list
+    Returns the benchmark cases of the static dashboard.
+
+interactive_cases(mods: dict, merged: pd.DataFrame, tmp: str) -> list
+    Returns the benchmark cases of the interactive dashboard.
+
+run(sizes: list, projects: list, repeat: int, raw_limit: int) -> dict
+    Runs the benchmark suite at every size.
+
+compare(old: dict, new: dict, threshold: float) -> int
+    Prints the difference between two benchmark runs and returns the number of regressions.
+"""
+
+####################################################################################################
+# IMPORTS ################################################################################ IMPORTS #
+####################################################################################################
+import os
+import sys
+import gc
+import json
+import time
+import argparse
+import platform
+import inspect
+import importlib
+import tempfile
+import tracemalloc
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import altair as alt
+
+
+####################################################################################################
+# GLOBAL VARIABLES ################################################################ GLOBAL VARIABLES #
+####################################################################################################
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STATIC = '1-Static-Dashboard'
+INTERACTIVE = '2-Interactive-Dashboard'
+
+SIZES = [10000, 100000, 1000000, 10000000]
+RAW_LIMIT = 1000000
+
+METRICS = ['build_s', 'to_dict_s', 'peak_mb', 'spec_bytes']
+
+# Columns of the preprocessed collisions file (collisions_clean.csv), the input of process_collisions
+CLEAN_COLUMNS = ['COLLISION_ID', 'CRASH DATE', 'CRASH TIME', 'BOROUGH', 'ZIP CODE', 'LATITUDE', 'LONGITUDE', 'STREET NAME',
+                 'CONTRIBUTING FACTOR VEHICLE 1', 'VEHICLE TYPE CODE 1', 'TOTAL INJURED', 'TOTAL KILLED', 'HOUR', 'MONTH', 'WEEKDAY']
+
+# Share of the batch without location, and number of distinct streets the gazetteer does not know
+MISSING = 0.1
+UNKNOWN_STREETS = 1000
+
+
+####################################################################################################
+# FUNCTIONS ############################################################################ FUNCTIONS #
+####################################################################################################
+def load_project(folder: str, modules: list) -> dict:
+    """
+    Imports the Modules of one of the dashboards, isolated from the other one. Both projects name
+    their package Modules and read their Data folder relative to the working directory, so the
+    previous package is purged from sys.modules and the working directory is moved to the project.
+
+    Parameters
+    ----------
+    folder : str
+        Folder of the dashboard, relative to the root of the repository.
+    modules : list
+        Modules to be imported (e.g. Modules.preprocessing).
+
+    Returns
+    -------
+    dict
+        The imported modules by name.
+    """
+
+    for name in [m for m in sys.modules if m.split('.')[0] in ('Modules', 'dashboard')]:
+        del sys.modules[name]
+
+    project = os.path.join(ROOT, folder)
+    sys.path = [p for p in sys.path if p not in (os.path.join(ROOT, STATIC), os.path.join(ROOT, INTERACTIVE))]
+    sys.path.insert(0, project)
+    os.chdir(project)
+
+    return {name: importlib.import_module(name) for name in modules}
+
+
+def resample(df: pd.DataFrame, n: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Resamples the rows of a DataFrame to n rows with new collision ids.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Rows to be resampled.
+    n : int
+        Number of rows of the result.
+    seed : int
+        Seed of the random generator.
+
+    Returns
+    -------
+    pd.DataFrame
+        The resampled rows.
+    """
+
+    rows = np.random.default_rng(seed).integers(0, len(df), n)
+    sample = df.iloc[rows].reset_index(drop=True)
+    if 'COLLISION_ID' in sample.columns:
+        sample['COLLISION_ID'] = np.arange(1, n + 1, dtype='int64')
+
+    return sample
+
+
+def raw_collisions(merged: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns the synthetic collisions with the schema of the raw Motor Vehicle Collisions file (the
+    input of ingest_collisions): upper case boroughs, US dates and the raw column names.
+
+    Parameters
+    ----------
+    merged : pd.DataFrame
+        Synthetic collisions with the merged.csv schema.
+
+    Returns
+    -------
+    pd.DataFrame
+        The raw collisions.
+    """
+
+    raw = merged[['COLLISION_ID', 'CRASH DATE', 'CRASH TIME', 'BOROUGH', 'ZIP CODE', 'LATITUDE', 'LONGITUDE', 'STREET NAME',
+                  'TOTAL INJURED', 'TOTAL KILLED', 'CONTRIBUTING FACTOR VEHICLE 1', 'VEHICLE TYPE CODE 1']].copy()
+    raw['CRASH DATE'] = pd.to_datetime(raw['CRASH DATE'].astype(str)).dt.strftime('%m/%d/%Y')
+    raw['BOROUGH'] = raw['BOROUGH'].astype(str).str.upper()
+    raw['ZIP CODE'] = raw['ZIP CODE'].astype('Int64')
+
+    return raw.rename(columns={'STREET NAME': 'ON STREET NAME', 'TOTAL INJURED': 'NUMBER OF PERSONS INJURED',
+                               'TOTAL KILLED': 'NUMBER OF PERSONS KILLED'})
+
+
+def collision_batch(merged: pd.DataFrame, missing: float = MISSING, seed: int = 0) -> tuple:
+    """
+    Returns the synthetic collisions as a batch of the preprocessed collisions file, as update_collisions
+    receives them, with the coordinates missing in a share of the rows and the borough and zip code in
+    another one. Half of the rows without coordinates get one of UNKNOWN_STREETS street names the other
+    rows do not have, so the gazetteer cannot place them and they go to the geocoding backend.
+
+    Parameters
+    ----------
+    merged : pd.DataFrame
+        Synthetic collisions with the merged.csv schema.
+    missing : float
+        Share of the rows without coordinates (and of the rows without borough and zip code).
+    seed : int
+        Seed of the random generator.
+
+    Returns
+    -------
+    pd.DataFrame
+        The batch of collisions.
+    np.ndarray
+        The rows with an unknown street.
+    """
+
+    batch = merged[CLEAN_COLUMNS].astype({col: object for col in CLEAN_COLUMNS if isinstance(merged[col].dtype, pd.CategoricalDtype)})
+    rng = np.random.default_rng(seed)
+
+    unlocated = np.flatnonzero(rng.random(len(batch)) < missing)
+    unknown = unlocated[::2]
+    batch.loc[unknown, 'STREET NAME'] = [f'Benchmark Street {i % UNKNOWN_STREETS}' for i in range(len(unknown))]
+    batch.loc[unlocated, ['LATITUDE', 'LONGITUDE']] = np.nan
+
+    nowhere = np.flatnonzero(rng.random(len(batch)) < missing)
+    batch.loc[nowhere, ['BOROUGH', 'ZIP CODE']] = np.nan
+
+    return batch, unknown
+
+
+def measure(fn, repeat: int = 1, memory: bool = True) -> tuple:
+    """
+    Times a call and measures its peak memory.
+
+    Parameters
+    ----------
+    fn : callable
+        Function without arguments to be measured.
+    repeat : int
+        Number of timed runs, the best one is kept.
+    memory : bool
+        Whether to run it once more under tracemalloc.
+
+    Returns
+    -------
+    object
+        Result of the last call.
+    float
+        Best wall time, in seconds.
+    float
+        Peak memory allocated during the call, in MB (None if not measured).
+    """
+
+    best = float('inf')
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+
+    peak = None
+    if memory:
+        result = None
+        gc.collect()
+        tracemalloc.start()
+        result = fn()
+        peak = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+
+    return result, best, peak
+
+
+def run_case(project: str, kind: str, name: str, rows: int, fn, repeat: int = 1, chart: bool = False) -> dict:
+    """
+    Runs a benchmark case and returns its result record.
+
+    Parameters
+    ----------
+    project : str
+        Folder of the dashboard.
+    kind : str
+        'preprocessing' or 'chart'.
+    name : str
+        Name of the case.
+    rows : int
+        Number of input rows.
+    fn : callable
+        Function without arguments to be measured.
+    repeat : int
+        Number of timed runs.
+    chart : bool
+        Whether fn returns charts (or a specification) to be serialized.
+
+    Returns
+    -------
+    dict
+        The project, kind, name and rows of the case with its build_s, to_dict_s, peak_mb and spec_bytes.
+    """
+
+    record = {'project': project, 'kind': kind, 'name': name, 'rows': rows}
+    result, record['build_s'], record['peak_mb'] = measure(fn, repeat)
+
+    if chart:
+        charts = result if isinstance(result, (tuple, list)) else [result]
+        to_dict = lambda: [c if isinstance(c, dict) else c.to_dict() for c in charts]
+        specs, record['to_dict_s'], peak = measure(to_dict, repeat)
+        record['peak_mb'] = max(record['peak_mb'], peak)
+        record['spec_bytes'] = sum(len(json.dumps(spec)) for spec in specs)
+
+    print(f"{project:<24} {name:<40} {rows:>10} rows  {record['build_s']:>9.4f} s  "
+          f"{record.get('to_dict_s', 0):>9.4f} s  {record['peak_mb']:>9.1f} MB  {record.get('spec_bytes', 0):>12} B")
+
+    return record
+
+
+def _unwrap(fn):
+    """
+    Returns the function behind a Streamlit cache (and its budget check), so the benchmark does not
+    time cache hits.
+    """
+
+    return inspect.unwrap(fn)
+
+
+def static_cases(mods: dict, merged: pd.DataFrame, weather_file: str, tmp: str) -> list:
+    """
+    Returns the benchmark cases of the static dashboard.
+
+    The collisions are derived from the synthetic collisions of the interactive dashboard with the
+    static preprocessing, and the weather stations file is resampled to the same number of rows.
+    The synthetic collisions are also written as a raw collisions file to be ingested.
+
+    Parameters
+    ----------
+    mods : dict
+        Modules of the static dashboard (see load_project).
+    merged : pd.DataFrame
+        Synthetic collisions with the merged.csv schema.
+    weather_file : str
+        Path of the resampled weather stations file.
+    tmp : str
+        Temporary folder for the raw collisions file and the ingested store.
+
+    Returns
+    -------
+    list
+        The (kind, name, fn, chart, raw) cases, raw telling whether the specification embeds the rows.
+    """
+
+    pre = mods['Modules.preprocessing']
+    vi = mods['Modules.visualizations']
+
+    raw_file, out_file = os.path.join(tmp, 'collisions.csv'), os.path.join(tmp, 'collisions_clean.parquet')
+    raw_collisions(merged).to_csv(raw_file, index=False)
+
+    raw = merged[['COLLISION_ID', 'CRASH DATE', 'CRASH TIME', 'BOROUGH', 'ZIP CODE', 'VEHICLE TYPE CODE 1',
+                  'CONTRIBUTING FACTOR VEHICLE 1']].copy()
+    raw['CRASH DATE'] = pd.to_datetime(raw['CRASH DATE'].astype(str))
+    raw['CRASH TIME'] = raw['CRASH TIME'].astype(str)
+    raw['BOROUGH'] = raw['BOROUGH'].astype(str).str.upper()
+
+    collisions = pre.derive_columns(raw.copy())
+    weather = pre.aggregate_weather(weather_file)
+    daily = pre.merge_collision_counts(weather, collisions)
+
+    # A share of the rows without borough or without zip code, to be imputed
+    gaps = raw[['BOROUGH', 'ZIP CODE']].astype(object)
+    missing = np.random.default_rng(0).random(len(gaps)) < MISSING
+    gaps.loc[missing & (np.arange(len(gaps)) % 2 == 0), 'BOROUGH'] = np.nan
+    gaps.loc[missing & (np.arange(len(gaps)) % 2 == 1), 'ZIP CODE'] = np.nan
+    rules = [('BOROUGH', 'ZIP CODE', 'UNKNOWN'), ('ZIP CODE', 'BOROUGH', 'UNKNOWN')]
+
+    return [
+        ('preprocessing', 'ingest_collisions', lambda: pre.ingest_collisions(raw_file, out_file, rules=rules), False, False),
+        ('preprocessing', 'time_filter', lambda: pre.time_filter(raw, 'CRASH DATE'), False, False),
+        ('preprocessing', 'clusterize_vehicle_type', lambda: pre.clusterize_vehicle_type(raw[['VEHICLE TYPE CODE 1']].copy(), 'VEHICLE TYPE CODE 1'), False, False),
+        ('preprocessing', 'impute_with_ref_cols', lambda: pre.impute_with_ref_cols(gaps.copy(), rules), False, False),
+        ('preprocessing', 'derive_columns', lambda: pre.derive_columns(raw[['CRASH DATE', 'CRASH TIME']].copy()), False, False),
+        ('preprocessing', 'categorize', lambda: pre.categorize(collisions['CRASH TIME INTERVAL'], 'moment'), False, False),
+        ('preprocessing', 'aggregate_weather', lambda: pre.aggregate_weather(weather_file), False, False),
+        ('preprocessing', 'merge_collision_counts', lambda: pre.merge_collision_counts(weather, collisions), False, False),
+        ('chart', 'plot_radial_chart', lambda: _unwrap(vi.plot_radial_chart)(collisions[['VEHICLE TYPE CODE 1']]), True, True),
+        ('chart', 'plot_line_chart', lambda: _unwrap(vi.plot_line_chart)(collisions[['BOROUGH', 'CRASH TIME INTERVAL']]), True, False),
+        ('chart', 'plot_bar_chart', lambda: _unwrap(vi.plot_bar_chart)(collisions[['CONTRIBUTING FACTOR VEHICLE 1', 'COLLISION_ID']]), True, False),
+        ('chart', 'plot_heatmap', lambda: _unwrap(vi.plot_heatmap)(collisions[['CRASH TIME INTERVAL', 'DAY NAME', 'YEAR']]), True, True),
+        ('chart', 'plot_slope_chart', lambda: _unwrap(vi.plot_slope_chart)(collisions[['YEAR', 'TYPE OF DAY']]), True, False),
+        ('chart', 'plot_hex_chart', lambda: _unwrap(vi.plot_hex_chart)(), True, False),
+        ('chart', 'plot_scatterplots', lambda: _unwrap(vi.plot_scatterplots)(daily[['DATE', 'MEAN_TEMP', 'PRCP', 'AWND', 'COLLISION COUNT']]), True, False),
+        ('chart', 'plot_cars', lambda: _unwrap(vi.plot_cars)(5, '2018'), True, False),
+    ]
+
+
+def interactive_cases(mods: dict, merged: pd.DataFrame, tmp: str) -> list:
+    """
+    Returns the benchmark cases of the interactive dashboard, with the data loaded and the charts
+    built as the dashboard does (compact dtypes, pre-aggregated cubes, density map above
+    DENSITY_ROWS) and the whole specification in both filtering modes.
+
+    The pipeline is run on a batch with missing locations (see collision_batch): the geocoding is
+    answered by a table backend without latency nor rate limit, and every run of a case that writes
+    (geocoding cache, partitioned store) gets a new folder, so it does not time cache hits.
+
+    Parameters
+    ----------
+    mods : dict
+        Modules of the interactive dashboard (see load_project).
+    merged : pd.DataFrame
+        Synthetic collisions with the merged.csv schema.
+    tmp : str
+        Temporary folder for the geocoding caches and the stores.
+
+    Returns
+    -------
+    list
+        The (kind, name, fn, chart, raw) cases, raw telling whether the specification embeds the rows.
+    """
+
+    pre = mods['Modules.preprocessing']
+    vi = mods['Modules.final_visualization']
+    dashboard = mods['dashboard']
+
+    df = dashboard.optimize_dtypes(merged[dashboard.COLUMNS])[0]
+    density = len(df) > dashboard.DENSITY_ROWS
+    selection = (('BOROUGH', ('Manhattan', 'Brooklyn')), ('MONTH', ('July',)))
+    borough_poly, zip_poly = pre.get_borough_polygons(), pre.get_zip_polygons()
+    locations = merged[['BOROUGH', 'ZIP CODE', 'LATITUDE', 'LONGITUDE']]
+
+    batch, unknown = collision_batch(merged)
+    weather = merged[['datetime', 'temp', 'ICON', 'tempmin', 'tempmax']].drop_duplicates('datetime').astype({'datetime': str, 'ICON': str})
+    gazetteer = pre.build_gazetteer(batch)
+    unlocated = batch[batch['LATITUDE'].isna()]
+    # The provider knows the real coordinates of the unknown streets
+    queries = pre.build_addresses(batch.loc[unknown]).dropna()
+    backend = pre.table_backend(dict(zip(queries, map(tuple, merged.loc[queries.index, ['LATITUDE', 'LONGITUDE']].to_numpy()))))
+    folder = lambda: tempfile.mkdtemp(dir=tmp) + os.sep
+    polygons = {'weather': weather, 'borough_poly': borough_poly, 'zip_poly': zip_poly}
+
+    return [
+        ('preprocessing', 'geocode_offline', lambda: pre.geocode_offline(unlocated, gazetteer), False, False),
+        ('preprocessing', 'fill_missing_coordinates', lambda: pre.fill_missing_coordinates(batch.copy(), folder() + 'geocode.sqlite', backend, rate=1e9, concurrency=64, gazetteer=gazetteer), False, False),
+        ('preprocessing', 'process_collisions', lambda: pre.process_collisions(batch, **polygons), False, False),
+        ('preprocessing', 'update_collisions', lambda: pre.update_collisions(batch, path=folder(), **polygons), False, False),
+        ('preprocessing', 'clusterize_vehicle_type', lambda: pre.clusterize_vehicle_type(merged[['VEHICLE TYPE CODE 1']].astype(object)), False, False),
+        ('preprocessing', 'fill_missing_borough_zip', lambda: pre.fill_missing_borough_zip(locations.astype({'BOROUGH': object}), borough_poly, zip_poly), False, False),
+        ('preprocessing', 'collision_cube', lambda: vi.collision_cube(df, 'HOUR'), False, False),
+        ('preprocessing', 'density_grid', lambda: vi.density_grid(df), False, False),
+        ('preprocessing', 'filter_rows', lambda: vi.filter_rows(df, selection), False, False),
+        ('chart', 'hour_line_chart', lambda: vi.hour_line_chart(df, cube=True), True, False),
+        ('chart', 'day_line_chart', lambda: vi.day_line_chart(df, cube=True), True, False),
+        ('chart', 'bar_chart', lambda: vi.bar_chart(df, cube=True), True, False),
+        ('chart', 'kpi_collisions', lambda: vi.kpi_collisions(df, cube=True), True, False),
+        ('chart', 'kpi_persons', lambda: vi.kpi_persons(df, cube=True), True, False),
+        ('chart', 'legend_chart', lambda: vi.legend_chart(df), True, False),
+        ('chart', 'dotmap_chart', lambda: vi.dotmap_chart(df, density=density), True, not density),
+        ('chart', 'dashboard.browser_spec', lambda: dashboard.browser_spec(df)[0], True, not density),
+        ('chart', 'dashboard.server_spec', lambda: _unwrap(dashboard.server_spec)(df, 'merged.csv', selection)[0], True, False),
+    ]
+
+
+def run(sizes: list = SIZES, projects: list = (STATIC, INTERACTIVE), repeat: int = 1, raw_limit: int = RAW_LIMIT) -> dict:
+    """
+    Runs the benchmark suite at every size.
+
+    Parameters
+    ----------
+    sizes : list
+        Numbers of rows of the input data.
+    projects : list
+        Folders of the dashboards to be benchmarked.
+    repeat : int
+        Number of timed runs of each case.
+    raw_limit : int
+        Rows above which the builders that embed every row in the specification are skipped.
+
+    Returns
+    -------
+    dict
+        The environment of the run and the result records.
+    """
+
+    alt.data_transformers.disable_max_rows()
+
+    # The spans of the instrumented functions are not logged while benchmarking
+    os.environ.setdefault('DASHBOARD_SPANS', '')
+
+    stations = pd.read_csv(os.path.join(ROOT, STATIC, 'Data', 'weather_2018-2020.csv'),
+                           usecols=['STATION', 'DATE', 'AWND', 'PRCP', 'TMAX', 'TMIN', 'TOBS'])
+
+    results = []
+    cwd = os.getcwd()
+    try:
+        synthetic = load_project(INTERACTIVE, ['Modules.synthetic'])['Modules.synthetic']
+        model = synthetic.build_model()
+
+        for n in sizes:
+            sample = synthetic.synthetic_collisions(n, model, rng=np.random.default_rng(0))
+
+            if STATIC in projects:
+                mods = load_project(STATIC, ['Modules.preprocessing', 'Modules.visualizations'])
+                with tempfile.TemporaryDirectory() as tmp:
+                    weather_file = os.path.join(tmp, 'weather.csv')
+                    resample(stations, n).to_csv(weather_file, index=False)
+                    for kind, name, fn, chart, raw in static_cases(mods, sample, weather_file, tmp):
+                        if raw and n > raw_limit:
+                            results.append({'project': STATIC, 'kind': kind, 'name': name, 'rows': n, 'skipped': 'raw rows above limit'})
+                            continue
+                        results.append(run_case(STATIC, kind, name, n, fn, repeat, chart))
+
+            if INTERACTIVE in projects:
+                mods = load_project(INTERACTIVE, ['Modules.preprocessing', 'Modules.final_visualization', 'dashboard'])
+                with tempfile.TemporaryDirectory() as tmp:
+                    for kind, name, fn, chart, raw in interactive_cases(mods, sample, tmp):
+                        if raw and n > raw_limit:
+                            results.append({'project': INTERACTIVE, 'kind': kind, 'name': name, 'rows': n, 'skipped': 'raw rows above limit'})
+                            continue
+                        results.append(run_case(INTERACTIVE, kind, name, n, fn, repeat, chart))
+
+            del sample
+            gc.collect()
+    finally:
+        os.chdir(cwd)
+
+    meta = {
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'altair': alt.__version__,
+        'sizes': list(sizes),
+        'repeat': repeat,
+    }
+
+    return {'meta': meta, 'results': results}
+
+
+def compare(old: dict, new: dict, threshold: float = 0.1) -> int:
+    """
+    Prints the difference between two benchmark runs and returns the number of regressions.
+
+    Parameters
+    ----------
+    old : dict
+        Baseline run.
+    new : dict
+        Run to be compared.
+    threshold : float
+        Relative increase of a metric counted as a regression (0.1 is 10% worse).
+
+    Returns
+    -------
+    int
+        Number of metrics worse than the baseline by more than the threshold.
+    """
+
+    key = lambda r: (r['project'], r['name'], r['rows'])
+    before = {key(r): r for r in old['results'] if 'skipped' not in r}
+
+    regressions = 0
+    print(f"{'project':<24} {'name':<40} {'rows':>10}  " + '  '.join(f'{m:>22}' for m in METRICS))
+    for r in new['results']:
+        if 'skipped' in r or key(r) not in before:
+            continue
+        cells = []
+        for metric in METRICS:
+            a, b = before[key(r)].get(metric), r.get(metric)
+            if a is None or b is None:
+                cells.append(f"{'':>22}")
+                continue
+            change = (b - a) / a if a else 0.0
+            flag = '!' if change > threshold else ' '
+            regressions += change > threshold
+            cells.append(f'{a:>9.4g} -> {b:<9.4g}{flag}')
+        print(f"{r['project']:<24} {r['name']:<40} {r['rows']:>10}  " + '  '.join(cells))
+
+    print(f'{regressions} regressions above {threshold:.0%}')
+
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks the preprocessing and the charts of the dashboards.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='run the benchmark suite')
+    run_parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    run_parser.add_argument('--projects', nargs='+', default=[STATIC, INTERACTIVE], choices=[STATIC, INTERACTIVE])
+    run_parser.add_argument('--repeat', type=int, default=1)
+    run_parser.add_argument('--raw-limit', type=int, default=RAW_LIMIT)
+    run_parser.add_argument('--out', default=f"benchmark-{datetime.now():%Y%m%d-%H%M%S}.json")
+
+    compare_parser = commands.add_parser('compare', help='compare two benchmark runs')
+    compare_parser.add_argument('old')
+    compare_parser.add_argument('new')
+    compare_parser.add_argument('--threshold', type=float, default=0.1)
+
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        out = os.path.abspath(args.out)
+        results = run(args.sizes, args.projects, args.repeat, args.raw_limit)
+        with open(out, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(out)
+    else:
+        with open(args.old) as f:
+            old = json.load(f)
+        with open(args.new) as f:
+            new = json.load(f)
+        sys.exit(1 if compare(old, new, args.threshold) else 0)